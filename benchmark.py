@@ -0,0 +1,288 @@
+"""百家乐对刷检测基准测试 - 在固定的模拟数据上按阶段计时，结果按提交记录到历史文件
+
+用法示例:
+    python benchmark.py run --scales 10k,100k,1M --excel-scales 10k,100k
+    python benchmark.py compare --threshold 10
+    python benchmark.py compare 3fdf853 HEAD --threshold 5 --min-seconds 0.1
+
+每个数据集先按--repeat次数计时（不跟踪内存），每个阶段取最短耗时；
+再单独运行一次开启tracemalloc，记录各阶段的内存峰值。
+compare 对比两次记录，耗时增加超过阈值的阶段记为性能回退，有回退时退出码为1。
+"""
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from generate_test_data import GENERATOR_VERSION, generate, ground_truth_path, parse_size, score_recall
+from streamlit_app import BaccaratWashTradeDetector, HeadlessUI, logger
+from wash_trade_cli import LocalFile, load_config
+
+DEFAULT_HISTORY = os.path.join('benchmarks', 'history.json')
+DEFAULT_DATA_DIR = os.path.join('benchmarks', 'data')
+
+# 数据集格式对应的生成参数
+DATASET_FORMATS = {'csv': ('csv', 'gbk'), 'xlsx': ('xlsx', 'utf-8')}
+
+REPO_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def run_git(*args):
+    """在仓库目录下运行git命令，返回标准输出"""
+    return subprocess.run(['git', *args], cwd=REPO_DIR, capture_output=True, text=True, check=True).stdout
+
+
+def git_revision():
+    """当前提交的短哈希，工作区有未提交的修改时加上-dirty"""
+    try:
+        commit = run_git('rev-parse', '--short', 'HEAD').strip()
+        status = run_git('status', '--porcelain', '--untracked-files=no')
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+    return f"{commit}-dirty" if status.strip() else commit
+
+
+def resolve_revision(revision):
+    """把分支名、HEAD等解析为短哈希，无法解析时原样返回"""
+    try:
+        return run_git('rev-parse', '--short', revision).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return revision
+
+
+def prepare_dataset(data_dir, file_format, rows, seed):
+    """生成（或复用已生成的）固定种子的模拟数据集，返回(文件路径, 真值)"""
+    output_format, encoding = DATASET_FORMATS[file_format]
+    path = os.path.join(data_dir, f"bench_{rows}_{seed}_v{GENERATOR_VERSION}.{output_format}")
+    truth_path = ground_truth_path(path)
+    if os.path.exists(path) and os.path.exists(truth_path):
+        with open(truth_path, encoding='utf-8') as f:
+            return path, json.load(f)
+
+    os.makedirs(data_dir, exist_ok=True)
+    logger.info(f"生成基准数据集: {path}")
+    return path, generate(path, output_format, rows, encoding, seed=seed)
+
+
+def run_pipeline(path, config):
+    """完整运行一次读取、检测和Excel导出，返回(各阶段统计, 检测结果, 总耗时)"""
+    detector = BaccaratWashTradeDetector(config, HeadlessUI())
+    start = time.perf_counter()
+    df_valid, _ = detector.upload_and_process(LocalFile(path))
+    if df_valid is None or len(df_valid) == 0:
+        raise ValueError(f"{path}: 没有有效数据可用于检测")
+    patterns = detector.detect_all_wash_trades()
+    detector.export_detection_results(patterns, 'excel')
+    elapsed = time.perf_counter() - start
+    return detector.performance_stats, patterns, elapsed
+
+
+def benchmark_dataset(path, ground_truth, config, repeat):
+    """多次计时取各阶段最短耗时，再开启内存跟踪运行一次取内存峰值"""
+    stage_times = {}
+    totals = []
+    for _ in range(repeat):
+        config.performance_trace_memory = False
+        stats, patterns, elapsed = run_pipeline(path, config)
+        totals.append(elapsed)
+        for name, stage in stats.items():
+            stage_times.setdefault(name, []).append(stage['耗时(秒)'])
+
+    config.performance_trace_memory = True
+    memory_stats, _, _ = run_pipeline(path, config)
+    config.performance_trace_memory = False
+
+    stages = {}
+    for name, times in stage_times.items():
+        stage = stats[name]
+        stages[name] = {
+            '耗时(秒)': min(times),
+            '耗时中位数(秒)': float(np.median(times)),
+            '输入行数': stage['输入行数'],
+            '输出行数': stage['输出行数'],
+            '内存峰值(MB)': memory_stats.get(name, {}).get('内存峰值(MB)'),
+            '计数': stage['计数']
+        }
+    recall = score_recall(patterns, ground_truth)
+    return {
+        '行数': ground_truth['rows'],
+        '总耗时(秒)': min(totals),
+        '对刷组数': len(patterns),
+        '召回率': recall['召回率'],
+        '阶段': stages
+    }
+
+
+def load_history(path):
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def save_history(path, history):
+    if os.path.dirname(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(history, f, ensure_ascii=False, indent=2)
+
+
+def run_benchmarks(args):
+    """按数据集运行基准测试，结果写入历史文件中当前提交的记录"""
+    config = load_config(args.config)
+    datasets = [('csv', scale) for scale in args.scales.split(',') if scale]
+    datasets += [('xlsx', scale) for scale in args.excel_scales.split(',') if scale]
+
+    results = {}
+    for file_format, scale in datasets:
+        path, ground_truth = prepare_dataset(args.data_dir, file_format, parse_size(scale), args.seed)
+        name = f"{file_format}_{scale}"
+        logger.info(f"基准测试: {name}")
+        results[name] = benchmark_dataset(path, ground_truth, config, args.repeat)
+        logger.info(f"{name}: 总耗时 {results[name]['总耗时(秒)']:.2f} 秒, 召回率 {results[name]['召回率']}")
+
+    revision = git_revision()
+    history = load_history(args.history)
+    entry = history.get(revision, {'数据集': {}})
+    entry.update({
+        '时间': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        'Python': platform.python_version(),
+        '平台': platform.platform(),
+        '重复次数': args.repeat,
+        '种子': args.seed
+    })
+    entry['数据集'].update(results)
+    # 重新插入，使最近一次运行的提交排在最后
+    history.pop(revision, None)
+    history[revision] = entry
+    save_history(args.history, history)
+    logger.info(f"基准测试结果已记录: {revision} -> {args.history}")
+
+    print(format_results(revision, results))
+    return 0
+
+
+def format_results(revision, results):
+    """各数据集各阶段的耗时和内存峰值表格"""
+    rows = []
+    for name, result in results.items():
+        for stage, stats in result['阶段'].items():
+            rows.append({
+                '数据集': name, '阶段': stage, '耗时(秒)': stats['耗时(秒)'], '内存峰值(MB)': stats['内存峰值(MB)']
+            })
+    table = pd.DataFrame(rows)
+    return f"提交 {revision}\n{table.to_string(index=False, float_format=lambda value: f'{value:.3f}')}"
+
+
+def compare_runs(base, head, threshold, min_seconds):
+    """逐数据集逐阶段对比两次记录，返回(对比表, 回退的行数)"""
+    rows = []
+    for name, head_result in head['数据集'].items():
+        base_result = base['数据集'].get(name)
+        if base_result is None:
+            continue
+        stages = dict(base_result['阶段'])
+        stages['总耗时'] = {'耗时(秒)': base_result['总耗时(秒)'], '内存峰值(MB)': None}
+        head_stages = dict(head_result['阶段'])
+        head_stages['总耗时'] = {'耗时(秒)': head_result['总耗时(秒)'], '内存峰值(MB)': None}
+
+        for stage, head_stats in head_stages.items():
+            base_stats = stages.get(stage)
+            if base_stats is None:
+                continue
+            base_time, head_time = base_stats['耗时(秒)'], head_stats['耗时(秒)']
+            change = (head_time - base_time) / base_time * 100 if base_time > 0 else 0.0
+            # 耗时很短的阶段计时噪声大，绝对增加不足min_seconds时不算回退
+            regressed = change > threshold and head_time - base_time >= min_seconds
+            rows.append({
+                '数据集': name,
+                '阶段': stage,
+                '基准耗时(秒)': base_time,
+                '当前耗时(秒)': head_time,
+                '变化(%)': change,
+                '基准内存(MB)': base_stats['内存峰值(MB)'],
+                '当前内存(MB)': head_stats['内存峰值(MB)'],
+                '回退': '是' if regressed else ''
+            })
+    table = pd.DataFrame(rows)
+    regressions = int((table['回退'] == '是').sum()) if not table.empty else 0
+    return table, regressions
+
+
+def compare_benchmarks(args):
+    """对比历史文件中的两次记录，默认为最近两次"""
+    history = load_history(args.history)
+    revisions = list(history)
+    if args.head is None:
+        if not revisions:
+            logger.error(f"没有基准测试记录: {args.history}")
+            return 2
+        head = revisions[-1]
+    else:
+        head = args.head if args.head in history else resolve_revision(args.head)
+    if args.base is None:
+        earlier = revisions[:revisions.index(head)] if head in revisions else []
+        if not earlier:
+            logger.error("没有可对比的更早记录")
+            return 2
+        base = earlier[-1]
+    else:
+        base = args.base if args.base in history else resolve_revision(args.base)
+
+    for revision in [base, head]:
+        if revision not in history:
+            logger.error(f"没有提交 {revision} 的基准测试记录")
+            return 2
+
+    table, regressions = compare_runs(history[base], history[head], args.threshold, args.min_seconds)
+    if table.empty:
+        logger.error(f"{base} 和 {head} 没有共同的数据集")
+        return 2
+
+    print(f"基准 {base} -> 当前 {head}（回退阈值 {args.threshold}%）")
+    print(table.to_string(index=False, float_format=lambda value: f"{value:.3f}"))
+    if regressions:
+        logger.warning(f"发现 {regressions} 个阶段性能回退")
+        return 1
+    logger.info("没有发现性能回退")
+    return 0
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="百家乐对刷检测 - 基准测试")
+    parser.add_argument('--history', default=DEFAULT_HISTORY, help="基准测试历史文件（JSON，按提交记录）")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    run = commands.add_parser('run', help="运行基准测试并记录到历史文件")
+    run.add_argument('--scales', default='10k,100k,1M', help="CSV数据集的行数，逗号分隔，支持k/M后缀")
+    run.add_argument('--excel-scales', default='10k,100k', help="XLSX数据集的行数，逗号分隔，为空时不测试Excel读取")
+    run.add_argument('--repeat', type=int, default=3, help="每个数据集的计时次数，取最短耗时")
+    run.add_argument('--seed', type=int, default=0, help="模拟数据的随机种子")
+    run.add_argument('--data-dir', default=DEFAULT_DATA_DIR, help="模拟数据集的存放目录，已存在的数据集直接复用")
+    run.add_argument('--config', help="JSON配置文件，字段与BaccaratConfig一致")
+
+    compare = commands.add_parser('compare', help="对比两次记录，耗时增加超过阈值时退出码为1")
+    compare.add_argument('base', nargs='?', help="基准提交（默认为当前记录之前的一次）")
+    compare.add_argument('head', nargs='?', help="对比的提交（默认为最近一次记录）")
+    compare.add_argument('--threshold', type=float, default=10.0, help="判定为回退的耗时增加百分比")
+    compare.add_argument('--min-seconds', type=float, default=0.05, help="判定为回退的最小耗时增加（秒）")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """命令行入口，返回进程退出码"""
+    args = parse_args(argv)
+    if args.command == 'run':
+        return run_benchmarks(args)
+    return compare_benchmarks(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
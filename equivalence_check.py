@@ -0,0 +1,431 @@
+"""百家乐对刷检测差分校验 - 在随机和边界数据上对比各检测引擎与参考实现的结果
+
+用法示例:
+    python equivalence_check.py --trials 200 --seed 0
+    python equivalence_check.py --trials 50 --engines vectorized,parallel --output-dir repro
+    python equivalence_check.py --replay repro/repro_parallel_17.csv --config repro/repro_parallel_17_config.json
+
+每次试验随机生成一份投注数据和一组检测配置，按需加入边界情况：同一账户同局金额相同的多笔下注
+（主注取值的并列）、0金额、完全重复的记录、多种格式混杂的局号。数据经过与上传文件相同的清洗和标准化后，
+分别交给参考实现（reference_detector.py）和各检测引擎，比较规范化后的连续对刷结果。
+结果不一致时把数据缩减到仍能复现差异的最小记录集，写出可直接上传检测的CSV、配置文件和差异说明。
+"""
+import argparse
+import copy
+import json
+import logging
+import math
+import os
+import sys
+import traceback
+from collections import Counter
+
+import numpy as np
+import pandas as pd
+
+from reference_detector import ReferenceDetector
+from streamlit_app import (
+    BaccaratConfig,
+    BaccaratWashTradeDetector,
+    CandidateCache,
+    HeadlessUI,
+    IncrementalSession,
+    logger
+)
+from wash_trade_cli import apply_settings
+
+RAW_COLUMNS = ['会员账号', '局号', '游戏类型', '下注玩法', '下注额度']
+GAME_BETS = {
+    '百家乐': (['庄', '闲', '和', '庄对', '闲对'], [0.4, 0.4, 0.1, 0.05, 0.05]),
+    '龙虎': (['龙', '虎', '和'], [0.45, 0.45, 0.1])
+}
+OPPOSITES = {'百家乐': [('庄', '闲'), ('庄', '和'), ('闲', '和'), ('庄对', '闲对')], '龙虎': [('龙', '虎')]}
+BASE_AMOUNTS = [10, 20, 50, 100, 200, 500, 1000]
+ADVERSARIAL_CASES = ['ties', 'zero_amounts', 'duplicates', 'mixed_periods']
+
+
+# ==================== 检测引擎 ====================
+def run_detector(normalized, config, candidate_cache=None):
+    """按上传文件的处理流程运行检测：金额过滤、账户统计、全部对刷检测"""
+    detector = BaccaratWashTradeDetector(config, HeadlessUI())
+    detector.normalized_frame = normalized
+    df_valid = detector.select_valid_records(normalized, len(normalized))
+    if len(df_valid) == 0:
+        return []
+    detector.data_fingerprint = 'equivalence_check'
+    return detector.detect_all_wash_trades(candidate_cache)
+
+
+def engine_vectorized(normalized, config):
+    return run_detector(normalized, config)
+
+
+def engine_no_prefilter(normalized, config):
+    config = copy.deepcopy(config)
+    config.shared_round_prefilter = False
+    return run_detector(normalized, config)
+
+
+def engine_cached(normalized, config):
+    """先用宽松阈值检测一次填充候选缓存，再按实际阈值从缓存重新过滤"""
+    loose = copy.deepcopy(config)
+    loose.amount_similarity_threshold = loose.candidate_similarity_floor
+    loose.account_count_similarity_thresholds = {
+        count: loose.candidate_similarity_floor for count in loose.account_count_similarity_thresholds
+    }
+    candidate_cache = CandidateCache()
+    run_detector(normalized, loose, candidate_cache)
+    return run_detector(normalized, config, candidate_cache)
+
+
+def engine_parallel(normalized, config):
+    config = copy.deepcopy(config)
+    config.detection_workers = 2
+    config.parallel_min_records = 0
+    config.shards_per_worker = 2
+    return run_detector(normalized, config)
+
+
+def engine_incremental(normalized, config, batches=3):
+    """按行顺序分批追加到增量会话"""
+    session = IncrementalSession(config)
+    for rows in np.array_split(np.arange(len(normalized)), batches):
+        if len(rows):
+            session.append(normalized.iloc[rows].reset_index(drop=True))
+    return session.get_patterns()
+
+
+ENGINES = {
+    'vectorized': engine_vectorized,
+    'no_prefilter': engine_no_prefilter,
+    'cached': engine_cached,
+    'parallel': engine_parallel,
+    'incremental': engine_incremental
+}
+
+
+# ==================== 数据生成 ====================
+def format_period(rng, style, prefix, number):
+    """按局号格式输出局号文本"""
+    if style == 'plain':
+        return f"{prefix}{number}"
+    if style == 'float':
+        return f"{prefix}{number}.0"
+    if style == 'spaced':
+        return f" {prefix} {number} "
+    if style == 'padded':
+        return f"{prefix}{number:04d}"
+    # 不以数字结尾的局号按文本排序
+    return f"{prefix}{number}局"
+
+
+def random_dataset(rng, cases):
+    """随机生成原始投注记录（与上传文件的必要列相同），部分账户在连续局中对立下注"""
+    n_tables = int(rng.integers(1, 4))
+    n_accounts = int(rng.integers(4, 13))
+    accounts = [f"u{i:02d}" for i in range(n_accounts)]
+    rows = []
+    for table in range(n_tables):
+        game = '百家乐' if rng.random() < 0.7 else '龙虎'
+        bets, probabilities = GAME_BETS[game]
+        prefix = rng.choice(['', f"T{table}-", f"{'BJ' if game == '百家乐' else 'LH'}{table:02d}"])
+        styles = ['plain']
+        if 'mixed_periods' in cases:
+            styles = ['plain', 'float', 'spaced', 'padded', 'suffix']
+        # 局号跨过位数变化（如9到10），检验按自然顺序编号
+        start = int(rng.choice([1, 7, 95, 995]))
+        n_rounds = int(rng.integers(4, 16))
+        ring = list(rng.choice(accounts, size=int(rng.integers(1, min(5, n_accounts) + 1)), replace=False))
+        ring_rounds = set(range(int(rng.integers(0, n_rounds)), n_rounds)) if rng.random() < 0.8 else set()
+        side1, side2 = OPPOSITES[game][int(rng.integers(len(OPPOSITES[game])))]
+
+        for offset in range(n_rounds):
+            # 局号跳号时连续性会中断
+            number = start + offset + (1 if rng.random() < 0.1 else 0)
+            period = format_period(rng, rng.choice(styles), prefix, number)
+            base = float(rng.choice(BASE_AMOUNTS))
+
+            bettors = list(rng.choice(accounts, size=int(rng.integers(2, min(8, n_accounts) + 1)), replace=False))
+            for account in bettors:
+                for _ in range(int(rng.integers(1, 3))):
+                    amount = base * float(rng.choice([0.5, 0.85, 0.9, 0.95, 1.0, 1.0, 2.0]))
+                    rows.append((account, period, game, str(rng.choice(bets, p=probabilities)), amount))
+
+            if offset in ring_rounds:
+                # 对刷注金额不低于普通注，通常成为主注
+                stake = base * 2
+                if len(ring) == 1:
+                    rows.append((ring[0], period, game, side1, stake))
+                    rows.append((ring[0], period, game, side2, stake * float(rng.choice([0.9, 1.0]))))
+                else:
+                    for position, account in enumerate(ring):
+                        side = side1 if position % 2 == 0 else side2
+                        rows.append((account, period, game, side, stake * float(rng.choice([0.95, 1.0]))))
+
+    raw = pd.DataFrame(rows, columns=['会员账号', '局号', '游戏类型', '下注玩法', '金额'])
+    if 'ties' in cases and len(raw):
+        # 同一账户同一局再下一笔金额相同、玩法不同的注，主注在两笔之间并列
+        picked = raw.sample(n=max(1, len(raw) // 8), random_state=int(rng.integers(2 ** 31)))
+        ties = picked.copy()
+        ties['下注玩法'] = [
+            str(rng.choice(GAME_BETS[game][0])) for game in ties['游戏类型']
+        ]
+        raw = pd.concat([raw, ties]).sort_index(kind='stable').reset_index(drop=True)
+    if 'zero_amounts' in cases and len(raw):
+        raw.loc[rng.random(len(raw)) < 0.08, '金额'] = 0.0
+    if 'duplicates' in cases and len(raw):
+        picked = raw.sample(n=max(1, len(raw) // 10), random_state=int(rng.integers(2 ** 31)))
+        raw = pd.concat([raw, picked]).sort_index(kind='stable').reset_index(drop=True)
+
+    raw['下注额度'] = [f"{amount:g}" for amount in raw['金额']]
+    return raw[RAW_COLUMNS]
+
+
+def random_settings(rng, cases):
+    """随机检测配置（JSON形式，可直接用作--config）"""
+    return {
+        'min_amount': 0 if 'zero_amounts' in cases else int(rng.choice([10, 50])),
+        'amount_similarity_threshold': float(rng.choice([0.5, 0.8, 0.9])),
+        'min_continuous_periods': int(rng.choice([2, 3, 4])),
+        'max_accounts_in_group': int(rng.choice([3, 4, 5])),
+        'account_count_similarity_thresholds': {
+            str(count): float(rng.choice([0.5, 0.8, 0.85, 0.9, 0.95])) for count in range(2, 6)
+        },
+        'amount_threshold': {
+            'max_amount_ratio': float(rng.choice([1.1, 2, 10])),
+            'enable_threshold_filter': bool(rng.random() < 0.7)
+        }
+    }
+
+
+def build_config(settings):
+    config = apply_settings(BaccaratConfig(), settings)
+    config.hedging_detection_enabled = False
+    return config
+
+
+def ingest(raw, config):
+    """与上传文件相同的清洗和标准化，返回标准化核心数据"""
+    detector = BaccaratWashTradeDetector(config, HeadlessUI())
+    processor = detector.data_processor
+    df_clean = processor.filter_valid_records(processor.format_records(raw.copy()))
+    return detector.normalize_records(df_clean)
+
+
+# ==================== 结果比较 ====================
+def canonical_round(pattern):
+    """逐局模式的规范形式：账户与玩法、金额按账户排序，金额和相似度取固定精度"""
+    accounts, bets = pattern['账户组'], pattern['下注玩法组']
+    amounts = [round(float(amount), 2) for amount in pattern['金额组']]
+    if len(accounts) == len(bets):
+        members = tuple(sorted(zip(accounts, bets, amounts)))
+    else:
+        members = (tuple(accounts), tuple(sorted(zip(bets, amounts))))
+    return (pattern['局号'], pattern['游戏类型'], pattern['模式'], members, round(float(pattern['相似度']), 6))
+
+
+CANONICAL_FIELDS = [
+    '游戏类型', '对刷局数', '最长连续局数', '连续段数', '最长连续区间', '总投注金额', '平均相似度',
+    '账户活跃度', '要求最小对刷局数', '详细记录'
+]
+
+
+def canonical_pattern(pattern):
+    """连续对刷结果的规范形式：(分组键, 各字段取值)"""
+    key = (pattern['检测类型'], tuple(sorted(pattern['账户组'])), pattern['对立类型'])
+    values = {
+        '游戏类型': pattern['游戏类型'],
+        '对刷局数': int(pattern['对刷局数']),
+        '最长连续局数': int(pattern['最长连续局数']),
+        '连续段数': int(pattern['连续段数']),
+        '最长连续区间': pattern['最长连续区间'],
+        '总投注金额': round(float(pattern['总投注金额']), 2),
+        '平均相似度': round(float(pattern['平均相似度']), 6),
+        '账户活跃度': pattern['账户活跃度'],
+        '要求最小对刷局数': int(pattern['要求最小对刷局数']),
+        '详细记录': tuple(sorted(canonical_round(record) for record in pattern['详细记录']))
+    }
+    return key, values
+
+
+def diff_patterns(expected, actual):
+    """对比参考结果和引擎结果，返回差异列表（无差异时为空）"""
+    expected_map, actual_map = {}, {}
+    problems = []
+    for patterns, target, label in [(expected, expected_map, '参考'), (actual, actual_map, '引擎')]:
+        counts = Counter()
+        for pattern in patterns:
+            key, values = canonical_pattern(pattern)
+            counts[key] += 1
+            target[key] = values
+        for key, count in counts.items():
+            if count > 1:
+                problems.append({'类型': f'{label}结果重复', '分组': list(key), '次数': count})
+
+    for key in expected_map.keys() - actual_map.keys():
+        problems.append({'类型': '引擎漏检', '分组': list(key), '参考': summarize(expected_map[key])})
+    for key in actual_map.keys() - expected_map.keys():
+        problems.append({'类型': '引擎多检', '分组': list(key), '引擎': summarize(actual_map[key])})
+    for key in expected_map.keys() & actual_map.keys():
+        fields = [field for field in CANONICAL_FIELDS if expected_map[key][field] != actual_map[key][field]]
+        if fields:
+            problems.append({
+                '类型': '结果不同',
+                '分组': list(key),
+                '字段': fields,
+                '参考': summarize(expected_map[key], fields),
+                '引擎': summarize(actual_map[key], fields)
+            })
+    return sorted(problems, key=lambda problem: json.dumps(problem, ensure_ascii=False))
+
+
+def summarize(values, fields=None):
+    """差异说明中的字段取值，详细记录转为列表"""
+    fields = fields or [field for field in CANONICAL_FIELDS if field != '详细记录']
+    return {
+        field: [list(record) for record in values[field]] if field == '详细记录' else values[field]
+        for field in fields
+    }
+
+
+def check(raw, settings, engine_names):
+    """对一份数据运行参考实现和各引擎，返回{引擎: 差异列表}，只包含有差异的引擎"""
+    config = build_config(settings)
+    normalized = ingest(raw, config)
+    expected = ReferenceDetector(config).detect_all_wash_trades(normalized)
+
+    failures = {}
+    for name in engine_names:
+        try:
+            actual = ENGINES[name](normalized, build_config(settings))
+            problems = diff_patterns(expected, actual)
+        except Exception as e:
+            problems = [{'类型': '引擎异常', '异常': f"{type(e).__name__}: {e}", '堆栈': traceback.format_exc()}]
+        if problems:
+            failures[name] = problems
+    return failures
+
+
+# ==================== 缩减复现数据 ====================
+def shrink_units(raw, units, unit_rows, still_fails):
+    """按单元做delta调试：反复删除一部分单元，保留仍能复现差异的最小单元集合"""
+    granularity = 2
+    while len(units) >= 2:
+        chunk = math.ceil(len(units) / granularity)
+        for start in range(0, len(units), chunk):
+            remaining = units[:start] + units[start + chunk:]
+            candidate = raw[unit_rows(remaining)]
+            if len(candidate) and still_fails(candidate):
+                units = remaining
+                granularity = max(granularity - 1, 2)
+                break
+        else:
+            if granularity >= len(units):
+                break
+            granularity = min(len(units), granularity * 2)
+    return raw[unit_rows(units)].reset_index(drop=True)
+
+
+def shrink(raw, settings, engine_name):
+    """先按局、再按行缩减复现数据"""
+    def still_fails(candidate):
+        return engine_name in check(candidate.reset_index(drop=True), settings, [engine_name])
+
+    raw = raw.reset_index(drop=True)
+    periods = raw['局号'].unique().tolist()
+    raw = shrink_units(raw, periods, lambda kept: raw['局号'].isin(kept).to_numpy(), still_fails)
+    rows = list(range(len(raw)))
+    return shrink_units(raw, rows, lambda kept: np.isin(np.arange(len(raw)), kept), still_fails)
+
+
+def write_repro(output_dir, stem, raw, settings, problems):
+    """写出复现数据（可直接上传的CSV）、配置和差异说明，返回CSV路径"""
+    os.makedirs(output_dir, exist_ok=True)
+    path = os.path.join(output_dir, f"{stem}.csv")
+    raw.to_csv(path, index=False, encoding='utf-8-sig')
+    with open(os.path.join(output_dir, f"{stem}_config.json"), 'w', encoding='utf-8') as f:
+        json.dump(settings, f, ensure_ascii=False, indent=2)
+    with open(os.path.join(output_dir, f"{stem}_diff.json"), 'w', encoding='utf-8') as f:
+        json.dump(problems, f, ensure_ascii=False, indent=2)
+    return path
+
+
+def read_repro(path):
+    return pd.read_csv(path, dtype=str, keep_default_na=False, encoding='utf-8-sig')[RAW_COLUMNS]
+
+
+# ==================== 命令行 ====================
+def run_trials(args, engine_names):
+    rng = np.random.default_rng(args.seed)
+    failed_trials = 0
+    for trial in range(args.trials):
+        cases = [case for case in ADVERSARIAL_CASES if rng.random() < 0.4]
+        raw = random_dataset(rng, cases)
+        settings = random_settings(rng, cases)
+        failures = check(raw, settings, engine_names)
+        if not failures:
+            continue
+
+        failed_trials += 1
+        for name, problems in failures.items():
+            minimal = shrink(raw, settings, name) if args.shrink else raw
+            minimal_problems = check(minimal, settings, [name]).get(name, problems)
+            path = write_repro(args.output_dir, f"repro_{name}_{trial}", minimal, settings, minimal_problems)
+            logger.error(
+                f"试验 {trial}（{', '.join(cases) or '随机数据'}）: 引擎 {name} 与参考实现不一致，"
+                f"{len(raw)} 条记录缩减为 {len(minimal)} 条: {path}"
+            )
+    if failed_trials:
+        logger.error(f"差分校验完成: {args.trials} 次试验中 {failed_trials} 次不一致")
+        return 1
+    logger.warning(f"差分校验完成: {args.trials} 次试验全部一致")
+    return 0
+
+
+def replay(args, engine_names):
+    """重新运行一份复现数据，输出各引擎的差异"""
+    settings = {}
+    if args.config:
+        with open(args.config, encoding='utf-8') as f:
+            settings = json.load(f)
+    failures = check(read_repro(args.replay), settings, engine_names)
+    for name in engine_names:
+        if name in failures:
+            print(f"{name}: 不一致")
+            print(json.dumps(failures[name], ensure_ascii=False, indent=2))
+        else:
+            print(f"{name}: 一致")
+    return 1 if failures else 0
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="百家乐对刷检测 - 检测引擎与参考实现的差分校验")
+    parser.add_argument('--trials', type=int, default=100, help="随机试验次数")
+    parser.add_argument('--seed', type=int, default=0, help="随机种子")
+    parser.add_argument('--engines', default=','.join(ENGINES), help=f"参与对比的引擎，逗号分隔（{', '.join(ENGINES)}）")
+    parser.add_argument('--output-dir', default='equivalence_repro', help="不一致时写出复现数据的目录")
+    parser.add_argument('--no-shrink', dest='shrink', action='store_false', help="不缩减复现数据")
+    parser.add_argument('--replay', help="重新运行一份复现数据（CSV）")
+    parser.add_argument('--config', help="重新运行时使用的配置（复现数据旁的_config.json）")
+    parser.add_argument('--verbose', action='store_true', help="输出检测过程的日志")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """命令行入口，返回进程退出码：0为全部一致，1为发现不一致"""
+    args = parse_args(argv)
+    engine_names = [name for name in args.engines.split(',') if name]
+    unknown = [name for name in engine_names if name not in ENGINES]
+    if unknown:
+        logger.error(f"未知的引擎: {', '.join(unknown)}")
+        return 2
+    if not args.verbose:
+        logger.setLevel(logging.WARNING)
+
+    if args.replay:
+        return replay(args, engine_names)
+    return run_trials(args, engine_names)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
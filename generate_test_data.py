@@ -0,0 +1,664 @@
+"""百家乐对刷测试数据生成器 - 生成大规模模拟投注数据并植入已知的对刷组
+
+用法示例:
+    python generate_test_data.py --rows 1M --format csv --encoding gbk --output data/bets_1m.csv
+    python generate_test_data.py --rows 200k --format xlsx --output data/bets_200k.xlsx
+    python generate_test_data.py --rows 50M --format parquet --output data/bets_50m.parquet
+
+输出文件旁会写出 {文件名}_ground_truth.json，记录所有植入的单账户和多账户对刷组，
+检测结果可用 score_recall 与之比对计算召回率。
+"""
+import argparse
+import io
+import json
+import math
+import os
+import sys
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from openpyxl import Workbook
+
+from streamlit_app import (
+    AMOUNT_CENTS_COLUMN,
+    BaccaratConfig,
+    BaccaratDataProcessor,
+    BetTypeNormalizer,
+    CORE_CODE_COLUMNS,
+    EXCEL_MAX_ROWS,
+    FULLWIDTH_DIGIT_TABLE,
+    GameTypeIdentifier,
+    HeadlessUI,
+    SNAPSHOT_METADATA_KEY,
+    SNAPSHOT_VERSION,
+    logger
+)
+
+OUTPUT_FORMATS = ['csv', 'xlsx', 'parquet']
+
+# 生成规则的版本，规则变化后相同参数和种子生成的数据不同（基准测试据此判断已生成的数据集是否可复用）
+GENERATOR_VERSION = 2
+CSV_OUTPUT_ENCODINGS = {'utf-8': 'utf-8-sig', 'gbk': 'gbk'}
+
+# 各游戏的下注玩法及概率
+GAME_BETS = {
+    '百家乐': (['庄', '闲', '和', '庄对', '闲对'], [0.46, 0.44, 0.05, 0.025, 0.025]),
+    '龙虎': (['龙', '虎', '和'], [0.47, 0.47, 0.06])
+}
+# 植入对刷组使用的对立玩法
+GAME_OPPOSITES = {'百家乐': ('庄', '闲'), '龙虎': ('龙', '虎')}
+# 各游戏的桌号前缀
+TABLE_PREFIXES = {'百家乐': 'BJ', '龙虎': 'LH'}
+
+# 与必要列一起输出的附加列
+EXTRA_COLUMNS = ['注单号', '下注时间', '桌台', '派彩', '结算状态']
+TITLE_ROWS = [['投注明细报表'], ['导出时间: 2025-01-31 23:59:59'], ['数据范围: 全部游戏']]
+
+# 下注额度的文本格式
+FULLWIDTH_DIGITS = {v: k for k, v in FULLWIDTH_DIGIT_TABLE.items()}
+AMOUNT_STYLES = {
+    'plain': lambda v: f"{v:.0f}" if v == int(v) else f"{v:.2f}",
+    'decimal': lambda v: f"{v:.2f}",
+    'thousands': lambda v: f"{v:,.2f}",
+    'yuan': lambda v: f"¥{v:,.0f}",
+    'fullwidth_yuan': lambda v: f"￥{v:.2f}",
+    'labelled': lambda v: f"投注额：{v:,.0f}",
+    'colon': lambda v: f"RMB:{v:.0f}",
+    'fullwidth': lambda v: f"{v:.0f}".translate(FULLWIDTH_DIGITS)
+}
+
+
+def parse_size(text):
+    """解析带k/M后缀的行数，如10k、2.5M"""
+    text = str(text).strip().lower()
+    multiplier = {'k': 10 ** 3, 'm': 10 ** 6}.get(text[-1:], 1)
+    if multiplier > 1:
+        text = text[:-1]
+    return int(float(text) * multiplier)
+
+
+class SpellingPool:
+    """列名、游戏类型、下注玩法和金额格式的可选写法，只保留能被检测器正确识别的写法"""
+    def __init__(self, encoding):
+        self.encoding = encoding
+        self.config = BaccaratConfig()
+        self.processor = BaccaratDataProcessor(self.config, HeadlessUI())
+
+        bet_normalizer = BetTypeNormalizer()
+        self.bets = {}
+        for bets, _ in GAME_BETS.values():
+            for bet in bets:
+                self.bets[bet] = self._valid_spellings(
+                    self.config.bet_type_variants[bet], lambda text, bet=bet: bet_normalizer.normalize_bet_type(text) == bet
+                )
+
+        game_identifier = GameTypeIdentifier()
+        self.games = {
+            game: self._valid_spellings(
+                self.config.game_type_variants[game], lambda text, game=game: game_identifier.identify_game_type(text) == game
+            )
+            for game in GAME_BETS
+        }
+
+        samples = [10.0, 880.0, 1234.5, 25000.0]
+        self.amount_styles = [
+            name for name, style in AMOUNT_STYLES.items()
+            if self._encodable(style(samples[-1])) and self._parses(style, samples)
+        ]
+
+        self.columns = {
+            column: [name for name in dict.fromkeys(names) if self._encodable(name)]
+            for column, names in self.config.column_mappings.items()
+        }
+
+    def _encodable(self, text):
+        try:
+            text.encode(self.encoding)
+            return True
+        except UnicodeEncodeError:
+            return False
+
+    def _valid_spellings(self, variants, is_valid):
+        """去重后保留可编码、且标准化结果正确的写法"""
+        spellings = [text for text in dict.fromkeys(variants) if text == text.strip() and self._encodable(text) and is_valid(text)]
+        if not spellings:
+            raise ValueError(f"没有可用的写法: {variants[:3]}")
+        return spellings
+
+    def _parses(self, style, samples):
+        parsed, failures = self.processor.parse_amount_series(pd.Series([style(value) for value in samples]))
+        return failures == 0 and np.allclose(parsed.to_numpy(), samples)
+
+    def choose_layout(self, rng, file_format, max_attempts=100):
+        """随机选择表头行、列名写法和列顺序，并用检测器的表头识别逻辑校验"""
+        for _ in range(max_attempts):
+            names = {column: self.columns[column][rng.integers(len(self.columns[column]))] for column in self.columns}
+            extras = [EXTRA_COLUMNS[i] for i in sorted(rng.choice(len(EXTRA_COLUMNS), rng.integers(len(EXTRA_COLUMNS) + 1), replace=False))]
+            order = list(names) + extras
+            order = [order[i] for i in rng.permutation(len(order))]
+            titles = TITLE_ROWS[:rng.integers(len(TITLE_ROWS) + 1)]
+            header = [names.get(column, column) for column in order]
+            if self._layout_is_recognized(titles, header, order, file_format):
+                return titles, header, order
+
+        # 随机写法都无法识别时使用标准列名
+        order = list(self.columns)
+        return [], order, order
+
+    def _layout_is_recognized(self, titles, header, order, file_format):
+        if len(set(header)) != len(header):
+            return False
+        # 表头行必须能被直接定位：数据行中的"和局"等写法也会被当作表头线索，
+        # 因此在最前面加一行占位，要求在表头行本身找到关键词
+        sample = [['-']] + titles + [header]
+        start_row, start_col = self.processor.find_data_start(pd.DataFrame(sample))
+        if start_row != len(titles) + 1 and not (not titles and start_row == 0 and start_col > 0):
+            return False
+
+        positions = self.processor.resolve_column_positions(header[start_col:])
+        for column in self.columns:
+            if column not in positions or order[start_col + positions[column]] != column:
+                return False
+
+        if file_format == 'csv':
+            # 文件开头的编码探测须识别为生成时使用的编码
+            text = ''.join(','.join(row) + '\n' for row in titles + [header])
+            encoding, _ = self.processor.sniff_csv(io.BytesIO(text.encode(self.encoding)))
+            if encoding != self.encoding:
+                return False
+        return True
+
+    def spell(self, values, spellings, primary, mix, rng):
+        """按标准值输出写法：大部分用文件的主写法，mix比例随机使用其他写法"""
+        output = np.empty(len(values), dtype=object)
+        for standard, variants in spellings.items():
+            mask = values == standard
+            count = int(mask.sum())
+            if count == 0:
+                continue
+            choice = np.where(rng.random(count) < mix, rng.integers(len(variants), size=count), primary[standard])
+            output[mask] = np.asarray(variants, dtype=object)[choice]
+        return output
+
+    def format_amounts(self, amounts, primary_style, mix, rng):
+        """按金额格式输出下注额度文本，相同金额只格式化一次"""
+        styles = np.where(rng.random(len(amounts)) < mix, rng.integers(len(self.amount_styles), size=len(amounts)), primary_style)
+        output = np.empty(len(amounts), dtype=object)
+        for style_index in np.unique(styles):
+            mask = styles == style_index
+            style = AMOUNT_STYLES[self.amount_styles[style_index]]
+            codes, uniques = pd.factorize(amounts[mask])
+            output[mask] = np.asarray([style(value) for value in uniques], dtype=object)[codes]
+        return output
+
+
+class SyntheticBetGenerator:
+    """按桌、按局生成模拟投注记录，并在指定的连续局中植入对刷组"""
+    def __init__(self, rows, seed=0, accounts=None, bets_per_round=30, rounds_per_table=1200,
+                 ring_sizes=(1, 2, 3, 4), rings_per_size=None, ring_rounds=(4, 12), chunk_rows=1000000):
+        self.rows = rows
+        self.seed = seed
+        self.rng = np.random.default_rng(seed)
+        self.chunk_rows = chunk_rows
+        self.ring_sizes = list(ring_sizes)
+        self.rings_per_size = rings_per_size if rings_per_size is not None else int(np.clip(rows // 500000, 2, 200))
+        self.ring_rounds = ring_rounds
+
+        # 植入对刷组的行数预先估算，其余为普通投注
+        ring_account_count = sum(max(size, 1) for size in self.ring_sizes) * self.rings_per_size
+        planted_rows_estimate = sum(2 if size == 1 else size for size in self.ring_sizes) * self.rings_per_size * ring_rounds[1]
+        if planted_rows_estimate * 2 > rows:
+            raise ValueError(f"行数太少，无法植入{len(self.ring_sizes) * self.rings_per_size}个对刷组")
+
+        self.n_accounts = accounts or max(200, rows // 100)
+        if ring_account_count * 2 > self.n_accounts:
+            raise ValueError(f"账户数太少，无法为{len(self.ring_sizes) * self.rings_per_size}个对刷组分配成员")
+        self.account_names = self._account_names(self.n_accounts)
+        # 账户活跃度呈长尾分布，少数账户下注很多
+        weights = 1.0 / (np.arange(self.n_accounts) + 10.0) ** 0.8
+        self.account_weights = weights[self.rng.permutation(self.n_accounts)] / weights.sum()
+        # 对刷组成员从普通账户中抽取，植入的局之外也有普通投注
+        self.ring_account_codes = self.rng.choice(self.n_accounts, size=ring_account_count, replace=False)
+
+        n_rounds = max(1, (rows - planted_rows_estimate) // max(bets_per_round, 2))
+        self.n_tables = max(2, math.ceil(n_rounds / rounds_per_table))
+        self.rounds_per_table = math.ceil(n_rounds / self.n_tables)
+        if self.rounds_per_table < ring_rounds[1]:
+            raise ValueError("每桌局数少于对刷组的连续局数")
+        self.table_games = np.where(self.rng.random(self.n_tables) < 0.75, '百家乐', '龙虎').astype(object)
+        self.table_games[:2] = ['百家乐', '龙虎']
+        self.table_prefixes = [f"{TABLE_PREFIXES[game]}{i + 1:02d}-" for i, game in enumerate(self.table_games)]
+        self.table_starts = self.rng.integers(100000, 900000, size=self.n_tables)
+
+        self.rings, self.ring_bets = self._plant_rings()
+        self.noise_rows = rows - len(self.ring_bets)
+        self.round_sizes = self._round_sizes(self.n_tables * self.rounds_per_table, bets_per_round)
+
+    def _account_names(self, count):
+        prefixes = np.array(['vip', 'hy', 'user', 'mb', 'cc', 'a8', 'qq', 'lx'], dtype=object)
+        numbers = self.rng.choice(10 ** 7, size=count, replace=False)
+        return [f"{prefix}{number:07d}" for prefix, number in zip(prefixes[numbers % len(prefixes)], numbers)]
+
+    def _round_sizes(self, n_rounds, bets_per_round):
+        """每局的普通投注数，负二项分布，总数调整为目标行数"""
+        sizes = self.rng.negative_binomial(3, 3 / (3 + bets_per_round), size=n_rounds) + 1
+        if self.noise_rows < n_rounds:
+            raise ValueError("行数少于局数，请减小每桌局数或增加行数")
+        sizes = np.maximum(1, np.floor(sizes * self.noise_rows / sizes.sum())).astype(np.int64)
+        diff = self.noise_rows - int(sizes.sum())
+        if diff > 0:
+            np.add.at(sizes, self.rng.integers(n_rounds, size=diff), 1)
+        while diff < 0:
+            shrink = np.flatnonzero(sizes > 1)[:-diff]
+            sizes[shrink] -= 1
+            diff = self.noise_rows - int(sizes.sum())
+        return sizes
+
+    def _period(self, table, sequence):
+        return f"{self.table_prefixes[table]}{self.table_starts[table] + sequence}"
+
+    def _round_position(self, table, sequence):
+        """局在输出中的顺序：各桌同时开局，按局序号再按桌排列"""
+        return sequence * self.n_tables + table
+
+    def _close_amounts(self, base, count):
+        """围绕基准金额生成若干个接近的金额（10的倍数），任意两笔的比值不低于0.95"""
+        amounts = np.round(base * self.rng.uniform(0.97, 1.0, size=count) / 10) * 10
+        return np.maximum(10, amounts).tolist()
+
+    def _plant_rings(self):
+        """在随机桌的连续局中植入对刷组 - 返回(真值列表, 植入的投注记录)"""
+        rings = []
+        bets = []
+        planted_keys = []
+        next_account = 0
+        ring_id = 0
+        for size in self.ring_sizes:
+            for _ in range(self.rings_per_size):
+                ring_id += 1
+                table = int(self.rng.integers(self.n_tables))
+                game = self.table_games[table]
+                side1, side2 = GAME_OPPOSITES[game]
+                length = int(self.rng.integers(self.ring_rounds[0], self.ring_rounds[1] + 1))
+                start = int(self.rng.integers(self.rounds_per_table - length + 1))
+                codes = self.ring_account_codes[next_account:next_account + max(size, 1)].tolist()
+                accounts = [self.account_names[code] for code in codes]
+                next_account += max(size, 1)
+                side1_count = int(self.rng.integers(1, size)) if size > 1 else 1
+
+                for sequence in range(start, start + length):
+                    period = self._period(table, sequence)
+                    position = self._round_position(table, sequence)
+                    planted_keys.extend(position * self.n_accounts + code for code in codes)
+                    base = float(self.rng.choice([500, 1000, 2000, 3000, 5000, 10000, 20000]))
+                    if size == 1:
+                        # 同一账户同局下注对立两面，金额接近
+                        amounts = [base, max(10.0, round(base * self.rng.uniform(0.9, 1.0) / 10) * 10)]
+                        rows = [(accounts[0], side1, amounts[0]), (accounts[0], side2, amounts[1])]
+                    else:
+                        # 多账户分两侧下注，每个账户的金额都接近（检测器按组内最小/最大金额计算相似度）；
+                        # 每局可能互换账户所在的一侧
+                        members = [accounts[i] for i in self.rng.permutation(size)] if self.rng.random() < 0.3 else accounts
+                        sides = [side1] * side1_count + [side2] * (size - side1_count)
+                        rows = list(zip(members, sides, self._close_amounts(base, size)))
+                    for account, bet, amount in rows:
+                        bets.append((position, account, period, game, bet, float(amount)))
+
+                rings.append({
+                    '编号': f"R{ring_id:04d}",
+                    '检测类型': '单账户对刷' if size == 1 else '多账户对刷',
+                    '账户数量': max(size, 1),
+                    '账户组': sorted(accounts),
+                    '游戏类型': game,
+                    '桌': self.table_prefixes[table],
+                    '对立类型': f"{side1}-{side2}",
+                    '起始局号': self._period(table, start),
+                    '结束局号': self._period(table, start + length - 1),
+                    '对刷局数': length
+                })
+
+        ring_bets = pd.DataFrame(bets, columns=['位置', '会员账号', '局号', '游戏类型', '下注玩法', '投注金额'])
+        # (局位置, 账户编码)，对刷组成员在这些局中只下植入的注
+        self.planted_keys = np.unique(np.asarray(planted_keys, dtype=np.int64))
+        return rings, ring_bets
+
+    def _chip_amounts(self, count):
+        """常见筹码面额附近的投注金额"""
+        raw = np.exp(self.rng.normal(np.log(200), 1.1, size=count))
+        unit = np.where(raw < 100, 10, np.where(raw < 1000, 50, 100))
+        return np.maximum(10, np.round(raw / unit) * unit)
+
+    def iter_chunks(self):
+        """按局分块生成投注记录（标准化取值），每块约chunk_rows行"""
+        ends = np.cumsum(self.round_sizes)
+        start_round = 0
+        ring_positions = self.ring_bets['位置'].to_numpy()
+        while start_round < len(self.round_sizes):
+            offset = ends[start_round - 1] if start_round else 0
+            end_round = int(np.searchsorted(ends, offset + self.chunk_rows, side='right'))
+            end_round = max(end_round, start_round + 1)
+
+            sizes = self.round_sizes[start_round:end_round]
+            positions = np.repeat(np.arange(start_round, end_round), sizes)
+            tables = positions % self.n_tables
+            games = self.table_games[tables]
+
+            accounts = self.rng.choice(self.n_accounts, size=len(positions), p=self.account_weights)
+            # 落在对刷组成员植入局中的普通投注改由其他账户下，保证植入的金额不被主注规则改变
+            conflict = np.isin(positions * self.n_accounts + accounts, self.planted_keys)
+            while conflict.any():
+                accounts[conflict] = self.rng.choice(self.n_accounts, size=int(conflict.sum()), p=self.account_weights)
+                conflict = np.isin(positions * self.n_accounts + accounts, self.planted_keys)
+            bets = np.empty(len(positions), dtype=object)
+            for game, (choices, probabilities) in GAME_BETS.items():
+                mask = games == game
+                bets[mask] = self.rng.choice(np.asarray(choices, dtype=object), size=int(mask.sum()), p=probabilities)
+            chunk = pd.DataFrame({
+                '位置': positions,
+                '账户编码': accounts,
+                '下注玩法': bets,
+                '投注金额': self._chip_amounts(len(positions))
+            })
+            # 普通账户在同一局多次下注时保持同一方向
+            chunk['下注玩法'] = chunk.groupby(['位置', '账户编码'], sort=False)['下注玩法'].transform('first')
+
+            unique_positions, inverse = np.unique(positions, return_inverse=True)
+            periods = np.asarray([
+                self._period(position % self.n_tables, position // self.n_tables) for position in unique_positions
+            ], dtype=object)
+            chunk = pd.DataFrame({
+                '位置': positions,
+                '会员账号': np.asarray(self.account_names, dtype=object)[accounts],
+                '局号': periods[inverse],
+                '游戏类型': games,
+                '下注玩法': chunk['下注玩法'].to_numpy(),
+                '投注金额': chunk['投注金额'].to_numpy()
+            })
+
+            planted = self.ring_bets[(ring_positions >= start_round) & (ring_positions < end_round)]
+            if len(planted):
+                chunk = pd.concat([chunk, planted], ignore_index=True)
+            # 同一局内的记录打乱顺序
+            order = np.lexsort((self.rng.random(len(chunk)), chunk['位置'].to_numpy()))
+            yield chunk.iloc[order].reset_index(drop=True)
+            start_round = end_round
+
+
+class RawFileWriter:
+    """把标准化取值转为导出文件的写法，写出CSV或XLSX"""
+    def __init__(self, path, file_format, pool, generator, mix=0.1, encoding='utf-8'):
+        self.path = path
+        self.file_format = file_format
+        self.pool = pool
+        self.generator = generator
+        self.mix = mix
+        self.rng = np.random.default_rng(generator.seed + 1)
+        self.titles, self.header, self.order = pool.choose_layout(self.rng, file_format)
+
+        self.bet_primary = {bet: int(self.rng.integers(len(variants))) for bet, variants in pool.bets.items()}
+        self.amount_style = int(self.rng.integers(len(pool.amount_styles)))
+        # 每张桌的游戏名称固定
+        self.table_game_names = np.asarray([
+            pool.games[game][self.rng.integers(len(pool.games[game]))] for game in generator.table_games
+        ], dtype=object)
+        self.base_time = np.datetime64('2025-01-01T00:00:00')
+        self.ticket = 10 ** 9
+
+        if file_format == 'csv':
+            self.file = open(path, 'w', encoding=CSV_OUTPUT_ENCODINGS[encoding], newline='')
+            pd.DataFrame(self.titles).to_csv(self.file, header=False, index=False)
+            pd.DataFrame([self.header]).to_csv(self.file, header=False, index=False)
+        else:
+            self.workbook = Workbook(write_only=True)
+            self.sheet = None
+            self.sheet_rows = 0
+
+    def describe(self):
+        return {
+            '表头': self.header,
+            '标题行数': len(self.titles),
+            '金额格式': self.pool.amount_styles[self.amount_style],
+            '下注玩法写法': {bet: self.pool.bets[bet][index] for bet, index in self.bet_primary.items()}
+        }
+
+    def _raw_columns(self, chunk):
+        positions = chunk['位置'].to_numpy()
+        tables = positions % self.generator.n_tables
+        amounts = chunk['投注金额'].to_numpy()
+        columns = {
+            '会员账号': chunk['会员账号'].to_numpy(),
+            '局号': chunk['局号'].to_numpy(),
+            '游戏类型': self.table_game_names[tables],
+            '下注玩法': self.pool.spell(chunk['下注玩法'].to_numpy(), self.pool.bets, self.bet_primary, self.mix, self.rng)
+        }
+        if self.file_format == 'xlsx' and self.pool.amount_styles[self.amount_style] == 'plain':
+            columns['下注额度'] = amounts
+        else:
+            columns['下注额度'] = self.pool.format_amounts(amounts, self.amount_style, self.mix, self.rng)
+
+        if '注单号' in self.order:
+            columns['注单号'] = np.char.mod('%d', np.arange(self.ticket, self.ticket + len(chunk))).astype(object)
+            self.ticket += len(chunk)
+        if '下注时间' in self.order:
+            seconds = (positions // self.generator.n_tables) * 75 + self.rng.integers(0, 45, size=len(chunk))
+            times = pd.Series(self.base_time + seconds.astype('timedelta64[s]'))
+            columns['下注时间'] = times.dt.strftime('%Y-%m-%d %H:%M:%S').to_numpy(dtype=object)
+        if '桌台' in self.order:
+            columns['桌台'] = np.asarray(self.generator.table_prefixes, dtype=object)[tables]
+        if '派彩' in self.order:
+            payout = np.where(self.rng.random(len(chunk)) < 0.48, amounts * 1.95, 0.0)
+            columns['派彩'] = np.round(payout, 2)
+        if '结算状态' in self.order:
+            columns['结算状态'] = '已结算'
+        return pd.DataFrame(columns, index=chunk.index)[self.order]
+
+    def write(self, chunk):
+        frame = self._raw_columns(chunk)
+        if self.file_format == 'csv':
+            frame.to_csv(self.file, header=False, index=False)
+            return
+
+        for row in frame.itertuples(index=False, name=None):
+            if self.sheet is None or self.sheet_rows >= EXCEL_MAX_ROWS:
+                # 超出单表行数上限时续写到新的工作表，每个工作表都有表头
+                self.sheet = self.workbook.create_sheet(f"投注明细{len(self.workbook.worksheets) + 1}")
+                for title in self.titles:
+                    self.sheet.append(title)
+                self.sheet.append(self.header)
+                self.sheet_rows = len(self.titles) + 1
+            self.sheet.append(row)
+            self.sheet_rows += 1
+
+    def close(self):
+        if self.file_format == 'csv':
+            self.file.close()
+        else:
+            self.workbook.save(self.path)
+
+
+class SnapshotWriter:
+    """按数据快照格式（标准化核心数据）分块写出Parquet，检测时可跳过解析
+
+    快照元数据存放在Arrow schema中，必须在写入第一块之前确定，
+    因此编码字典取生成器可能产生的全部取值；加载后select_valid_records会去掉未出现的取值。
+    """
+    def __init__(self, path, generator):
+        self.path = path
+        self.generator = generator
+        periods = [
+            generator._period(table, sequence)
+            for table in range(generator.n_tables) for sequence in range(generator.rounds_per_table)
+        ]
+        self.code_maps = {
+            '会员账号': pd.Index(sorted(generator.account_names)),
+            '局号': pd.Index(sorted(periods)),
+            '标准化游戏类型': pd.Index(sorted(GAME_BETS)),
+            '标准化下注玩法': pd.Index(sorted({bet for bets, _ in GAME_BETS.values() for bet in bets}))
+        }
+        metadata = {
+            'version': SNAPSHOT_VERSION,
+            'source_fingerprint': f"synthetic:{generator.rows}:{generator.seed}",
+            'total_records': generator.rows,
+            'amount_parse_failures': 0,
+            'code_maps': {column: values.tolist() for column, values in self.code_maps.items()}
+        }
+        self.schema = pa.schema(
+            [(column, pa.dictionary(pa.int32(), pa.string())) for column in CORE_CODE_COLUMNS]
+            + [(AMOUNT_CENTS_COLUMN, pa.int64())],
+            metadata={SNAPSHOT_METADATA_KEY: json.dumps(metadata, ensure_ascii=False).encode('utf-8')}
+        )
+        self.dictionaries = {column: pa.array(values.to_numpy(dtype=object), type=pa.string())
+                             for column, values in self.code_maps.items()}
+        self.writer = pq.ParquetWriter(path, self.schema, compression=BaccaratConfig().snapshot_compression)
+
+    def describe(self):
+        return {'格式': '数据快照'}
+
+    def write(self, chunk):
+        values = {
+            '会员账号': chunk['会员账号'],
+            '局号': chunk['局号'],
+            '标准化游戏类型': chunk['游戏类型'],
+            '标准化下注玩法': chunk['下注玩法']
+        }
+        arrays = []
+        for column in CORE_CODE_COLUMNS:
+            codes = self.code_maps[column].get_indexer(values[column].to_numpy())
+            arrays.append(pa.DictionaryArray.from_arrays(pa.array(codes.astype(np.int32)), self.dictionaries[column]))
+        arrays.append(pa.array(np.rint(chunk['投注金额'].to_numpy() * 100).astype(np.int64)))
+        self.writer.write_table(pa.Table.from_arrays(arrays, schema=self.schema))
+
+    def close(self):
+        self.writer.close()
+
+
+def score_recall(patterns, ground_truth):
+    """按植入的对刷组计算检测召回率：账户组和游戏类型完全一致记为命中，只检出部分账户记为部分命中"""
+    rings = ground_truth['rings'] if isinstance(ground_truth, dict) else ground_truth
+    detected = {(frozenset(pattern['账户组']), pattern['游戏类型']) for pattern in patterns}
+    detected_by_game = {}
+    for accounts, game in detected:
+        detected_by_game.setdefault(game, []).append(accounts)
+
+    by_size = {}
+    missed = []
+    for ring in rings:
+        accounts = frozenset(ring['账户组'])
+        stats = by_size.setdefault(ring['账户数量'], {'植入数': 0, '命中数': 0, '部分命中数': 0})
+        stats['植入数'] += 1
+        if (accounts, ring['游戏类型']) in detected:
+            stats['命中数'] += 1
+        elif any(len(found) > 1 and found < accounts for found in detected_by_game.get(ring['游戏类型'], [])):
+            stats['部分命中数'] += 1
+        else:
+            missed.append(ring['编号'])
+
+    for stats in by_size.values():
+        stats['召回率'] = stats['命中数'] / stats['植入数']
+    total = sum(stats['植入数'] for stats in by_size.values())
+    hits = sum(stats['命中数'] for stats in by_size.values())
+    return {
+        '植入数': total,
+        '命中数': hits,
+        '召回率': hits / total if total else None,
+        '按账户数': {size: by_size[size] for size in sorted(by_size)},
+        '未检出': missed
+    }
+
+
+def ground_truth_path(output_path):
+    return f"{os.path.splitext(output_path)[0]}_ground_truth.json"
+
+
+def generate(output_path, file_format, rows, encoding='utf-8', mix=0.1, **generator_options):
+    """生成测试数据文件和真值文件，返回真值字典"""
+    generator = SyntheticBetGenerator(rows, **generator_options)
+    if file_format == 'parquet':
+        writer = SnapshotWriter(output_path, generator)
+    else:
+        pool = SpellingPool(CSV_OUTPUT_ENCODINGS[encoding] if file_format == 'csv' else 'utf-8')
+        writer = RawFileWriter(output_path, file_format, pool, generator, mix, encoding)
+
+    written = 0
+    try:
+        for chunk in generator.iter_chunks():
+            writer.write(chunk)
+            written += len(chunk)
+            logger.info(f"已生成 {written:,}/{rows:,} 行")
+    finally:
+        writer.close()
+
+    ground_truth = {
+        'file': os.path.basename(output_path),
+        'format': file_format,
+        'encoding': encoding if file_format == 'csv' else None,
+        'rows': written,
+        'seed': generator.seed,
+        'generator_version': GENERATOR_VERSION,
+        'accounts': generator.n_accounts,
+        'tables': generator.n_tables,
+        'rounds_per_table': generator.rounds_per_table,
+        'layout': writer.describe(),
+        'generated_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        'rings': generator.rings
+    }
+    with open(ground_truth_path(output_path), 'w', encoding='utf-8') as f:
+        json.dump(ground_truth, f, ensure_ascii=False, indent=2)
+    return ground_truth
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="百家乐对刷检测 - 模拟测试数据生成")
+    parser.add_argument('--rows', default='100k', help="生成的记录数，支持k/M后缀（如10k、50M）")
+    parser.add_argument('--format', choices=OUTPUT_FORMATS, default='csv',
+                        help="输出格式：csv/xlsx为原始导出文件，parquet为数据快照")
+    parser.add_argument('--output', help="输出文件路径（默认synthetic_{行数}.{格式}）")
+    parser.add_argument('--encoding', choices=list(CSV_OUTPUT_ENCODINGS), default='utf-8', help="CSV文件编码")
+    parser.add_argument('--seed', type=int, default=0, help="随机种子，相同参数和种子生成相同数据")
+    parser.add_argument('--accounts', type=int, default=None, help="账户数，对刷组成员从中抽取（默认行数/100）")
+    parser.add_argument('--bets-per-round', type=int, default=30, help="每局平均投注数")
+    parser.add_argument('--rounds-per-table', type=int, default=1200, help="每桌局数")
+    parser.add_argument('--ring-sizes', default='1,2,3,4', help="植入对刷组的账户数，1为单账户对刷")
+    parser.add_argument('--rings-per-size', type=int, default=None, help="每种账户数植入的对刷组数（默认按行数）")
+    parser.add_argument('--ring-rounds', default='4,12', help="对刷组连续局数范围，如4,12")
+    parser.add_argument('--variant-mix', type=float, default=0.1, help="使用非主写法的下注玩法和金额格式比例")
+    parser.add_argument('--chunk-rows', type=int, default=1000000, help="分块生成的行数")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """命令行入口，返回进程退出码"""
+    args = parse_args(argv)
+    rows = parse_size(args.rows)
+    output = args.output or f"synthetic_{args.rows}.{args.format}"
+    if os.path.dirname(output):
+        os.makedirs(os.path.dirname(output), exist_ok=True)
+    if args.format == 'xlsx' and rows > 5 * EXCEL_MAX_ROWS:
+        logger.warning("XLSX行数很多，生成和读取都会很慢")
+
+    ring_rounds = tuple(int(value) for value in args.ring_rounds.split(','))
+    ground_truth = generate(
+        output, args.format, rows, args.encoding, args.variant_mix,
+        seed=args.seed,
+        accounts=args.accounts,
+        bets_per_round=args.bets_per_round,
+        rounds_per_table=args.rounds_per_table,
+        ring_sizes=[int(value) for value in args.ring_sizes.split(',')],
+        rings_per_size=args.rings_per_size,
+        ring_rounds=ring_rounds,
+        chunk_rows=args.chunk_rows
+    )
+    logger.info(
+        f"已生成 {output}: {ground_truth['rows']:,} 行, {ground_truth['tables']} 张桌, "
+        f"植入 {len(ground_truth['rings'])} 个对刷组, 真值文件: {ground_truth_path(output)}"
+    )
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,257 @@
+"""百家乐对刷检测参考实现 - 逐局、逐账户组合的纯Python实现，作为快速检测引擎的对照基准
+
+与BaccaratWashTradeDetector的检测规则保持一致，但不使用任何向量化、缓存、预过滤或并行：
+- 单账户：同一账户同一局同时下注互斥玩法的两面，两面金额（同一玩法多笔相加）的相似度达到阈值；
+- 多账户：每个账户每局取金额最大的一笔作为主注（金额相同时取最先出现的一笔），
+  同一局对立两面的主注中任取k个账户（两面都要有人），组内最小金额/最大金额达到k账户阈值；
+- 连续性：每桌（游戏类型+局号前缀）按局号末尾数字的自然顺序编号，
+  同一账户组的最长连续局数达到最小连续局数时输出。
+
+这里的代码刻意保持简单直接，修改检测规则时须同时修改两边，并用equivalence_check.py确认一致。
+"""
+import re
+from collections import defaultdict
+from itertools import combinations
+
+import numpy as np
+
+from streamlit_app import AMOUNT_CENTS_COLUMN
+
+PERIOD_PATTERN = re.compile(r'^(.*?)(\d+)$')
+
+
+class ReferenceDetector:
+    """对刷检测参考实现，输入为标准化核心数据（与select_valid_records的输入相同）"""
+    def __init__(self, config):
+        self.config = config
+        self.records = []
+        self.account_periods = {}
+
+    def load(self, normalized):
+        """按最小投注金额过滤，逐行解码为(账户, 局号, 游戏类型, 下注玩法, 金额)"""
+        min_amount_cents = int(round(self.config.min_amount * 100))
+        self.records = []
+        for account, period, game_type, bet_type, cents in zip(
+            normalized['会员账号'].astype(object).tolist(),
+            normalized['局号'].astype(object).tolist(),
+            normalized['标准化游戏类型'].astype(object).tolist(),
+            normalized['标准化下注玩法'].astype(object).tolist(),
+            normalized[AMOUNT_CENTS_COLUMN].tolist()
+        ):
+            if cents >= min_amount_cents:
+                self.records.append((account, period, game_type, bet_type, cents / 100))
+
+        periods = defaultdict(set)
+        for account, period, game_type, _, _ in self.records:
+            periods[(game_type, account)].add(period)
+        self.account_periods = {key: len(value) for key, value in periods.items()}
+
+    def detect_all_wash_trades(self, normalized):
+        patterns = self.detect_round_patterns(normalized)
+        return self.find_continuous_patterns(patterns)
+
+    def detect_round_patterns(self, normalized):
+        """逐局模式：单账户和2到max_accounts_in_group个账户"""
+        self.load(normalized)
+        patterns = self.detect_single_account_wash_trades()
+        for n_accounts in range(2, self.config.max_accounts_in_group + 1):
+            patterns.extend(self.detect_multi_account_wash_trades(n_accounts))
+        return patterns
+
+    def detect_single_account_wash_trades(self):
+        bet_types_known = set(self.config.bet_type_variants)
+        groups = defaultdict(list)
+        for account, period, game_type, bet_type, amount in self.records:
+            groups[(account, period, game_type)].append((bet_type, amount))
+
+        patterns = []
+        for (account, period, game_type), bets in groups.items():
+            bet_set = {bet_type for bet_type, _ in bets}
+            for exclusive_group in self.config.exclusive_bet_groups:
+                exclusive_list = list(exclusive_group)
+                if len(exclusive_list) != 2 or not all(bet in bet_types_known for bet in exclusive_list):
+                    continue
+                if not exclusive_group.issubset(bet_set):
+                    continue
+
+                bet1, bet2 = exclusive_list
+                amount1 = sum(amount for bet_type, amount in bets if bet_type == bet1)
+                amount2 = sum(amount for bet_type, amount in bets if bet_type == bet2)
+                similarity = min(amount1, amount2) / max(amount1, amount2) if max(amount1, amount2) > 0 else 0.0
+                if similarity < self.config.amount_similarity_threshold:
+                    continue
+                patterns.append({
+                    '局号': period,
+                    '游戏类型': game_type,
+                    '账户组': [account],
+                    '账户数量': 1,
+                    '下注玩法组': [bet1, bet2],
+                    '金额组': [amount1, amount2],
+                    '总金额': amount1 + amount2,
+                    '相似度': similarity,
+                    '模式': f'单账户对立下注-{bet1}vs{bet2}',
+                    '对立类型': f'{bet1}-{bet2}',
+                    '检测类型': '单账户对刷'
+                })
+        return patterns
+
+    def main_bets(self):
+        """每局每个账户的主注：{(局号, 游戏类型): [(账户, 下注玩法, 金额)]}，账户按该局首次出现顺序"""
+        rounds = defaultdict(dict)
+        for account, period, game_type, bet_type, amount in self.records:
+            bets = rounds[(period, game_type)]
+            # 只有严格更大的金额才替换，金额相同时保留最先出现的一笔
+            if account not in bets or amount > bets[account][1]:
+                bets[account] = (bet_type, amount)
+        return {
+            key: [(account, bet_type, amount) for account, (bet_type, amount) in bets.items()]
+            for key, bets in rounds.items()
+        }
+
+    def similarity_threshold(self, n_accounts):
+        thresholds = self.config.account_count_similarity_thresholds
+        if n_accounts in thresholds:
+            return thresholds[n_accounts]
+        smaller = [k for k in thresholds if k <= n_accounts]
+        return thresholds[max(smaller)] if smaller else max(thresholds.values())
+
+    def detect_multi_account_wash_trades(self, n_accounts):
+        min_similarity = self.similarity_threshold(n_accounts)
+        max_ratio = self.config.amount_threshold['max_amount_ratio']
+        check_ratio = n_accounts == 2 or self.config.amount_threshold['enable_threshold_filter']
+
+        patterns = []
+        for (period, game_type), bets in self.main_bets().items():
+            for opposite_group in self.config.opposite_groups:
+                opposite_list = list(opposite_group)
+                if len(opposite_list) != 2:
+                    continue
+                dir1, dir2 = opposite_list
+                bettors = [bet for bet in bets if bet[1] in (dir1, dir2)]
+
+                for group in combinations(bettors, n_accounts):
+                    bet_types = [bet_type for _, bet_type, _ in group]
+                    dir1_count = bet_types.count(dir1)
+                    if dir1_count == 0 or dir1_count == n_accounts:
+                        continue
+                    amounts = [amount for _, _, amount in group]
+                    low, high = min(amounts), max(amounts)
+                    if low <= 0 or low / high < min_similarity:
+                        continue
+                    if check_ratio and high / low > max_ratio:
+                        continue
+
+                    if n_accounts == 2:
+                        mode = f'多账户对立下注-{dir1}vs{dir2}'
+                    else:
+                        mode = f'多账户对立下注-{dir1}({dir1_count})vs{dir2}({n_accounts - dir1_count})'
+                    patterns.append({
+                        '局号': period,
+                        '游戏类型': game_type,
+                        '账户组': [account for account, _, _ in group],
+                        '账户数量': n_accounts,
+                        '下注玩法组': bet_types,
+                        '金额组': amounts,
+                        '总金额': sum(amounts),
+                        '相似度': low / high,
+                        '模式': mode,
+                        '对立类型': f'{dir1}-{dir2}',
+                        '检测类型': '多账户对刷'
+                    })
+        return patterns
+
+    def round_ordinals(self):
+        """{(游戏类型, 局号): ((游戏类型, 局号前缀), 桌内序号)}"""
+        tables = defaultdict(set)
+        for _, period, game_type, _, _ in self.records:
+            match = PERIOD_PATTERN.match(period)
+            prefix = period if match is None else match.group(1)
+            tables[(game_type, prefix)].add(period)
+
+        ordinals = {}
+        for table, periods in tables.items():
+            def natural_key(period):
+                match = PERIOD_PATTERN.match(period)
+                if match is None:
+                    return (True, 0, period)
+                return (False, int(match.group(2)), period)
+            for ordinal, period in enumerate(sorted(periods, key=natural_key)):
+                ordinals[(table[0], period)] = (table, ordinal)
+        return ordinals
+
+    def find_continuous_patterns(self, patterns):
+        ordinals = self.round_ordinals()
+        groups = defaultdict(list)
+        for pattern in patterns:
+            if pattern['检测类型'] == '单账户对刷':
+                key = (tuple(pattern['账户组']), pattern['对立类型'], '单账户')
+            else:
+                key = (tuple(sorted(pattern['账户组'])), pattern['对立类型'], '多账户')
+            groups[key].append(pattern)
+
+        results = []
+        for key, group_patterns in groups.items():
+            positioned = sorted(
+                (ordinals[(pattern['游戏类型'], pattern['局号'])], index, pattern)
+                for index, pattern in enumerate(group_patterns)
+            )
+
+            # 逐段扫描：同一桌局序号相差1时延续，同一局的多个模式只计一局
+            runs = []
+            for (table, ordinal), _, pattern in positioned:
+                if runs and runs[-1]['table'] == table and ordinal - runs[-1]['last'] <= 1:
+                    run = runs[-1]
+                    if ordinal != run['last']:
+                        run['rounds'] += 1
+                    run['last'] = ordinal
+                    run['end'] = pattern['局号']
+                else:
+                    runs.append({'table': table, 'last': ordinal, 'rounds': 1,
+                                 'start': pattern['局号'], 'end': pattern['局号']})
+
+            longest = max(runs, key=lambda run: run['rounds'])
+            if longest['rounds'] < self.config.min_continuous_periods:
+                continue
+
+            sorted_patterns = [pattern for _, _, pattern in positioned]
+            game_type = sorted_patterns[0]['游戏类型']
+            account_group = list(key[0])
+            activity_level = self.group_activity_level(account_group, game_type)
+            results.append({
+                '账户组': account_group,
+                '游戏类型': game_type,
+                '账户数量': len(account_group),
+                '对立类型': key[1],
+                '检测类型': key[2],
+                '对刷局数': len(sorted_patterns),
+                '总投注金额': sum(pattern['总金额'] for pattern in sorted_patterns),
+                '平均相似度': float(np.mean([pattern['相似度'] for pattern in sorted_patterns])),
+                '详细记录': sorted_patterns,
+                '账户活跃度': activity_level,
+                '要求最小对刷局数': self.required_min_periods(activity_level),
+                '最长连续局数': longest['rounds'],
+                '连续段数': sum(run['rounds'] >= self.config.min_continuous_periods for run in runs),
+                '最长连续区间': f"{longest['start']} ~ {longest['end']}"
+            })
+        return results
+
+    def group_activity_level(self, account_group, game_type):
+        if not any(key[0] == game_type for key in self.account_periods):
+            return 'unknown'
+        periods = min(self.account_periods.get((game_type, account), 0) for account in account_group)
+        thresholds = self.config.period_thresholds
+        if periods <= thresholds['low_activity']:
+            return 'low'
+        if periods <= thresholds['medium_activity_high']:
+            return 'medium'
+        if periods <= thresholds['high_activity_low']:
+            return 'high'
+        return 'very_high'
+
+    def required_min_periods(self, activity_level):
+        thresholds = self.config.period_thresholds
+        return {
+            'low': thresholds['min_periods_low'],
+            'medium': thresholds['min_periods_medium'],
+            'high': thresholds['min_periods_high']
+        }.get(activity_level, thresholds['min_periods_very_high'])
@@ -3,21 +3,86 @@ import pandas as pd
 import numpy as np
 import re
 import logging
-from collections import Counter, defaultdict
+import json
+import os
+import traceback
+import zipfile
+from bisect import bisect_right
+from collections import Counter, OrderedDict, defaultdict, deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import contextmanager
+from datetime import datetime
 from functools import lru_cache
+from itertools import chain, combinations, islice, repeat
+from operator import itemgetter
+import codecs
+import csv
 import hashlib
 import io
+import multiprocessing
+from multiprocessing import shared_memory
+import threading
 import warnings
 import time
+import tracemalloc
+from openpyxl import Workbook, load_workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font, Alignment
+from openpyxl.utils import get_column_letter
+import pyarrow as pa
+import pyarrow.feather as feather
+import pyarrow.parquet as pq
 warnings.filterwarnings('ignore')
 
-# 设置页面
-st.set_page_config(
-    page_title="智能彩票分析检测系统",
-    layout="wide",
-    initial_sidebar_state="expanded"
+logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+logger = logging.getLogger(__name__)
+
+# 核心数据中以分类整数编码存储的列
+CORE_CODE_COLUMNS = ['会员账号', '局号', '标准化游戏类型', '标准化下注玩法']
+# 核心数据中以分为单位存储的金额列
+AMOUNT_CENTS_COLUMN = '投注金额_分'
+
+# Excel数据中记录来源工作表的列
+SHEET_COLUMN = '工作表'
+
+# 解析缓存版本，标准化逻辑变化时递增
+INGEST_CACHE_VERSION = 2
+
+# 数据快照：格式版本、元数据键和支持的扩展名
+SNAPSHOT_VERSION = 1
+SNAPSHOT_METADATA_KEY = b'baccarat_snapshot'
+SNAPSHOT_EXTENSIONS = ('.parquet', '.feather')
+
+# CSV编码探测顺序（utf-8-sig同时兼容带BOM和不带BOM的UTF-8）
+CSV_ENCODINGS = ['utf-8-sig', 'gbk', 'gb2312', 'latin1']
+
+# 全角数字转半角
+FULLWIDTH_DIGIT_TABLE = str.maketrans('０１２３４５６７８９', '0123456789')
+
+# 局号拆分为前缀和末尾序号，同一游戏类型下前缀相同的局号属于同一桌
+PERIOD_NUMBER_PATTERN = re.compile(r'^(.*?)(\d+)$')
+
+# Excel单个工作表的最大行数，导出时超出的记录续写到新的工作表；列宽上限（字符数）
+EXCEL_MAX_ROWS = 1048576
+EXCEL_MAX_COLUMN_WIDTH = 50
+
+# 界面模式下模糊匹配结果的磁盘缓存文件；命令行等多进程入口默认不写，避免并发覆盖
+DEFAULT_VARIANT_CACHE_PATH = os.path.join(
+    os.path.expanduser('~'), '.cache', 'baccarat_wash_trade', 'variant_cache.json'
 )
 
+# 结果列表每页可选的对刷组数，每次只把当前页发送到浏览器
+RESULT_PAGE_SIZES = [25, 50, 100, 200]
+
+# 账户活跃度的显示文字
+ACTIVITY_LABELS = {
+    'low': '🟢 低活跃度',
+    'medium': '🟡 中活跃度',
+    'high': '🟠 高活跃度',
+    'very_high': '🔴 极高活跃度',
+    'unknown': '⚪ 未知活跃度'
+}
+
 # ==================== 配置类 ====================
 class BaccaratConfig:
     def __init__(self):
@@ -156,9 +221,65 @@ class BaccaratConfig:
             2: 0.8,   # 2个账户
             3: 0.85,  # 3个账户
             4: 0.9,   # 4个账户
-            5: 0.95   # 5个账户
+            5: 0.95,  # 5个账户
+            6: 0.95,  # 6个账户
+            7: 0.95,  # 7个账户
+            8: 0.95   # 8个账户
         }
         
+        # 模糊匹配结果的磁盘缓存文件，为None时不缓存（界面模式使用DEFAULT_VARIANT_CACHE_PATH）
+        self.variant_cache_path = None
+        
+        # 解析缓存容量（跨Streamlit重新运行复用标准化数据）
+        self.ingest_cache_max_entries = 4
+        self.ingest_cache_max_bytes = 2 * 1024 ** 3
+        
+        # CSV读取：用于探测编码和表头的前缀字节数，以及分块读取的行数
+        self.csv_sniff_bytes = 256 * 1024
+        self.csv_chunk_rows = 500000
+        
+        # Excel多工作表并行读取的最大进程数
+        self.excel_max_workers = min(4, os.cpu_count() or 1)
+        
+        # 数据快照压缩算法
+        self.snapshot_compression = 'zstd'
+        
+        # 候选缓存的相似度下限（与界面滑块最小值一致），阈值不低于该值时只需重新过滤；
+        # 3个及以上账户的搜索量随下限急剧增加，按当前阈值缓存，阈值放宽时才重新计算
+        self.candidate_similarity_floor = 0.5
+        
+        # 并行检测：进程数（1为串行）、启用并行的最少记录数、每个进程分配的局号分片数
+        self.detection_workers = 1
+        self.parallel_min_records = 200000
+        self.shards_per_worker = 4
+        
+        # 共同局数预过滤：多账户检测只保留共同下注局数不少于最小连续局数的账户对，
+        # 以及分块统计共同局数时每块的最大账户对数
+        self.shared_round_prefilter = True
+        self.shared_round_block_pairs = 2000000
+        
+        # 对冲关联检测：按局计算账户的带符号净敞口（庄/龙为正，闲/虎为负），
+        # 找出长期反向对冲的账户对；分块计算时每块的账户数
+        self.hedging_detection_enabled = False
+        self.hedging_bet_signs = {'庄': 1, '龙': 1, '闲': -1, '虎': -1}
+        self.hedging_min_score = 0.8  # 对冲得分（净敞口负相关系数）下限
+        self.hedging_min_rounds = 10  # 最少对冲局数（双方净敞口方向相反的局）
+        self.hedging_top_pairs = 100  # 最多输出的账户对数
+        self.hedging_block_accounts = 20000
+        
+        # 团伙聚合：检测结果中通过账户组相互连通、账户数不少于该值的账户集合作为一个团伙
+        self.ring_min_accounts = 3
+        
+        # 性能统计：是否用tracemalloc记录各阶段的内存峰值（检测阶段会慢数倍，默认关闭）
+        self.performance_trace_memory = False
+        
+        # 实时流检测：无新记录多久后强制关闭一局、账户组和账户的空闲淘汰时间（秒），
+        # 以及最多保留的账户组数和每组保留的最近记录数
+        self.stream_round_timeout_seconds = 300
+        self.stream_idle_window_seconds = 6 * 3600
+        self.stream_max_groups = 100000
+        self.stream_max_group_records = 50
+        
         # 账户局数差异阈值
         self.account_period_diff_threshold = 101
         
@@ -168,29 +289,192 @@ class BaccaratConfig:
             'enable_threshold_filter': True  # 启用金额阈值过滤
         }
 
+# ==================== 无界面运行支持 ====================
+class HeadlessUI:
+    """命令行等无界面运行时替代streamlit：错误和警告写入日志，其余界面调用忽略"""
+    def error(self, message, *args, **kwargs):
+        logger.error(message)
+    
+    def warning(self, message, *args, **kwargs):
+        logger.warning(message)
+    
+    def __getattr__(self, name):
+        return lambda *args, **kwargs: self
+    
+    def __enter__(self):
+        return self
+    
+    def __exit__(self, exc_type, exc_value, exc_traceback):
+        return False
+
+# ==================== 性能统计 ====================
+# 读取和标准化阶段，重新检测时保留这些阶段的统计
+INGEST_STAGES = ('读取文件', '列名识别', '金额解析', '过滤无效记录', '标准化', '读取快照')
+PREPARE_STAGES = INGEST_STAGES + ('金额过滤', '账户统计与局序号')
+
+class PerformanceTracker:
+    """记录流水线各阶段的耗时、输入输出行数、内存峰值和工作量计数"""
+    def __init__(self, stats=None, trace_memory=False):
+        self.stats = {} if stats is None else stats
+        self.trace_memory = trace_memory
+        self._active = []  # 进行中的阶段（嵌套时内层在后）
+        self._memory = []  # 进行中阶段的[起始内存, 已知峰值]
+        self._started_tracing = False
+    
+    @contextmanager
+    def stage(self, name, rows_in=None):
+        """统计一个阶段，在with块中可设置record['输出行数']"""
+        record = {'输入行数': rows_in, '输出行数': None, '计数': Counter()}
+        # 先占位，使统计表按阶段开始的顺序排列
+        self.stats.setdefault(name, {
+            '调用次数': 0, '耗时(秒)': 0.0, '输入行数': None, '输出行数': None,
+            '每秒行数': None, '内存峰值(MB)': None, '计数': {}
+        })
+        self._active.append(record)
+        tracing = self._enter_memory()
+        start = time.perf_counter()
+        try:
+            yield record
+        finally:
+            elapsed = time.perf_counter() - start
+            peak = self._exit_memory() if tracing else None
+            self._active.pop()
+            self._record(name, record, elapsed, peak)
+    
+    def reset(self, keep=()):
+        """清除统计，keep中的阶段保留"""
+        for name in [name for name in self.stats if name not in keep]:
+            del self.stats[name]
+    
+    def extract(self, names):
+        """指定阶段统计的副本，用于随解析缓存保存"""
+        return {name: {**stats, '计数': dict(stats['计数'])} for name, stats in self.stats.items() if name in names}
+    
+    def restore(self, stats):
+        """恢复extract保存的阶段统计"""
+        for name, values in stats.items():
+            self.stats[name] = {**values, '计数': dict(values['计数'])}
+    
+    def count(self, key, amount=1):
+        """累加当前阶段的工作量计数"""
+        if self._active:
+            self._active[-1]['计数'][key] += int(amount)
+    
+    def _enter_memory(self):
+        if not self.trace_memory:
+            return False
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._started_tracing = True
+        current, peak = tracemalloc.get_traced_memory()
+        # 外层阶段的峰值先记下，再为内层重置峰值
+        if self._memory:
+            self._memory[-1][1] = max(self._memory[-1][1], peak)
+        tracemalloc.reset_peak()
+        self._memory.append([current, current])
+        return True
+    
+    def _exit_memory(self):
+        _, peak = tracemalloc.get_traced_memory()
+        base, known_peak = self._memory.pop()
+        peak = max(peak, known_peak)
+        if self._memory:
+            self._memory[-1][1] = max(self._memory[-1][1], peak)
+        elif self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+        return (peak - base) / 1024 ** 2
+    
+    def _record(self, name, record, elapsed, peak):
+        """合并到该阶段的累计统计（同一阶段多次调用时累加）"""
+        stats = self.stats[name]
+        stats['调用次数'] += 1
+        stats['耗时(秒)'] += elapsed
+        for key in ['输入行数', '输出行数']:
+            if record[key] is not None:
+                stats[key] = (stats[key] or 0) + int(record[key])
+        if peak is not None:
+            stats['内存峰值(MB)'] = max(stats['内存峰值(MB)'] or 0.0, peak)
+        counters = Counter(stats['计数'])
+        counters.update(record['计数'])
+        stats['计数'] = dict(counters)
+        
+        rows = stats['输入行数'] if stats['输入行数'] is not None else stats['输出行数']
+        if rows is not None and stats['耗时(秒)'] > 0:
+            stats['每秒行数'] = rows / stats['耗时(秒)']
+    
+    def to_frame(self):
+        """统计表，每个阶段一行"""
+        rows = []
+        for name, stats in self.stats.items():
+            row = {'阶段': name, **stats}
+            row['计数'] = ', '.join(f"{key}: {value:,}" for key, value in stats['计数'].items())
+            rows.append(row)
+        return pd.DataFrame(rows)
+    
+    def to_json(self):
+        """统计数据的JSON文本"""
+        return json.dumps(self.stats, ensure_ascii=False, indent=2)
+
+# Excel多工作表并行读取子进程的上下文（由进程池初始化函数设置，只存在于子进程中）
+_excel_worker_context = {}
+
+
+def _init_excel_worker(processor, content):
+    """工作表读取子进程初始化：fork继承数据处理器和文件内容，不经过序列化"""
+    _excel_worker_context['processor'] = processor
+    _excel_worker_context['content'] = content
+    if tracemalloc.is_tracing():
+        tracemalloc.stop()
+
+
+def _read_excel_sheet_worker(sheet_name):
+    """工作表读取子进程任务：读取单个工作表"""
+    return _excel_worker_context['processor'].read_excel_sheet(_excel_worker_context['content'], sheet_name)
+
+
 # ==================== 数据处理器类 ====================
 class BaccaratDataProcessor:
-    def __init__(self):
+    def __init__(self, config=None, ui=None, tracker=None):
         self.required_columns = ['会员账号', '局号', '游戏类型', '下注玩法', '下注额度']
-        self.config = BaccaratConfig()
+        self.config = config or BaccaratConfig()
+        self.ui = ui or st
+        self.tracker = tracker or PerformanceTracker(trace_memory=self.config.performance_trace_memory)
         self.similarity_threshold = 0.7
+        self.amount_parse_failures = 0
         
         # 百家乐特定关键词
         self.baccarat_keywords = ['百家乐', 'Baccarat', 'bac', 'BJL', 'bjl', '百家樂']
         self.dragon_tiger_keywords = ['龙虎', '龙虎斗', 'Dragon Tiger', '龍虎', '龍虎鬥']
     
     def smart_column_identification(self, df_columns):
-        """智能列识别 - 支持百家乐数据"""
+        """智能列识别 - 支持百家乐数据，精确匹配优先，每个实际列只映射一个标准列"""
         identified_columns = {}
         actual_columns = [str(col).strip() for col in df_columns]
         
+        def normalize(name):
+            return name.lower().replace(' ', '').replace('_', '').replace('-', '')
+        
+        # 先做精确匹配，避免"游戏类型"被"下注玩法"的变体"类型"抢先匹配
+        for standard_col, possible_names in self.config.column_mappings.items():
+            possible_set = {normalize(name) for name in possible_names}
+            for actual_col in actual_columns:
+                if actual_col not in identified_columns and normalize(actual_col) in possible_set:
+                    identified_columns[actual_col] = standard_col
+                    break
+        
         for standard_col, possible_names in self.config.column_mappings.items():
+            if standard_col in identified_columns.values():
+                continue
+            
             found = False
             for actual_col in actual_columns:
-                actual_col_lower = actual_col.lower().replace(' ', '').replace('_', '').replace('-', '')
+                if not actual_col or actual_col in identified_columns:
+                    continue
+                actual_col_lower = normalize(actual_col)
                 
                 for possible_name in possible_names:
-                    possible_name_lower = possible_name.lower().replace(' ', '').replace('_', '').replace('-', '')
+                    possible_name_lower = normalize(possible_name)
                     
                     # 计算相似度
                     set1 = set(possible_name_lower)
@@ -211,9 +495,11 @@ class BaccaratDataProcessor:
                 if found:
                     break
             
-            # 如果没有找到匹配，但还有标准列未匹配，尝试模糊匹配
-            if not found and standard_col not in identified_columns.values():
+            # 如果没有找到匹配，尝试模糊匹配
+            if not found:
                 for actual_col in actual_columns:
+                    if not actual_col or actual_col in identified_columns:
+                        continue
                     actual_col_lower = actual_col.lower()
                     if standard_col in actual_col_lower or any(keyword in actual_col_lower for keyword in standard_col.lower()):
                         identified_columns[actual_col] = standard_col
@@ -221,6 +507,52 @@ class BaccaratDataProcessor:
         
         return identified_columns
     
+    def resolve_column_positions(self, header):
+        """根据表头确定标准列所在位置 - 返回{标准列: 列位置}"""
+        header = [str(col).strip() for col in header]
+        positions = {}
+        for actual_col, standard_col in self.smart_column_identification(header).items():
+            positions[standard_col] = header.index(actual_col)
+        used = set(positions.values())
+        
+        # 如果仍有缺失列，根据列名特征匹配剩余的列
+        keyword_rules = [
+            ('会员账号', ['会员', '账号', 'account']),
+            ('局号', ['局', 'round']),
+            ('游戏类型', ['游戏', 'game']),
+            ('下注玩法', ['玩法', 'bet', '下注']),
+            ('下注额度', ['金额', 'amount', '额度'])
+        ]
+        for idx, col in enumerate(header):
+            if idx in used:
+                continue
+            col_lower = col.lower()
+            for standard_col, keywords in keyword_rules:
+                if any(keyword in col_lower for keyword in keywords):
+                    if standard_col not in positions:
+                        positions[standard_col] = idx
+                        used.add(idx)
+                    break
+        
+        # 再次检查必要列，按位置分配
+        if len(positions) < len(self.required_columns) and len(header) >= 5:
+            for idx, standard_col in enumerate(self.required_columns):
+                if standard_col not in positions and idx not in used:
+                    positions[standard_col] = idx
+                    used.add(idx)
+        
+        return positions
+    
+    def _select_required_columns(self, frame, positions, start_col):
+        """按列位置取出必要列，缺失的列补空字符串"""
+        columns = {}
+        for col in self.required_columns:
+            if col in positions and start_col + positions[col] in frame.columns:
+                columns[col] = frame[start_col + positions[col]].fillna('')
+            else:
+                columns[col] = ''
+        return pd.DataFrame(columns, index=frame.index)
+    
     def find_data_start(self, df):
         """智能找到数据起始位置 - 针对百家乐数据"""
         for row_idx in range(min(30, len(df))):
@@ -269,176 +601,393 @@ class BaccaratDataProcessor:
     def clean_data(self, uploaded_file):
         """数据清洗主函数 - 专为百家乐设计"""
         try:
-            # 尝试读取文件判断编码和格式
-            if uploaded_file.name.endswith('.csv'):
-                # 尝试不同编码读取CSV
-                encodings = ['utf-8', 'gbk', 'gb2312', 'latin1']
-                df_temp = None
-                for encoding in encodings:
-                    try:
-                        df_temp = pd.read_csv(uploaded_file, encoding=encoding, nrows=50, header=None)
-                        break
-                    except:
-                        continue
-                if df_temp is None:
-                    st.error("❌ 无法读取CSV文件，请检查编码格式")
-                    return None
-            else:
-                # Excel文件
-                df_temp = pd.read_excel(uploaded_file, header=None, nrows=50)
-            
-            # 找到数据起始位置
-            start_row, start_col = self.find_data_start(df_temp)
-            
-            # 重新读取完整数据
-            if uploaded_file.name.endswith('.csv'):
-                df_clean = pd.read_csv(
-                    uploaded_file, 
-                    encoding='utf-8',
-                    header=start_row,
-                    skiprows=range(start_row + 1) if start_row > 0 else None,
-                    dtype=str,
-                    na_filter=False,
-                    engine='python'
-                )
-            else:
-                df_clean = pd.read_excel(
-                    uploaded_file, 
-                    header=start_row,
-                    skiprows=range(start_row + 1) if start_row > 0 else None,
-                    dtype=str,
-                    na_filter=False
-                )
-            
-            # 裁剪列
-            if start_col > 0:
-                df_clean = df_clean.iloc[:, start_col:]
-            
-            # 智能列识别
-            column_mapping = self.smart_column_identification(df_clean.columns)
-            if column_mapping:
-                df_clean = df_clean.rename(columns=column_mapping)
-            
-            # 如果仍有缺失列，尝试自动分配（更智能的映射）
-            missing_columns = [col for col in self.required_columns if col not in df_clean.columns]
-            if missing_columns:
-                # 尝试根据列名特征匹配
-                for col in df_clean.columns:
-                    col_lower = str(col).lower()
-                    if '会员' in col_lower or '账号' in col_lower or 'account' in col_lower:
-                        df_clean = df_clean.rename(columns={col: '会员账号'})
-                    elif '局' in col_lower or 'round' in col_lower:
-                        df_clean = df_clean.rename(columns={col: '局号'})
-                    elif '游戏' in col_lower or 'game' in col_lower:
-                        df_clean = df_clean.rename(columns={col: '游戏类型'})
-                    elif '玩法' in col_lower or 'bet' in col_lower or '下注' in col_lower:
-                        df_clean = df_clean.rename(columns={col: '下注玩法'})
-                    elif '金额' in col_lower or 'amount' in col_lower or '额度' in col_lower:
-                        df_clean = df_clean.rename(columns={col: '下注额度'})
-            
-            # 再次检查必要列
-            missing_columns = [col for col in self.required_columns if col not in df_clean.columns]
-            if missing_columns and len(df_clean.columns) >= 5:
-                # 按位置分配
-                col_positions = {0: '会员账号', 1: '局号', 2: '游戏类型', 3: '下注玩法', 4: '下注额度'}
-                for i, col in enumerate(df_clean.columns[:5]):
-                    if i in col_positions:
-                        df_clean = df_clean.rename(columns={col: col_positions[i]})
+            with self.tracker.stage('读取文件') as stage:
+                if uploaded_file.name.endswith('.csv'):
+                    df_clean = self.read_csv_file(uploaded_file)
+                else:
+                    df_clean = self.read_excel_file(uploaded_file)
+                stage['输出行数'] = 0 if df_clean is None else len(df_clean)
+            if df_clean is None:
+                return None
             
-            # 删除完全空白的行和列
             initial_count = len(df_clean)
-            df_clean = df_clean.dropna(how='all')
-            df_clean = df_clean.dropna(axis=1, how='all')
-            
-            # 确保必要列存在
-            for col in self.required_columns:
-                if col not in df_clean.columns:
-                    df_clean[col] = ''
-            
-            # 数据格式化
-            for col in self.required_columns:
-                df_clean[col] = df_clean[col].astype(str).str.strip()
-            
-            # 特殊处理局号列
-            if '局号' in df_clean.columns:
-                df_clean['局号'] = df_clean['局号'].str.replace(r'\.0$', '', regex=True)
-                df_clean['局号'] = df_clean['局号'].str.replace(r'\s+', '', regex=True)
-            
-            # 处理金额列
-            if '下注额度' in df_clean.columns:
-                df_clean['下注额度_原始'] = df_clean['下注额度']
-                df_clean['下注额度'] = df_clean['下注额度'].apply(self.preprocess_amount_column)
+            df_clean = self.format_records(df_clean)
             
             # 验证数据质量
             quality_issues = self.validate_data_quality(df_clean)
             if quality_issues:
                 logger.warning(f"数据质量问题: {quality_issues}")
             
-            # 过滤无效记录
-            valid_mask = (
-                (df_clean['会员账号'].str.len() > 0) &
-                (df_clean['局号'].str.len() > 0) &
-                (df_clean['游戏类型'].str.len() > 0) &
-                (df_clean['下注玩法'].str.len() > 0)
-            )
-            df_clean = df_clean[valid_mask].copy()
+            df_clean = self.filter_valid_records(df_clean)
             
             logger.info(f"数据清洗完成: {initial_count} -> {len(df_clean)} 条记录")
             
             return df_clean
                 
         except Exception as e:
-            st.error(f"❌ 数据清洗失败: {str(e)}")
+            self.ui.error(f"❌ 数据清洗失败: {str(e)}")
             logger.error(f"数据清洗失败: {str(e)}")
             traceback.print_exc()
             return None
     
-    def preprocess_amount_column(self, amount_text):
-        """预处理金额列格式 - 专为百家乐设计"""
-        if pd.isna(amount_text):
-            return "0"
-        
-        text = str(amount_text).strip()
-        
-        # 处理各种金额格式
-        # 1. 移除货币符号
-        text = re.sub(r'[￥¥＄\$€£￡]', '', text)
-        
-        # 2. 处理中文冒号和英文冒号
-        if '：' in text:
-            parts = text.split('：')
-            if len(parts) >= 2:
-                text = parts[-1].strip()
-        elif ':' in text:
-            parts = text.split(':')
-            if len(parts) >= 2:
-                text = parts[-1].strip()
-        
-        # 3. 提取数字部分（支持小数和负数）
-        numbers = re.findall(r'[-+]?\d*\.?\d+', text.replace(',', ''))
-        if numbers:
-            # 取最后一个数字（通常是最准确的）
-            amount = numbers[-1]
-            # 验证是否为有效金额
+    def format_records(self, df_clean):
+        """格式化必要列：去除空白、规范局号并解析投注金额"""
+        # 数据格式化
+        for col in self.required_columns:
+            df_clean[col] = df_clean[col].astype(str).str.strip()
+        
+        # 特殊处理局号列
+        if '局号' in df_clean.columns:
+            df_clean['局号'] = df_clean['局号'].str.replace(r'\.0$', '', regex=True)
+            df_clean['局号'] = df_clean['局号'].str.replace(r'\s+', '', regex=True)
+        
+        # 处理金额列，直接得到数值型投注金额
+        if '下注额度' in df_clean.columns:
+            with self.tracker.stage('金额解析', len(df_clean)) as stage:
+                df_clean['投注金额'], self.amount_parse_failures = self.parse_amount_series(df_clean['下注额度'])
+                stage['输出行数'] = len(df_clean)
+                self.tracker.count('解析失败数', self.amount_parse_failures)
+            if self.amount_parse_failures > 0:
+                logger.warning(f"金额解析失败: {self.amount_parse_failures} 个值无法识别，已按0处理")
+        
+        return df_clean
+    
+    def filter_valid_records(self, df_clean):
+        """过滤账户、局号、游戏类型或下注玩法为空的记录"""
+        with self.tracker.stage('过滤无效记录', len(df_clean)) as stage:
+            valid_mask = (
+                (df_clean['会员账号'].str.len() > 0) &
+                (df_clean['局号'].str.len() > 0) &
+                (df_clean['游戏类型'].str.len() > 0) &
+                (df_clean['下注玩法'].str.len() > 0)
+            )
+            df_clean = df_clean[valid_mask].copy()
+            stage['输出行数'] = len(df_clean)
+        return df_clean
+    
+    def sniff_csv(self, uploaded_file):
+        """从文件开头的少量字节探测编码和样本行 - 返回(编码, 样本行)"""
+        uploaded_file.seek(0)
+        prefix = uploaded_file.read(self.config.csv_sniff_bytes)
+        uploaded_file.seek(0)
+        
+        for encoding in CSV_ENCODINGS:
+            try:
+                # 增量解码，前缀末尾被截断的多字节字符不算错误
+                text = codecs.getincrementaldecoder(encoding)().decode(prefix, final=False)
+                break
+            except UnicodeDecodeError:
+                continue
+        else:
+            return None, None
+        
+        # 前缀可能截断最后一行，只保留完整的行
+        if len(prefix) >= self.config.csv_sniff_bytes and '\n' in text:
+            text = text[:text.rfind('\n') + 1]
+        rows = list(csv.reader(io.StringIO(text)))[:50]
+        return encoding, rows
+    
+    def read_csv_file(self, uploaded_file):
+        """单次分块读取CSV：编码和表头只探测一次，只读取必要列"""
+        encoding, rows = self.sniff_csv(uploaded_file)
+        if encoding is None:
+            self.ui.error("❌ 无法读取CSV文件，请检查编码格式")
+            return None
+        if not rows:
+            return self._select_required_columns(pd.DataFrame(), {}, 0)
+        
+        # 找到数据起始位置
+        with self.tracker.stage('列名识别'):
+            start_row, start_col = self.find_data_start(pd.DataFrame(rows))
+            header = rows[start_row][start_col:]
+            positions = self.resolve_column_positions(header)
+        usecols = sorted(start_col + pos for pos in positions.values())
+        logger.info(f"CSV编码: {encoding}, 表头行: {start_row}, 列映射: {positions}")
+        
+        chunks = []
+        if usecols:
+            reader = pd.read_csv(
+                uploaded_file,
+                encoding=encoding,
+                header=None,
+                skiprows=start_row + 1,
+                usecols=usecols,
+                dtype=str,
+                na_filter=False,
+                engine='c',
+                chunksize=self.config.csv_chunk_rows
+            )
+            for chunk in reader:
+                chunks.append(self._select_required_columns(chunk, positions, start_col))
+        
+        if not chunks:
+            return self._select_required_columns(pd.DataFrame(), positions, start_col)
+        return pd.concat(chunks, ignore_index=True)
+    
+    def read_excel_file(self, uploaded_file):
+        """读取Excel所有工作表，每行标记来源工作表"""
+        uploaded_file.seek(0)
+        if uploaded_file.name.lower().endswith('.xls'):
+            # 旧版xls不支持只读流式读取
+            sheets = pd.read_excel(uploaded_file, sheet_name=None, header=None, dtype=str, na_filter=False)
+            frames = [self._extract_sheet_frame(df_raw) for df_raw in sheets.values()]
+            sheet_names = list(sheets.keys())
+        else:
+            content = uploaded_file.getvalue()
+            workbook = load_workbook(io.BytesIO(content), read_only=True)
+            sheet_names = workbook.sheetnames
+            workbook.close()
+            frames = self._load_excel_sheets(content, sheet_names)
+        
+        for sheet_name, frame in zip(sheet_names, frames):
+            frame[SHEET_COLUMN] = sheet_name
+        if frames:
+            df_clean = pd.concat(frames, ignore_index=True)
+        else:
+            df_clean = self._select_required_columns(pd.DataFrame(), {}, 0)
+            df_clean[SHEET_COLUMN] = ''
+        df_clean[SHEET_COLUMN] = df_clean[SHEET_COLUMN].astype('category')
+        logger.info(f"Excel读取完成: {len(sheet_names)} 个工作表, {len(df_clean)} 行")
+        return df_clean
+    
+    def _load_excel_sheets(self, content, sheet_names):
+        """多个工作表并行读取：优先fork多进程，不可用时退回多线程"""
+        workers = min(len(sheet_names), self.config.excel_max_workers)
+        if workers <= 1:
+            return [self.read_excel_sheet(content, sheet_name) for sheet_name in sheet_names]
+        
+        if 'fork' in multiprocessing.get_all_start_methods():
             try:
-                float_amount = float(amount)
-                if float_amount > 0:
-                    return amount
-            except:
-                pass
+                with ProcessPoolExecutor(
+                    max_workers=workers,
+                    mp_context=multiprocessing.get_context('fork'),
+                    initializer=_init_excel_worker,
+                    initargs=(self, content)
+                ) as executor:
+                    return list(executor.map(_read_excel_sheet_worker, sheet_names))
+            except Exception as e:
+                logger.warning(f"多进程读取工作表失败，改用多线程: {str(e)}")
+        
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            return list(executor.map(self.read_excel_sheet, repeat(content), sheet_names))
+    
+    def read_excel_sheet(self, content, sheet_name):
+        """只读流式读取单个工作表：前50行定位表头，之后逐行只取必要列"""
+        workbook = load_workbook(io.BytesIO(content), read_only=True, data_only=True)
+        try:
+            rows = workbook[sheet_name].iter_rows(values_only=True)
+            head = list(islice(rows, 50))
+            if not head:
+                return self._select_required_columns(pd.DataFrame(), {}, 0)
+            
+            start_row, start_col = self.find_data_start(pd.DataFrame(head))
+            header = ['' if value is None else value for value in head[start_row][start_col:]]
+            positions = self.resolve_column_positions(header)
+            if not positions:
+                return self._select_required_columns(pd.DataFrame(), positions, start_col)
+            
+            # 只收集必要列的单元格，短行补齐
+            indices = [start_col + positions[col] for col in positions]
+            width = max(indices) + 1
+            getter = itemgetter(*indices)
+            records = []
+            for row in chain(head[start_row + 1:], rows):
+                if len(row) < width:
+                    row = row + (None,) * (width - len(row))
+                records.append(getter(row))
+        finally:
+            workbook.close()
+        
+        if len(indices) == 1:
+            records = [(value,) for value in records]
+        data = pd.DataFrame.from_records(records, columns=indices)
+        for index in indices:
+            data[index] = data[index].astype(object).where(data[index].notna(), '').astype(str)
+        return self._select_required_columns(data, positions, start_col)
+    
+    def _extract_sheet_frame(self, df_raw):
+        """从整表读取的原始数据中定位表头并取出必要列"""
+        if df_raw.empty:
+            return self._select_required_columns(df_raw, {}, 0)
+        
+        with self.tracker.stage('列名识别'):
+            start_row, start_col = self.find_data_start(df_raw.head(50))
+            header = df_raw.iloc[start_row, start_col:].tolist()
+            positions = self.resolve_column_positions(header)
+        return self._select_required_columns(df_raw.iloc[start_row + 1:], positions, start_col)
+    
+    def parse_amount_series(self, amount_series):
+        """向量化解析金额列 - 返回(投注金额, 解析失败数)"""
+        # 只解析不同的取值，再按编码广播回所有行
+        codes, uniques = pd.factorize(amount_series)
+        text = pd.Series(uniques, dtype=object).astype(str).str.strip()
+        
+        # 1. 移除货币符号，全角数字转为半角
+        text = text.str.replace(r'[￥¥＄\$€£￡]', '', regex=True)
+        text = text.str.translate(FULLWIDTH_DIGIT_TABLE)
+        
+        # 2. 处理中文冒号和英文冒号：有中文冒号时取最后一个中文冒号之后的部分，否则按英文冒号处理
+        has_cn_colon = text.str.contains('：', regex=False)
+        has_en_colon = text.str.contains(':', regex=False)
+        text = text.where(~has_cn_colon, text.str.rsplit('：', n=1).str[-1])
+        text = text.where(has_cn_colon | ~has_en_colon, text.str.rsplit(':', n=1).str[-1])
+        
+        # 3. 去除千位分隔符，提取最后一个数字（支持小数和负数）
+        text = text.str.replace(',', '', regex=False)
+        last_number = text.str.findall(r'[-+]?\d*\.?\d+').str[-1]
+        unique_amounts = pd.to_numeric(last_number, errors='coerce').to_numpy(dtype=np.float64)
+        
+        # 无法解析的非空值计入失败数，与非正金额一起按0处理
+        unique_failed = np.isnan(unique_amounts) & (text.str.len() > 0).to_numpy()
+        unique_amounts = np.where(unique_amounts > 0, unique_amounts, 0.0)
+        
+        # 编码-1对应空值
+        amounts = np.append(unique_amounts, 0.0)[codes]
+        failed_count = int(np.append(unique_failed, False)[codes].sum())
+        
+        return pd.Series(amounts, index=amount_series.index), failed_count
+
+# ==================== 变体匹配器 ====================
+def map_unique_values(series, func):
+    """对列中每个不同取值只调用一次func，再按编码广播回所有行"""
+    codes, uniques = pd.factorize(series)
+    mapped = [func(value) for value in uniques]
+    # 编码-1对应空值
+    mapped.append(func(np.nan))
+    return pd.Series(np.asarray(mapped, dtype=object)[codes], index=series.index)
+
+
+def format_currency(values):
+    """金额格式化为¥1,234.00，相同金额只格式化一次"""
+    return map_unique_values(pd.Series(values, dtype=np.float64), lambda value: f"¥{value:,.2f}").to_numpy()
+
+
+def format_percent(values):
+    """比例格式化为百分数（两位小数），与f"{value:.2%}"一致"""
+    return np.char.mod('%.2f%%', np.asarray(values, dtype=np.float64) * 100).astype(object)
+
+
+class VariantMatcher:
+    """预编译的变体模糊匹配器，匹配优先级与按配置顺序逐个遍历变体一致"""
+    def __init__(self, variants_by_standard):
+        self.entries = []
+        for standard_name, variants in variants_by_standard.items():
+            for variant in variants:
+                self.entries.append((variant.lower(), standard_name))
+        
+        # 每个变体文本第一次出现的优先级
+        self.variant_priority = {}
+        for priority, (variant_lower, _) in enumerate(self.entries):
+            self.variant_priority.setdefault(variant_lower, priority)
+        
+        # 条件1：变体是文本的子串。前瞻交替正则在每个位置返回优先级最高的变体
+        alternation = '|'.join(re.escape(variant_lower) for variant_lower, _ in self.entries)
+        self.contained_pattern = re.compile(f'(?=({alternation}))')
+        
+        # 条件2：文本是变体的子串。在拼接串中查找，第一次出现的位置即优先级最高的变体
+        self.joined_variants = '\x00'.join(variant_lower for variant_lower, _ in self.entries)
+        self.variant_offsets = []
+        offset = 0
+        for variant_lower, _ in self.entries:
+            self.variant_offsets.append(offset)
+            offset += len(variant_lower) + 1
+    
+    def match(self, text_lower):
+        """返回优先级最高的匹配标准名，无匹配时返回None"""
+        best_priority = None
+        
+        for match in self.contained_pattern.finditer(text_lower):
+            priority = self.variant_priority[match.group(1)]
+            if best_priority is None or priority < best_priority:
+                best_priority = priority
+        
+        if '\x00' not in text_lower:
+            position = self.joined_variants.find(text_lower)
+            if position >= 0:
+                priority = bisect_right(self.variant_offsets, position) - 1
+                if best_priority is None or priority < best_priority:
+                    best_priority = priority
+        
+        if best_priority is None:
+            return None
+        return self.entries[best_priority][1]
+
+
+class VariantCache:
+    """模糊匹配结果的磁盘缓存，变体配置变化时自动失效"""
+    def __init__(self, path, section, variants_by_standard, max_entries=10000):
+        self.path = path
+        self.section = section
+        self.max_entries = max_entries
+        self.fingerprint = hashlib.sha256(
+            json.dumps(variants_by_standard, ensure_ascii=False, sort_keys=True).encode('utf-8')
+        ).hexdigest()
+        self.entries = {}
+        self.dirty = False
+        self._load()
+    
+    def _read_file(self):
+        if not self.path or not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            return data if isinstance(data, dict) else {}
+        except (OSError, ValueError) as e:
+            logger.warning(f"变体缓存读取失败: {str(e)}")
+            return {}
+    
+    def _load(self):
+        section = self._read_file().get(self.section, {})
+        if section.get('fingerprint') == self.fingerprint:
+            self.entries = dict(section.get('entries', {}))
+    
+    def get(self, text):
+        return self.entries.get(text)
+    
+    def put(self, text, standard_name):
+        if len(self.entries) < self.max_entries:
+            self.entries[text] = standard_name
+            self.dirty = True
+    
+    def save(self):
+        """写回磁盘，保留其他分区的内容"""
+        if not self.dirty or not self.path:
+            return
         
-        return "0"
+        try:
+            data = self._read_file()
+            data[self.section] = {'fingerprint': self.fingerprint, 'entries': self.entries}
+            os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+            temp_path = f"{self.path}.{os.getpid()}.tmp"
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(temp_path, self.path)
+            self.dirty = False
+        except OSError as e:
+            logger.warning(f"变体缓存写入失败: {str(e)}")
 
 # ==================== 游戏类型识别器 ====================
 class GameTypeIdentifier:
-    def __init__(self):
-        self.config = BaccaratConfig()
+    def __init__(self, config=None):
+        self.config = config or BaccaratConfig()
         self.game_type_mapping = {}
         
         # 构建游戏类型映射
         for standard_name, variants in self.config.game_type_variants.items():
             for variant in variants:
                 self.game_type_mapping[variant.lower()] = standard_name
+        
+        self.matcher = VariantMatcher(self.config.game_type_variants)
+        self.fuzzy_cache = VariantCache(
+            self.config.variant_cache_path, 'game_type', self.config.game_type_variants
+        )
+    
+    def identify_game_types(self, series):
+        """按不同取值批量识别游戏类型"""
+        result = map_unique_values(series, self.identify_game_type)
+        self.fuzzy_cache.save()
+        return result
     
     def identify_game_type(self, game_type_text):
         """识别游戏类型 - 专为百家乐设计"""
@@ -452,12 +1001,20 @@ class GameTypeIdentifier:
         if text_lower in self.game_type_mapping:
             return self.game_type_mapping[text_lower]
         
+        cached = self.fuzzy_cache.get(text)
+        if cached is not None:
+            return cached
+        
+        result = self._fuzzy_identify(text, text_lower)
+        self.fuzzy_cache.put(text, result)
+        return result
+    
+    def _fuzzy_identify(self, text, text_lower):
+        """模糊匹配及关键词判断"""
         # 模糊匹配
-        for standard_name, variants in self.config.game_type_variants.items():
-            for variant in variants:
-                variant_lower = variant.lower()
-                if variant_lower in text_lower or text_lower in variant_lower:
-                    return standard_name
+        standard_name = self.matcher.match(text_lower)
+        if standard_name is not None:
+            return standard_name
         
         # 根据关键词判断
         if any(keyword in text_lower for keyword in ['baccarat', '百家乐', 'bjl']):
@@ -469,14 +1026,25 @@ class GameTypeIdentifier:
 
 # ==================== 下注玩法标准化器 ====================
 class BetTypeNormalizer:
-    def __init__(self):
-        self.config = BaccaratConfig()
+    def __init__(self, config=None):
+        self.config = config or BaccaratConfig()
         self.bet_type_mapping = {}
         
         # 构建下注玩法映射
         for standard_name, variants in self.config.bet_type_variants.items():
             for variant in variants:
                 self.bet_type_mapping[variant.lower()] = standard_name
+        
+        self.matcher = VariantMatcher(self.config.bet_type_variants)
+        self.fuzzy_cache = VariantCache(
+            self.config.variant_cache_path, 'bet_type', self.config.bet_type_variants
+        )
+    
+    def normalize_bet_types(self, series):
+        """按不同取值批量标准化下注玩法"""
+        result = map_unique_values(series, self.normalize_bet_type)
+        self.fuzzy_cache.save()
+        return result
     
     def normalize_bet_type(self, bet_type_text):
         """标准化下注玩法 - 专为百家乐设计"""
@@ -490,12 +1058,20 @@ class BetTypeNormalizer:
         if text_lower in self.bet_type_mapping:
             return self.bet_type_mapping[text_lower]
         
+        cached = self.fuzzy_cache.get(text)
+        if cached is not None:
+            return cached
+        
+        result = self._fuzzy_normalize(text, text_lower)
+        self.fuzzy_cache.put(text, result)
+        return result
+    
+    def _fuzzy_normalize(self, text, text_lower):
+        """模糊匹配及关键词判断"""
         # 模糊匹配
-        for standard_name, variants in self.config.bet_type_variants.items():
-            for variant in variants:
-                variant_lower = variant.lower()
-                if variant_lower in text_lower or text_lower in variant_lower:
-                    return standard_name
+        standard_name = self.matcher.match(text_lower)
+        if standard_name is not None:
+            return standard_name
         
         # 根据关键词判断
         keyword_mapping = [
@@ -518,138 +1094,424 @@ class BetTypeNormalizer:
         
         return text
 
+# ==================== 解析缓存 ====================
+class IngestCache:
+    """按内容哈希缓存标准化后的数据，按条目数和内存占用做LRU淘汰"""
+    def __init__(self, max_entries=4, max_bytes=2 * 1024 ** 3):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.total_bytes = 0
+        self.lock = threading.Lock()
+    
+    def _entry_size(self, value):
+        return int(value['frame'].memory_usage(index=True, deep=True).sum())
+    
+    def get(self, key):
+        with self.lock:
+            if key not in self.entries:
+                return None
+            self.entries.move_to_end(key)
+            return self.entries[key][0]
+    
+    def put(self, key, value):
+        size = self._entry_size(value)
+        if size > self.max_bytes:
+            logger.info(f"数据过大({size / 1024 ** 2:.1f}MB)，不写入解析缓存")
+            return
+        
+        with self.lock:
+            if key in self.entries:
+                self.total_bytes -= self.entries.pop(key)[1]
+            self.entries[key] = (value, size)
+            self.total_bytes += size
+            
+            # 淘汰最久未使用的条目
+            while len(self.entries) > self.max_entries or self.total_bytes > self.max_bytes:
+                _, (_, evicted_size) = self.entries.popitem(last=False)
+                self.total_bytes -= evicted_size
+
+
+@st.cache_resource
+def get_ingest_cache(max_entries, max_bytes):
+    """跨Streamlit重新运行共享的解析缓存"""
+    return IngestCache(max_entries, max_bytes)
+
+# 并行检测子进程的上下文（由进程池初始化函数设置，只存在于子进程中）
+_shard_worker_context = {}
+
+
+def _init_shard_worker(detector, shard_data):
+    """并行检测子进程初始化：fork继承检测器和共享内存中的编码数组"""
+    _shard_worker_context['detector'] = detector
+    _shard_worker_context['shard_data'] = shard_data
+    # 子进程不统计内存，避免继承的tracemalloc拖慢检测
+    detector.tracker.trace_memory = False
+    if tracemalloc.is_tracing():
+        tracemalloc.stop()
+
+
+def _detect_shard(shard_index):
+    """并行检测子进程任务：检测单个分片"""
+    detector = _shard_worker_context['detector']
+    return detector._find_shard_candidates(_shard_worker_context['shard_data'], shard_index)
+
+
+class CandidateCache:
+    """会话内的检测候选缓存：同一份数据只保留一组候选，换数据时清空"""
+    def __init__(self):
+        self.fingerprint = None
+        self.store = {}
+    
+    def get_store(self, fingerprint):
+        if fingerprint != self.fingerprint:
+            self.fingerprint = fingerprint
+            self.store = {}
+        return self.store
+
+# ==================== 局序号 ====================
+def split_period(period):
+    """拆分局号为(前缀, 末尾序号)，没有末尾数字时序号为None"""
+    match = PERIOD_NUMBER_PATTERN.match(period)
+    if match is None:
+        return period, None
+    return match.group(1), int(match.group(2))
+
+
+def build_round_index(game_types, periods):
+    """为每桌实际开出的局按局号自然顺序编号 - 返回{(游戏类型, 局号): (桌, 序号)}"""
+    tables = defaultdict(list)
+    for game_type, period in zip(game_types, periods):
+        prefix, number = split_period(period)
+        tables[(game_type, prefix)].append((number is None, number or 0, period))
+    
+    round_index = {}
+    for table, rounds in tables.items():
+        rounds.sort()
+        for ordinal, (_, _, period) in enumerate(rounds):
+            round_index[(table[0], period)] = (table, ordinal)
+    return round_index
+
+
 # ==================== 百家乐对刷检测器类 ====================
 class BaccaratWashTradeDetector:
-    def __init__(self, config=None):
+    def __init__(self, config=None, ui=None):
         self.config = config or BaccaratConfig()
-        self.data_processor = BaccaratDataProcessor()
-        self.game_type_identifier = GameTypeIdentifier()
-        self.bet_type_normalizer = BetTypeNormalizer()
+        self.ui = ui or st
+        self.performance_stats = {}
+        self.tracker = PerformanceTracker(self.performance_stats, self.config.performance_trace_memory)
+        self.data_processor = BaccaratDataProcessor(self.config, self.ui, self.tracker)
+        self.game_type_identifier = GameTypeIdentifier(self.config)
+        self.bet_type_normalizer = BetTypeNormalizer(self.config)
         
         self.data_processed = False
         self.df_valid = None
+        self.data_fingerprint = None
+        self.source_fingerprint = None
+        self.normalized_frame = None
+        self.total_records = 0
+        self.code_maps = {}
+        self.round_index = {}
         self.export_data = []
+        self.result_views = None  # 结果展示用的汇总表和团伙，见get_result_views
         
         # 统计信息
         self.account_total_periods_by_game = defaultdict(dict)
         self.account_record_stats_by_game = defaultdict(dict)
-        self.performance_stats = {}
     
-    def upload_and_process(self, uploaded_file):
+    def upload_and_process(self, uploaded_file, ingest_cache=None):
         """上传并处理文件"""
         try:
             if uploaded_file is None:
-                st.error("❌ 没有上传文件")
+                self.ui.error("❌ 没有上传文件")
                 return None, None
             
             filename = uploaded_file.name
             logger.info(f"✅ 已上传文件: {filename}")
+            self.tracker.reset()
             
             # 检查文件类型
-            supported_types = ['.xlsx', '.xls', '.csv']
+            supported_types = ['.xlsx', '.xls', '.csv'] + list(SNAPSHOT_EXTENSIONS)
             if not any(filename.endswith(ext) for ext in supported_types):
-                st.error(f"❌ 不支持的文件类型: {filename}")
+                self.ui.error(f"❌ 不支持的文件类型: {filename}")
                 return None, None
             
+            # 数据快照跳过清洗和标准化，直接进入检测
+            if filename.endswith(SNAPSHOT_EXTENSIONS):
+                normalized = self.load_snapshot(uploaded_file)
+                df_enhanced = self.select_valid_records(normalized, self.total_records)
+                return df_enhanced, filename
+            
+            # 相同文件内容和解析配置直接复用缓存的标准化数据
+            cache_key = self.compute_ingest_key(uploaded_file) if ingest_cache is not None else None
+            if cache_key is not None:
+                self.source_fingerprint = cache_key
+                self.data_fingerprint = f"{cache_key}:{self.config.min_amount}"
+            cached = ingest_cache.get(cache_key) if cache_key is not None else None
+            
+            if cached is not None:
+                logger.info(f"命中解析缓存: {filename}")
+                # 解析阶段的统计随缓存保存，命中时沿用首次解析的统计
+                self.tracker.restore(cached['stage_stats'])
+                self.data_processor.amount_parse_failures = cached['amount_parse_failures']
+                self.normalized_frame = cached['frame']
+                self.total_records = cached['total_records']
+                df_enhanced = self.select_valid_records(cached['frame'], cached['total_records'])
+                return df_enhanced, filename
+            
             # 清洗数据
-            with st.spinner("🔄 正在清洗数据..."):
+            with self.ui.spinner("🔄 正在清洗数据..."):
                 df_clean = self.data_processor.clean_data(uploaded_file)
             
             if df_clean is not None and len(df_clean) > 0:
                 # 增强数据处理
-                df_enhanced = self.enhance_data_processing(df_clean)
+                with self.tracker.stage('标准化', len(df_clean)) as stage:
+                    normalized = self.normalize_records(df_clean)
+                    stage['输出行数'] = len(normalized)
+                self.normalized_frame = normalized
+                self.total_records = len(df_clean)
+                if cache_key is not None:
+                    ingest_cache.put(cache_key, {
+                        'frame': normalized,
+                        'total_records': len(df_clean),
+                        'amount_parse_failures': self.data_processor.amount_parse_failures,
+                        'stage_stats': self.tracker.extract(INGEST_STAGES)
+                    })
+                df_enhanced = self.select_valid_records(normalized, len(df_clean))
                 return df_enhanced, filename
             else:
                 return None, None
             
         except Exception as e:
             logger.error(f"文件处理失败: {str(e)}")
-            st.error(f"文件处理失败: {str(e)}")
+            self.ui.error(f"文件处理失败: {str(e)}")
             traceback.print_exc()
             return None, None
     
+    def compute_ingest_key(self, uploaded_file):
+        """解析缓存键：文件内容的SHA-256加上影响解析结果的配置"""
+        content_hash = hashlib.sha256(uploaded_file.getvalue()).hexdigest()
+        settings = {
+            'version': INGEST_CACHE_VERSION,
+            'extension': os.path.splitext(uploaded_file.name)[1].lower(),
+            'column_mappings': self.config.column_mappings,
+            'game_type_variants': self.config.game_type_variants,
+            'bet_type_variants': self.config.bet_type_variants
+        }
+        settings_hash = hashlib.sha256(
+            json.dumps(settings, ensure_ascii=False, sort_keys=True).encode('utf-8')
+        ).hexdigest()
+        return f"{content_hash}:{settings_hash}"
+    
+    def save_snapshot(self, target, file_format='parquet'):
+        """将标准化后的核心数据保存为压缩的Parquet/Feather快照，元数据中记录编码字典和源文件指纹"""
+        if self.normalized_frame is None:
+            raise ValueError("没有可保存的标准化数据")
+        
+        frame = self.normalized_frame
+        metadata = {
+            'version': SNAPSHOT_VERSION,
+            'source_fingerprint': self.source_fingerprint,
+            'total_records': int(self.total_records),
+            'amount_parse_failures': int(self.data_processor.amount_parse_failures),
+            'code_maps': {column: frame[column].cat.categories.tolist() for column in CORE_CODE_COLUMNS}
+        }
+        table = pa.Table.from_pandas(frame, preserve_index=False)
+        table = table.replace_schema_metadata({
+            **(table.schema.metadata or {}),
+            SNAPSHOT_METADATA_KEY: json.dumps(metadata, ensure_ascii=False).encode('utf-8')
+        })
+        
+        if file_format == 'feather':
+            feather.write_feather(table, target, compression=self.config.snapshot_compression)
+        else:
+            pq.write_table(table, target, compression=self.config.snapshot_compression)
+        logger.info(f"数据快照已保存: {len(frame)} 条记录")
+    
+    def load_snapshot(self, source, columns=None, memory_map=True):
+        """从快照加载标准化核心数据，支持列投影和内存映射（仅对文件路径生效）"""
+        name = source if isinstance(source, str) else getattr(source, 'name', '')
+        if not isinstance(source, str):
+            source = pa.BufferReader(source.getvalue())
+        
+        with self.tracker.stage('读取快照') as stage:
+            if name.endswith('.feather'):
+                table = feather.read_table(source, columns=columns, memory_map=memory_map)
+            else:
+                table = pq.read_table(source, columns=columns, memory_map=memory_map)
+            stage['输出行数'] = table.num_rows
+        
+        raw_metadata = (table.schema.metadata or {}).get(SNAPSHOT_METADATA_KEY)
+        if raw_metadata is None:
+            raise ValueError("文件不是有效的数据快照")
+        metadata = json.loads(raw_metadata.decode('utf-8'))
+        if metadata.get('version') != SNAPSHOT_VERSION:
+            raise ValueError(f"不支持的快照版本: {metadata.get('version')}")
+        
+        normalized = table.to_pandas()
+        # 按快照中的编码字典恢复分类列，保证编码与保存时一致
+        for column, categories in metadata['code_maps'].items():
+            if column in normalized.columns:
+                normalized[column] = normalized[column].astype(pd.CategoricalDtype(categories))
+        
+        self.normalized_frame = normalized
+        self.total_records = metadata['total_records']
+        self.data_processor.amount_parse_failures = metadata['amount_parse_failures']
+        self.source_fingerprint = metadata['source_fingerprint']
+        if self.source_fingerprint is not None:
+            self.data_fingerprint = f"{self.source_fingerprint}:{self.config.min_amount}"
+        logger.info(f"数据快照已加载: {len(normalized)} 条记录")
+        return normalized
+    
+    def display_snapshot_button(self, filename):
+        """显示数据快照下载按钮"""
+        if self.normalized_frame is None:
+            return
+        
+        if st.checkbox("💾 生成数据快照（Parquet）", help="保存标准化后的数据，下次上传快照可跳过解析直接检测"):
+            buffer = io.BytesIO()
+            self.save_snapshot(buffer)
+            st.download_button(
+                label="📥 下载数据快照",
+                data=buffer.getvalue(),
+                file_name=f"{os.path.splitext(filename)[0]}_snapshot.parquet",
+                mime="application/octet-stream"
+            )
+    
     def enhance_data_processing(self, df_clean):
         """增强数据处理流程 - 专为百家乐设计"""
         try:
-            # 1. 标准化游戏类型
-            if '游戏类型' in df_clean.columns:
-                df_clean['标准化游戏类型'] = df_clean['游戏类型'].apply(
-                    self.game_type_identifier.identify_game_type
-                )
-            else:
-                df_clean['标准化游戏类型'] = '未知'
-            
-            # 2. 标准化下注玩法
-            if '下注玩法' in df_clean.columns:
-                df_clean['标准化下注玩法'] = df_clean['下注玩法'].apply(
-                    self.bet_type_normalizer.normalize_bet_type
-                )
-            else:
-                df_clean['标准化下注玩法'] = ''
-            
-            # 3. 提取投注金额（数值型）
+            normalized = self.normalize_records(df_clean)
+        except Exception as e:
+            logger.error(f"数据处理增强失败: {str(e)}")
+            self.ui.error(f"数据处理增强失败: {str(e)}")
+            traceback.print_exc()
+            return pd.DataFrame()
+        
+        self.normalized_frame = normalized
+        self.total_records = len(df_clean)
+        return self.select_valid_records(normalized, len(df_clean))
+    
+    def normalize_records(self, df_clean):
+        """标准化游戏类型、下注玩法和金额，返回紧凑核心数据（不含金额阈值过滤）"""
+        # 1. 标准化游戏类型
+        if '游戏类型' in df_clean.columns:
+            df_clean['标准化游戏类型'] = self.game_type_identifier.identify_game_types(
+                df_clean['游戏类型']
+            )
+        else:
+            df_clean['标准化游戏类型'] = '未知'
+        
+        # 2. 标准化下注玩法
+        if '下注玩法' in df_clean.columns:
+            df_clean['标准化下注玩法'] = self.bet_type_normalizer.normalize_bet_types(
+                df_clean['下注玩法']
+            )
+        else:
+            df_clean['标准化下注玩法'] = ''
+        
+        # 3. 投注金额（数值型），清洗阶段未解析时在此解析
+        if '投注金额' not in df_clean.columns:
             if '下注额度' in df_clean.columns:
-                df_clean['投注金额'] = df_clean['下注额度'].apply(
-                    lambda x: float(x) if self._is_float(x) else 0.0
-                )
+                df_clean['投注金额'], _ = self.data_processor.parse_amount_series(df_clean['下注额度'])
             else:
                 df_clean['投注金额'] = 0.0
+        
+        # 4. 过滤无效玩法和游戏类型
+        valid_mask = (
+            (df_clean['标准化下注玩法'].isin(['庄', '闲', '和', '龙', '虎', '庄对', '闲对'])) & 
+            (df_clean['标准化游戏类型'].isin(['百家乐', '龙虎']))
+        )
+        
+        # 5. 构建整数编码的紧凑核心数据，丢弃冗余的字符串列
+        return self.build_core_frame(df_clean[valid_mask])
+    
+    def select_valid_records(self, normalized, total_records):
+        """按最小投注金额过滤核心数据，并计算账户统计信息"""
+        try:
+            self.tracker.reset(keep=INGEST_STAGES)
+            with self.tracker.stage('金额过滤', len(normalized)) as stage:
+                min_amount_cents = int(round(self.config.min_amount * 100))
+                amount_mask = normalized[AMOUNT_CENTS_COLUMN].to_numpy() >= min_amount_cents
+                df_valid = normalized[amount_mask].reset_index(drop=True)
+                for column in CORE_CODE_COLUMNS:
+                    df_valid[column] = df_valid[column].cat.remove_unused_categories()
+                stage['输出行数'] = len(df_valid)
             
-            # 4. 过滤有效数据
-            df_valid = df_clean[
-                (df_clean['标准化下注玩法'].isin(['庄', '闲', '和', '龙', '虎', '庄对', '闲对'])) & 
-                (df_clean['投注金额'] >= self.config.min_amount) &
-                (df_clean['标准化游戏类型'].isin(['百家乐', '龙虎']))
-            ].copy()
-            
-            # 5. 添加辅助列
-            df_valid['检测标识'] = df_valid.apply(
-                lambda row: f"{row['会员账号']}_{row['局号']}_{row['标准化游戏类型']}", 
-                axis=1
-            )
+            # 编码字典，用于展示和导出时还原原始值
+            self.code_maps = {column: df_valid[column].cat.categories for column in CORE_CODE_COLUMNS}
             
             self.data_processed = True
             self.df_valid = df_valid
             
-            # 6. 计算账户统计信息
-            self.calculate_account_total_periods_by_game(df_valid)
+            with self.tracker.stage('账户统计与局序号', len(df_valid)):
+                # 6. 计算账户统计信息
+                self.calculate_account_total_periods_by_game(df_valid)
+                
+                # 7. 建立各桌的局序号，用于判断对刷是否连续
+                rounds = df_valid[['标准化游戏类型', '局号']].drop_duplicates()
+                self.round_index = build_round_index(rounds['标准化游戏类型'].tolist(), rounds['局号'].tolist())
             
-            logger.info(f"数据处理完成: {len(df_clean)} -> {len(df_valid)} 条有效记录")
+            logger.info(f"数据处理完成: {total_records} -> {len(df_valid)} 条有效记录")
             
             # 显示数据预览
-            with st.expander("📊 数据预览", expanded=False):
-                st.write(f"**数据统计:**")
-                st.write(f"- 总记录数: {len(df_clean):,}")
-                st.write(f"- 有效记录数: {len(df_valid):,}")
-                st.write(f"- 唯一账户数: {df_valid['会员账号'].nunique():,}")
-                st.write(f"- 唯一局号数: {df_valid['局号'].nunique():,}")
+            with self.ui.expander("📊 数据预览", expanded=False):
+                self.ui.write(f"**数据统计:**")
+                self.ui.write(f"- 总记录数: {total_records:,}")
+                self.ui.write(f"- 有效记录数: {len(df_valid):,}")
+                self.ui.write(f"- 金额解析失败数: {self.data_processor.amount_parse_failures:,}")
+                self.ui.write(f"- 唯一账户数: {df_valid['会员账号'].nunique():,}")
+                self.ui.write(f"- 唯一局号数: {df_valid['局号'].nunique():,}")
                 
                 if len(df_valid) > 0:
-                    st.write(f"**游戏类型分布:**")
+                    self.ui.write(f"**游戏类型分布:**")
                     game_stats = df_valid['标准化游戏类型'].value_counts()
                     for game, count in game_stats.items():
-                        st.write(f"  - {game}: {count:,} 条记录")
+                        self.ui.write(f"  - {game}: {count:,} 条记录")
                     
-                    st.write(f"**下注玩法分布:**")
+                    self.ui.write(f"**下注玩法分布:**")
                     bet_stats = df_valid['标准化下注玩法'].value_counts()
                     for bet, count in bet_stats.items():
-                        st.write(f"  - {bet}: {count:,} 条记录")
+                        self.ui.write(f"  - {bet}: {count:,} 条记录")
             
             return df_valid
                 
         except Exception as e:
             logger.error(f"数据处理增强失败: {str(e)}")
-            st.error(f"数据处理增强失败: {str(e)}")
+            self.ui.error(f"数据处理增强失败: {str(e)}")
             traceback.print_exc()
             return pd.DataFrame()
     
-    def _is_float(self, value):
-        """检查是否为浮点数"""
-        try:
-            float(value)
-            return True
-        except:
-            return False
+    def build_core_frame(self, df):
+        """构建紧凑核心数据：账户、局号、游戏类型、下注玩法编码为分类整数，金额以分为单位存储"""
+        core = pd.DataFrame(index=pd.RangeIndex(len(df)))
+        for column in CORE_CODE_COLUMNS:
+            values = df[column].to_numpy()
+            core[column] = pd.Categorical(values)
+        
+        if SHEET_COLUMN in df.columns:
+            core[SHEET_COLUMN] = pd.Categorical(df[SHEET_COLUMN].to_numpy())
+        
+        amounts = df['投注金额'].to_numpy(dtype=np.float64)
+        core[AMOUNT_CENTS_COLUMN] = np.rint(amounts * 100).astype(np.int64)
+        return core
+    
+    def decode_codes(self, column, codes):
+        """将编码还原为原始值"""
+        return self.code_maps[column].take(np.asarray(codes)).tolist()
+    
+    def _column_codes(self, series):
+        """获取列的整数编码及对应的取值字典"""
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            return series.cat.codes.to_numpy(), series.cat.categories
+        codes, uniques = pd.factorize(series, sort=True)
+        return codes, pd.Index(uniques)
+    
+    def _amount_values(self, df):
+        """获取以元为单位的投注金额数组"""
+        if AMOUNT_CENTS_COLUMN in df.columns:
+            return df[AMOUNT_CENTS_COLUMN].to_numpy(dtype=np.float64) / 100
+        return df['投注金额'].to_numpy(dtype=np.float64)
     
     def calculate_account_total_periods_by_game(self, df):
         """计算账户在每种游戏上的总局数"""
@@ -662,42 +1524,90 @@ class BaccaratWashTradeDetector:
         if '标准化游戏类型' not in data_source.columns:
             return
         
-        # 按游戏类型分组统计
-        for game_type in data_source['标准化游戏类型'].unique():
-            df_game = data_source[data_source['标准化游戏类型'] == game_type]
-            
+        # 按游戏类型和账户一次分组统计
+        grouped = data_source.groupby(['标准化游戏类型', '会员账号'], sort=False, observed=True)
+        period_counts = grouped['局号'].nunique()
+        record_counts = grouped.size()
+        
+        for (game_type, account), periods in period_counts.items():
             # 统计每个账户的局数
-            period_counts = df_game.groupby('会员账号')['局号'].nunique().to_dict()
-            self.account_total_periods_by_game[game_type] = period_counts
-            
+            self.account_total_periods_by_game[game_type][account] = int(periods)
+        
+        for (game_type, account), records in record_counts.items():
             # 统计每个账户的记录数
-            record_counts = df_game.groupby('会员账号').size().to_dict()
-            self.account_record_stats_by_game[game_type] = record_counts
+            self.account_record_stats_by_game[game_type][account] = int(records)
     
-    def detect_all_wash_trades(self):
+    def detect_all_wash_trades(self, candidate_cache=None):
         """主检测方法：检测所有对刷模式"""
         if not self.data_processed or self.df_valid is None or len(self.df_valid) == 0:
-            st.error("❌ 没有有效数据可用于检测")
+            self.ui.error("❌ 没有有效数据可用于检测")
             return []
         
-        progress_bar = st.progress(0)
-        status_text = st.empty()
+        progress_bar = self.ui.progress(0)
+        status_text = self.ui.empty()
+        self.tracker.reset(keep=PREPARE_STAGES)
+        
+        # 同一份数据的候选缓存，阈值变化时只需重新过滤
+        candidate_store = None
+        if candidate_cache is not None and self.data_fingerprint is not None:
+            candidate_store = candidate_cache.get_store(self.data_fingerprint)
         
         all_patterns = []
         total_steps = self.config.max_accounts_in_group + 2
         
+        # 共同局数不足的账户对不可能形成连续对刷，多账户检测前先排除
+        with self.tracker.stage('共同局数预过滤', len(self.df_valid)):
+            pair_filter = self._get_shared_round_filter(candidate_store)
+        
+        # 数据量较大时按游戏类型和局号分片并行计算候选，之后与串行路径一样过滤和构建模式
+        main_bets = None
+        max_opposing_bettors = None
+        if self._use_parallel_detection():
+            status_text.text("🔍 并行检测对刷候选...")
+            with self.tracker.stage('并行候选计算', len(self.df_valid)):
+                if candidate_store is None:
+                    candidate_store = {}
+                    max_opposing_bettors = self._prefetch_candidates_parallel(candidate_store, False, pair_filter)
+                else:
+                    max_opposing_bettors = self._prefetch_candidates_parallel(candidate_store, True, pair_filter)
+        
         # 1. 检测单账户对刷（同一账户在同一局下注对立面）
         status_text.text("🔍 检测单账户对刷模式...")
-        single_account_patterns = self.detect_single_account_wash_trades(self.df_valid)
+        with self.tracker.stage('单账户检测', len(self.df_valid)) as stage:
+            single_account_patterns = self.detect_single_account_wash_trades(self.df_valid, candidate_store)
+            stage['输出行数'] = len(single_account_patterns)
         all_patterns.extend(single_account_patterns)
         
         progress_bar.progress(1 / total_steps)
         
         # 2. 检测多账户对刷（多个账户在同一局下注对立面）
+        if max_opposing_bettors is None:
+            if candidate_store is not None and 'main_bets' in candidate_store:
+                main_bets = candidate_store['main_bets']
+                max_opposing_bettors = candidate_store['max_opposing_bettors']
+            else:
+                with self.tracker.stage('构建主注表', len(self.df_valid)) as stage:
+                    main_bets = self._build_main_bet_table(self.df_valid)
+                    max_opposing_bettors = self.count_max_opposing_bettors(main_bets)
+                    stage['输出行数'] = len(main_bets)
+                if candidate_store is not None:
+                    candidate_store['main_bets'] = main_bets
+                    candidate_store['max_opposing_bettors'] = max_opposing_bettors
+        
         for account_count in range(2, self.config.max_accounts_in_group + 1):
-            status_text.text(f"🔍 检测{account_count}个账户对刷模式...")
-            patterns = self.detect_multi_account_wash_trades(self.df_valid, account_count)
-            all_patterns.extend(patterns)
+            # 没有任何一局的对立账户数达到k时，跳过该k的检测
+            with self.tracker.stage(f'{account_count}账户检测', len(self.df_valid)) as stage:
+                if account_count > max_opposing_bettors:
+                    logger.info(f"跳过{account_count}账户检测: 单局对立账户数最多为{max_opposing_bettors}")
+                    self.tracker.count('对立账户数不足跳过')
+                    stage['输出行数'] = 0
+                else:
+                    status_text.text(f"🔍 检测{account_count}个账户对刷模式...")
+                    patterns = self.detect_multi_account_wash_trades(
+                        self.df_valid, account_count, main_bets, candidate_store, pair_filter
+                    )
+                    stage['输出行数'] = len(patterns)
+                    all_patterns.extend(patterns)
             
             progress = (account_count) / total_steps
             progress_bar.progress(progress)
@@ -706,206 +1616,1069 @@ class BaccaratWashTradeDetector:
         status_text.empty()
         
         # 3. 查找连续模式
-        continuous_patterns = self.find_continuous_patterns(all_patterns)
+        with self.tracker.stage('连续性检测', len(all_patterns)) as stage:
+            continuous_patterns = self.find_continuous_patterns(all_patterns)
+            stage['输出行数'] = len(continuous_patterns)
+        
+        # 4. 对冲关联检测（按净敞口，覆盖拆分下注的账户对）
+        if self.config.hedging_detection_enabled:
+            with self.tracker.stage('对冲关联检测', len(self.df_valid)) as stage:
+                hedging_patterns = self.detect_hedging_pairs(self.df_valid)
+                stage['输出行数'] = len(hedging_patterns)
+            continuous_patterns.extend(hedging_patterns)
         
         logger.info(f"检测完成: 发现 {len(continuous_patterns)} 个连续对刷模式")
         
         return continuous_patterns
     
-    def detect_single_account_wash_trades(self, df):
-        """检测单账户对刷模式（同一账户在同一局下注对立面）"""
-        patterns = []
-        
-        # 按账户、局号、游戏类型分组
-        grouped = df.groupby(['会员账号', '局号', '标准化游戏类型'])
-        
-        for (account, period, game_type), group in grouped:
-            if len(group) < 2:
-                continue
-            
-            # 获取该局的所有下注玩法
-            bet_types = set(group['标准化下注玩法'].tolist())
-            
-            # 检查是否有对立的下注
-            for opposite_group in self.config.exclusive_bet_groups:
-                # 检查是否同时包含对立组中的两个元素
-                if opposite_group.issubset(bet_types):
-                    # 提取对立下注的详细信息
-                    opposite_bets = []
-                    total_amount = 0
-                    
-                    for bet_type in opposite_group:
-                        bet_data = group[group['标准化下注玩法'] == bet_type]
-                        if not bet_data.empty:
-                            amount = bet_data['投注金额'].sum()
-                            opposite_bets.append({
-                                '下注玩法': bet_type,
-                                '金额': amount
-                            })
-                            total_amount += amount
-                    
-                    if len(opposite_bets) == 2:
-                        # 计算相似度（金额比例）
-                        amount1 = opposite_bets[0]['金额']
-                        amount2 = opposite_bets[1]['金额']
-                        similarity = min(amount1, amount2) / max(amount1, amount2) if max(amount1, amount2) > 0 else 0
-                        
-                        if similarity >= self.config.amount_similarity_threshold:
-                            pattern = {
-                                '局号': period,
-                                '游戏类型': game_type,
-                                '账户组': [account],
-                                '账户数量': 1,
-                                '下注玩法组': [opposite_bets[0]['下注玩法'], opposite_bets[1]['下注玩法']],
-                                '金额组': [amount1, amount2],
-                                '总金额': total_amount,
-                                '相似度': similarity,
-                                '模式': f'单账户对立下注-{opposite_bets[0]["下注玩法"]}vs{opposite_bets[1]["下注玩法"]}',
-                                '对立类型': f'{opposite_bets[0]["下注玩法"]}-{opposite_bets[1]["下注玩法"]}',
-                                '检测类型': '单账户对刷',
-                                '账户活跃度': self.get_account_activity_level(account, game_type)
-                            }
-                            patterns.append(pattern)
+    def _use_parallel_detection(self):
+        """是否启用分片并行检测：需要多个进程、足够的数据量和fork启动方式"""
+        if self.config.detection_workers <= 1 or len(self.df_valid) < self.config.parallel_min_records:
+            return False
+        if 'fork' not in multiprocessing.get_all_start_methods():
+            logger.info("当前平台不支持fork，使用串行检测")
+            return False
+        return True
+    
+    def _get_candidate_thresholds(self):
+        """各项检测的当前相似度阈值：单账户为'single'，多账户为账户数"""
+        thresholds = {'single': self.config.amount_similarity_threshold}
+        for account_count in range(2, self.config.max_accounts_in_group + 1):
+            thresholds[account_count] = self._get_similarity_threshold(account_count)
+        return thresholds
+    
+    def _prefetch_candidates_parallel(self, candidate_store, use_floor, pair_filter=None):
+        """分片并行计算缺失的候选并写入候选存储，返回单局对立账户数最大值"""
+        floors = {}
+        for key, threshold in self._get_candidate_thresholds().items():
+            cached = candidate_store.get(key)
+            if cached is None or cached[0] > threshold:
+                floors[key] = self._candidate_floor(key, threshold) if use_floor else threshold
+        if not floors and 'max_opposing_bettors' in candidate_store:
+            return candidate_store['max_opposing_bettors']
+        
+        shard_data, blocks = self._build_shard_data(floors)
+        shard_data['pair_filter'] = pair_filter
+        try:
+            workers = min(self.config.detection_workers, len(shard_data['offsets']) - 1)
+            with ProcessPoolExecutor(
+                max_workers=workers,
+                mp_context=multiprocessing.get_context('fork'),
+                initializer=_init_shard_worker,
+                initargs=(self, shard_data)
+            ) as executor:
+                shard_results = list(executor.map(_detect_shard, range(len(shard_data['offsets']) - 1)))
+        finally:
+            for block in blocks:
+                block.close()
+                block.unlink()
+        
+        max_opposing_bettors = max((result[1] for result in shard_results), default=0)
+        for key, floor in floors.items():
+            frames = [result[0][key] for result in shard_results if key in result[0] and not result[0][key].empty]
+            candidate_store[key] = (floor, self._merge_shard_candidates(key, frames))
+        candidate_store['max_opposing_bettors'] = max_opposing_bettors
+        logger.info(f"并行检测完成: {len(shard_results)} 个分片, {workers} 个进程")
+        return max_opposing_bettors
+    
+    def _build_shard_data(self, floors):
+        """按(游戏类型, 局号区间)分片：编码数组按分片重排后放入共享内存，每个分片是连续的一段"""
+        df = self.df_valid
+        n_ranges = max(1, self.config.detection_workers * self.config.shards_per_worker)
+        period_codes = df['局号'].cat.codes.to_numpy()
+        game_codes = df['标准化游戏类型'].cat.codes.to_numpy()
+        
+        # 按记录数把局号编码切成连续区间，对局不会跨区间
+        period_counts = np.bincount(period_codes, minlength=len(df['局号'].cat.categories))
+        cumulative = np.cumsum(period_counts)
+        cut_points = np.searchsorted(cumulative, np.arange(1, n_ranges) * (len(df) / n_ranges), side='right')
+        period_range = np.searchsorted(cut_points, np.arange(len(period_counts)), side='right')
+        shard_ids = game_codes.astype(np.int64) * n_ranges + period_range[period_codes]
+        
+        # 稳定排序保证分片内仍是原始行顺序
+        order = np.argsort(shard_ids, kind='stable')
+        shard_sizes = np.bincount(shard_ids, minlength=len(df['标准化游戏类型'].cat.categories) * n_ranges)
+        offsets = np.concatenate(([0], np.cumsum(shard_sizes[shard_sizes > 0])))
+        
+        blocks = []
+        arrays = {}
+        for column in CORE_CODE_COLUMNS + [AMOUNT_CENTS_COLUMN]:
+            if column == AMOUNT_CENTS_COLUMN:
+                values = df[column].to_numpy()
+            else:
+                values = df[column].cat.codes.to_numpy()
+            block = shared_memory.SharedMemory(create=True, size=max(1, values.nbytes))
+            blocks.append(block)
+            shared = np.ndarray(values.shape, dtype=values.dtype, buffer=block.buf)
+            np.take(values, order, out=shared)
+            arrays[column] = shared
+        
+        shard_data = {
+            'arrays': arrays,
+            'categories': {column: df[column].cat.categories for column in CORE_CODE_COLUMNS},
+            'offsets': offsets,
+            'floors': floors
+        }
+        return shard_data, blocks
+    
+    def _find_shard_candidates(self, shard_data, shard_index):
+        """计算单个分片的候选 - 返回({检测项: 候选}, 单局对立账户数最大值)"""
+        start, end = shard_data['offsets'][shard_index], shard_data['offsets'][shard_index + 1]
+        frame = pd.DataFrame({
+            column: pd.Categorical.from_codes(
+                shard_data['arrays'][column][start:end],
+                dtype=pd.CategoricalDtype(shard_data['categories'][column])
+            )
+            for column in CORE_CODE_COLUMNS
+        })
+        frame[AMOUNT_CENTS_COLUMN] = shard_data['arrays'][AMOUNT_CENTS_COLUMN][start:end]
+        
+        floors = shard_data['floors']
+        pair_filter = shard_data.get('pair_filter')
+        results = {}
+        if 'single' in floors:
+            results['single'] = self._find_single_account_candidates(frame, floors['single'])
+        
+        main_bets = self._build_main_bet_table(frame)
+        max_opposing_bettors = self.count_max_opposing_bettors(main_bets)
+        for key, floor in floors.items():
+            if key == 'single' or key > max_opposing_bettors:
+                continue
+            if key == 2:
+                results[key] = self._find_pair_candidates(main_bets, floor, np.inf, pair_filter)
+            else:
+                results[key] = self._find_group_candidates(main_bets, key, floor, np.inf, pair_filter)
+        return results, max_opposing_bettors
+    
+    def _merge_shard_candidates(self, key, frames):
+        """合并各分片的候选，并按串行检测的顺序重新排序"""
+        if not frames:
+            return pd.DataFrame()
         
+        candidates = pd.concat(frames, ignore_index=True)
+        if key == 'single':
+            # 串行检测按(账户, 局号, 游戏类型)分组编号排序，分组编号只在分片内有效
+            sort_codes = [
+                pd.Categorical(candidates[column], categories=self.df_valid[column].cat.categories).codes
+                for column in ['会员账号', '局号', '标准化游戏类型']
+            ]
+            order = np.lexsort([candidates['对立组顺序'].to_numpy()] + sort_codes[::-1])
+            return candidates.drop(columns='分组编号').iloc[order].reset_index(drop=True)
+        if key == 2:
+            sort_columns = ['局号', '标准化游戏类型', '首次位置_1', '首次位置_2']
+        else:
+            sort_columns = ['局号', '标准化游戏类型', '排序键']
+        return candidates.sort_values(sort_columns, kind='stable').reset_index(drop=True)
+    
+    def detect_single_account_wash_trades(self, df, candidate_store=None):
+        """检测单账户对刷模式（同一账户在同一局下注对立面）"""
+        candidates = self._get_candidates(
+            candidate_store, 'single', self.config.amount_similarity_threshold,
+            lambda min_similarity: self._find_single_account_candidates(df, min_similarity)
+        )
+        candidates = self._filter_single_account_candidates(candidates)
+        patterns = self._build_single_account_patterns(candidates)
+
         logger.info(f"单账户对刷检测完成: 发现 {len(patterns)} 个模式")
         return patterns
+
+    def _get_candidates(self, candidate_store, key, threshold, finder):
+        """获取候选：缓存的下限不高于当前阈值时直接复用，否则按_candidate_floor的下限重新计算"""
+        if candidate_store is None:
+            return finder(threshold)
+        
+        cached = candidate_store.get(key)
+        if cached is not None and cached[0] <= threshold:
+            return cached[1]
+        
+        floor = self._candidate_floor(key, threshold)
+        candidates = finder(floor)
+        candidate_store[key] = (floor, candidates)
+        return candidates
     
-    def detect_multi_account_wash_trades(self, df, n_accounts):
-        """检测多账户对刷模式"""
+    def _candidate_floor(self, key, threshold):
+        """缓存候选时使用的相似度下限：单账户和2账户取最宽松的下限，3个及以上账户取当前阈值"""
+        if key != 'single' and key >= 3:
+            return threshold
+        return min(self.config.candidate_similarity_floor, threshold)
+
+    def _get_bet_type_bits(self):
+        """为每种标准化下注玩法分配一个二进制位"""
+        return {bet_type: 1 << i for i, bet_type in enumerate(self.config.bet_type_variants)}
+
+    def _find_single_account_candidates(self, df, min_similarity=None):
+        """位掩码向量化查找单账户对立下注候选"""
+        if df is None or len(df) == 0:
+            return pd.DataFrame()
+
+        if min_similarity is None:
+            min_similarity = self.config.amount_similarity_threshold
+
+        keys = ['会员账号', '局号', '标准化游戏类型']
+        bet_bits = self._get_bet_type_bits()
+
+        # 每个(账户, 局号, 游戏类型)编号，编号顺序与分组排序一致
+        group_ids = df.groupby(keys, sort=True, observed=True).ngroup().to_numpy()
+        n_groups = int(group_ids.max()) + 1
+        bet_codes, bet_labels = self._column_codes(df['标准化下注玩法'])
+        # 按编码查表得到每行的位值，未知玩法为0
+        label_bits = np.array([bet_bits.get(label, 0) for label in bet_labels] + [0], dtype=np.int64)
+        row_bits = label_bits[bet_codes]
+        amounts = self._amount_values(df)
+
+        # 按位或得到每个账户每局的下注玩法集合
+        group_masks = np.zeros(n_groups, dtype=np.int64)
+        np.bitwise_or.at(group_masks, group_ids, row_bits)
+
+        candidate_frames = []
+        for group_order, exclusive_group in enumerate(self.config.exclusive_bet_groups):
+            exclusive_list = list(exclusive_group)
+            if len(exclusive_list) != 2 or not all(bet in bet_bits for bet in exclusive_list):
+                continue
+
+            bet1, bet2 = exclusive_list
+            exclusive_mask = bet_bits[bet1] | bet_bits[bet2]
+            matched = np.flatnonzero((group_masks & exclusive_mask) == exclusive_mask)
+            if len(matched) == 0:
+                continue
+
+            # 只对命中的分组计算两侧金额
+            row_selected = np.isin(group_ids, matched) & ((row_bits & exclusive_mask) != 0)
+            local_ids = np.searchsorted(matched, group_ids[row_selected])
+            is_bet1 = (row_bits[row_selected] == bet_bits[bet1])
+            selected_amounts = amounts[row_selected]
+            amount1 = np.bincount(local_ids[is_bet1], weights=selected_amounts[is_bet1], minlength=len(matched))
+            amount2 = np.bincount(local_ids[~is_bet1], weights=selected_amounts[~is_bet1], minlength=len(matched))
+
+            max_amount = np.maximum(amount1, amount2)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                similarity = np.where(max_amount > 0, np.minimum(amount1, amount2) / max_amount, 0.0)
+
+            keep = similarity >= min_similarity
+            if not keep.any():
+                continue
+
+            candidate_frames.append(pd.DataFrame({
+                '分组编号': matched[keep],
+                '对立组顺序': group_order,
+                '玩法1': bet1,
+                '玩法2': bet2,
+                '金额1': amount1[keep],
+                '金额2': amount2[keep],
+                '相似度': similarity[keep]
+            }))
+
+        if not candidate_frames:
+            return pd.DataFrame()
+
+        candidates = pd.concat(candidate_frames, ignore_index=True)
+        candidates = candidates.sort_values(['分组编号', '对立组顺序'], kind='stable').reset_index(drop=True)
+
+        # 取回每个分组的账户、局号、游戏类型
+        first_rows = np.full(n_groups, len(group_ids), dtype=np.int64)
+        np.minimum.at(first_rows, group_ids, np.arange(len(group_ids)))
+        label_rows = first_rows[candidates['分组编号'].to_numpy()]
+        for column in keys:
+            candidates[column] = np.asarray(df[column].iloc[label_rows], dtype=object)
+
+        return candidates
+
+    def _filter_single_account_candidates(self, candidates):
+        """按当前相似度阈值过滤单账户候选"""
+        if candidates is None or candidates.empty:
+            return candidates
+        return candidates[candidates['相似度'].to_numpy() >= self.config.amount_similarity_threshold]
+
+    def _build_single_account_patterns(self, candidates):
+        """将单账户候选转换为模式字典"""
+        if candidates is None or candidates.empty:
+            return []
+
         patterns = []
+        columns = zip(
+            candidates['会员账号'].tolist(),
+            candidates['局号'].tolist(),
+            candidates['标准化游戏类型'].tolist(),
+            candidates['玩法1'].tolist(),
+            candidates['玩法2'].tolist(),
+            candidates['金额1'].tolist(),
+            candidates['金额2'].tolist(),
+            candidates['相似度'].tolist()
+        )
+        for account, period, game_type, bet1, bet2, amount1, amount2, similarity in columns:
+            patterns.append({
+                '局号': period,
+                '游戏类型': game_type,
+                '账户组': [account],
+                '账户数量': 1,
+                '下注玩法组': [bet1, bet2],
+                '金额组': [amount1, amount2],
+                '总金额': amount1 + amount2,
+                '相似度': similarity,
+                '模式': f'单账户对立下注-{bet1}vs{bet2}',
+                '对立类型': f'{bet1}-{bet2}',
+                '检测类型': '单账户对刷',
+                '账户活跃度': self.get_account_activity_level(account, game_type)
+            })
+
+        return patterns
+
+    def detect_multi_account_wash_trades(self, df, n_accounts, main_bets=None, candidate_store=None, pair_filter=None):
+        """检测多账户对刷模式"""
+        def get_main_bets():
+            # 候选已缓存时不需要主注表
+            return main_bets if main_bets is not None else self._build_main_bet_table(df)
+
+        threshold = self._get_similarity_threshold(n_accounts)
+        if n_accounts == 2:
+            # 2账户使用向量化配对引擎
+            candidates = self._get_candidates(
+                candidate_store, n_accounts, threshold,
+                lambda min_similarity: self._find_pair_candidates(get_main_bets(), min_similarity, np.inf, pair_filter)
+            )
+            candidates = self._filter_multi_account_candidates(candidates, n_accounts)
+            patterns = self._build_pair_patterns(candidates)
+        else:
+            # 3个及以上账户使用剪枝的k账户搜索
+            candidates = self._get_candidates(
+                candidate_store, n_accounts, threshold,
+                lambda min_similarity: self._find_group_candidates(
+                    get_main_bets(), n_accounts, min_similarity, np.inf, pair_filter
+                )
+            )
+            candidates = self._filter_multi_account_candidates(candidates, n_accounts)
+            patterns = self._build_group_patterns(candidates)
+
+        logger.info(f"多账户对刷检测完成({n_accounts}账户): 发现 {len(patterns)} 个模式")
+        return patterns
+
+    def _filter_multi_account_candidates(self, candidates, n_accounts):
+        """按当前相似度阈值和金额比例过滤多账户候选"""
+        if candidates is None or candidates.empty:
+            return candidates
+
+        keep = candidates['相似度'].to_numpy() >= self._get_similarity_threshold(n_accounts)
+        # 2账户始终检查金额比例，3个及以上账户在启用金额平衡过滤时检查
+        if n_accounts == 2 or self.config.amount_threshold['enable_threshold_filter']:
+            keep &= candidates['金额比例'].to_numpy() <= self.config.amount_threshold['max_amount_ratio']
+        return candidates[keep]
+
+    def _get_shared_round_filter(self, candidate_store=None):
+        """获取共同局数预过滤器，候选存储中的多账户候选都是按存储的过滤器计算的"""
+        if not self.config.shared_round_prefilter or self.config.min_continuous_periods <= 1:
+            min_shared_rounds = 1
+        else:
+            min_shared_rounds = self.config.min_continuous_periods
+        if candidate_store is None:
+            return self._build_shared_round_filter(self.df_valid, min_shared_rounds)
+        
+        # 缓存的下限不高于当前下限时过滤结果是当前结果的超集，可以直接复用
+        if 'shared_round_bound' in candidate_store and candidate_store['shared_round_bound'] <= min_shared_rounds:
+            return candidate_store['shared_round_filter']
+        
+        # 下限降低时按旧下限算出的多账户候选不完整，需要重新计算
+        for key in [key for key in candidate_store if isinstance(key, int)]:
+            del candidate_store[key]
+        pair_filter = self._build_shared_round_filter(self.df_valid, min_shared_rounds)
+        candidate_store['shared_round_bound'] = min_shared_rounds
+        candidate_store['shared_round_filter'] = pair_filter
+        return pair_filter
+    
+    def _build_shared_round_filter(self, df, min_shared_rounds):
+        """统计同一游戏中账户对的共同下注局数，返回共同局数不少于下限的账户对（下限不超过1时返回None）
         
-        # 按局号和游戏类型分组
-        grouped = df.groupby(['局号', '标准化游戏类型'])
+        按局对(局, 账户)关联矩阵做CSR排列，同样大小的局一起展开为账户对，分块计数后合并
+        """
+        if min_shared_rounds <= 1 or df is None or len(df) == 0:
+            return None
         
-        for (period, game_type), period_data in grouped:
-            accounts = period_data['会员账号'].unique()
-            
-            if len(accounts) < n_accounts:
+        directions = {bet for pair in self._iter_opposite_directions() for bet in pair}
+        in_directions = df['标准化下注玩法'].isin(directions).to_numpy()
+        account_labels = df['会员账号'].cat.categories
+        game_labels = df['标准化游戏类型'].cat.categories
+        n_accounts = len(account_labels)
+        n_games = len(game_labels)
+        
+        account_codes = df['会员账号'].cat.codes.to_numpy()[in_directions].astype(np.int64)
+        game_codes = df['标准化游戏类型'].cat.codes.to_numpy()[in_directions].astype(np.int64)
+        period_codes = df['局号'].cat.codes.to_numpy()[in_directions].astype(np.int64)
+        
+        # 关联矩阵的非零元：唯一的(局, 账户)，按局排序
+        entries = np.unique((period_codes * n_games + game_codes) * n_accounts + account_codes)
+        entry_rounds = entries // n_accounts
+        entry_accounts = entries % n_accounts
+        entry_games = entry_rounds % n_games
+        
+        # 所在局数不足下限的账户不可能满足，先从矩阵中去掉
+        account_games = entry_games * n_accounts + entry_accounts
+        game_account_keys, inverse, round_counts = np.unique(account_games, return_inverse=True, return_counts=True)
+        frequent = round_counts[inverse] >= min_shared_rounds
+        entry_rounds, entry_accounts, entry_games = entry_rounds[frequent], entry_accounts[frequent], entry_games[frequent]
+        
+        boundary = np.flatnonzero(entry_rounds[1:] != entry_rounds[:-1]) + 1
+        indptr = np.concatenate(([0], boundary, [len(entry_rounds)]))
+        round_sizes = np.diff(indptr)
+        
+        block_keys = []
+        block_counts = []
+        for size in np.unique(round_sizes[round_sizes >= 2]).tolist():
+            first, second = np.triu_indices(size, 1)
+            round_starts = indptr[:-1][round_sizes == size]
+            rows_per_block = max(1, self.config.shared_round_block_pairs // len(first))
+            for block_start in range(0, len(round_starts), rows_per_block):
+                starts = round_starts[block_start:block_start + rows_per_block]
+                members = entry_accounts[starts[:, None] + np.arange(size)]
+                games = entry_games[starts][:, None]
+                keys = (games * n_accounts + members[:, first]) * n_accounts + members[:, second]
+                keys, counts = np.unique(keys.ravel(), return_counts=True)
+                block_keys.append(keys)
+                block_counts.append(counts)
+        
+        if block_keys:
+            keys, inverse = np.unique(np.concatenate(block_keys), return_inverse=True)
+            counts = np.bincount(inverse, weights=np.concatenate(block_counts)).astype(np.int64)
+            pairs = keys[counts >= min_shared_rounds]
+        else:
+            counts = pairs = np.empty(0, dtype=np.int64)
+        
+        # 至少有一个满足条件的账户对的(游戏类型, 账户)
+        pair_games = pairs // (n_accounts * n_accounts)
+        active_accounts = np.unique(np.concatenate((
+            pair_games * n_accounts + (pairs // n_accounts) % n_accounts,
+            pair_games * n_accounts + pairs % n_accounts
+        )))
+        logger.info(
+            f"共同局数预过滤(≥{min_shared_rounds}局): {len(counts):,} 个共同下注的账户对中保留 {len(pairs):,} 个, "
+            f"涉及 {len(active_accounts):,} 个账户"
+        )
+        return {
+            'min_shared_rounds': min_shared_rounds,
+            'accounts': account_labels,
+            'games': game_labels,
+            'pairs': pairs,
+            'active_accounts': active_accounts
+        }
+    
+    def _shared_round_codes(self, pair_filter, series, column):
+        """按预过滤器的取值字典编码，字典中没有的取值为-1"""
+        labels = pair_filter[column]
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            categories = series.cat.categories
+            if categories is labels or categories.equals(labels):
+                return series.cat.codes.to_numpy().astype(np.int64)
+            return labels.get_indexer(categories).astype(np.int64)[series.cat.codes.to_numpy()]
+        return labels.get_indexer(series).astype(np.int64)
+    
+    def _filter_active_bets(self, main_bets, pair_filter):
+        """只保留至少有一个满足共同局数的账户对的主注"""
+        if pair_filter is None or main_bets.empty:
+            return main_bets
+        accounts = self._shared_round_codes(pair_filter, main_bets['会员账号'], 'accounts')
+        games = self._shared_round_codes(pair_filter, main_bets['标准化游戏类型'], 'games')
+        keys = games * len(pair_filter['accounts']) + accounts
+        keep = self._sorted_contains(pair_filter['active_accounts'], keys) & (accounts >= 0) & (games >= 0)
+        return main_bets[keep]
+    
+    def _pairs_allowed(self, pair_filter, games, accounts1, accounts2):
+        """判断账户对的共同局数是否满足预过滤下限（参数为预过滤器编码）"""
+        n_accounts = len(pair_filter['accounts'])
+        low = np.minimum(accounts1, accounts2)
+        high = np.maximum(accounts1, accounts2)
+        keys = (games * n_accounts + low) * n_accounts + high
+        return self._sorted_contains(pair_filter['pairs'], keys) & (low >= 0) & (games >= 0)
+    
+    def _sorted_contains(self, sorted_keys, keys):
+        """在已排序的键数组中二分查找，返回每个键是否存在"""
+        if len(sorted_keys) == 0:
+            return np.zeros(np.shape(keys), dtype=bool)
+        found = np.searchsorted(sorted_keys, keys)
+        return sorted_keys[np.minimum(found, len(sorted_keys) - 1)] == keys
+    
+    def _build_main_bet_table(self, df):
+        """构建主注表：每个(局号, 游戏类型, 账户)一行，取金额最大的下注"""
+        keys = ['局号', '标准化游戏类型', '会员账号']
+        frame = df[keys + ['标准化下注玩法']].reset_index(drop=True)
+        frame['投注金额'] = self._amount_values(df)
+        frame['首次位置'] = np.arange(len(frame))
+
+        grouped = frame.groupby(keys, sort=False, observed=True)
+        # idxmax取首个最大值，与逐账户idxmax的结果一致
+        main_positions = grouped['投注金额'].idxmax().to_numpy()
+        first_positions = grouped['首次位置'].min().to_numpy()
+
+        main_bets = frame.iloc[main_positions].reset_index(drop=True)
+        # 账户在该局首次出现的位置，用于还原账户组合的顺序
+        main_bets['首次位置'] = first_positions
+        return main_bets
+
+    def _iter_opposite_directions(self):
+        """遍历对立组，返回(方向1, 方向2)，顺序与逐组合检测一致"""
+        for opposite_group in self.config.opposite_groups:
+            opposite_list = list(opposite_group)
+            if len(opposite_list) == 2:
+                yield opposite_list[0], opposite_list[1]
+
+    def _find_pair_candidates(self, main_bets, min_similarity=None, max_ratio=None, pair_filter=None):
+        """向量化查找2账户对立下注候选：按局号和游戏类型自连接主注表"""
+        join_keys = ['局号', '标准化游戏类型']
+        value_columns = ['会员账号', '标准化下注玩法', '投注金额', '首次位置']
+        if max_ratio is None:
+            max_ratio = self.config.amount_threshold['max_amount_ratio']
+        if min_similarity is None:
+            min_similarity = self.config.account_count_similarity_thresholds[2]
+
+        main_bets = self._filter_active_bets(main_bets, pair_filter)
+        candidate_frames = []
+        for dir1, dir2 in self._iter_opposite_directions():
+            side1 = main_bets.loc[main_bets['标准化下注玩法'] == dir1, join_keys + value_columns]
+            side2 = main_bets.loc[main_bets['标准化下注玩法'] == dir2, join_keys + value_columns]
+            if side1.empty or side2.empty:
                 continue
-            
-            # 检查账户局数差异
-            valid_accounts = []
-            for account in accounts:
-                if self._check_account_period_difference([account], game_type):
-                    valid_accounts.append(account)
-            
-            if len(valid_accounts) < n_accounts:
+
+            pairs = side1.merge(side2, on=join_keys, suffixes=('_1', '_2'))
+            self.tracker.count('配对数', len(pairs))
+            if pair_filter is not None and not pairs.empty:
+                allowed = self._pairs_allowed(
+                    pair_filter,
+                    self._shared_round_codes(pair_filter, pairs['标准化游戏类型'], 'games'),
+                    self._shared_round_codes(pair_filter, pairs['会员账号_1'], 'accounts'),
+                    self._shared_round_codes(pair_filter, pairs['会员账号_2'], 'accounts')
+                )
+                self.tracker.count('预过滤排除配对数', len(allowed) - allowed.sum())
+                pairs = pairs[allowed]
+            if pairs.empty:
                 continue
-            
-            # 生成所有可能的账户组合
-            for account_group in combinations(valid_accounts, n_accounts):
-                group_patterns = self._analyze_account_group(period_data, list(account_group), period, game_type, n_accounts)
-                patterns.extend(group_patterns)
-        
-        logger.info(f"多账户对刷检测完成({n_accounts}账户): 发现 {len(patterns)} 个模式")
+
+            amount1 = pairs['投注金额_1'].to_numpy(dtype=np.float64)
+            amount2 = pairs['投注金额_2'].to_numpy(dtype=np.float64)
+            max_amount = np.maximum(amount1, amount2)
+            min_amount = np.minimum(amount1, amount2)
+            with np.errstate(divide='ignore', invalid='ignore'):
+                ratio = np.where(min_amount > 0, max_amount / min_amount, np.inf)
+                similarity = np.where(max_amount > 0, min_amount / max_amount, 0.0)
+
+            keep = (ratio <= max_ratio) & (similarity >= min_similarity)
+            if not keep.any():
+                continue
+
+            pairs = pairs[keep].copy()
+            pairs['相似度'] = similarity[keep]
+            pairs['金额比例'] = ratio[keep]
+            pairs['方向1'] = dir1
+            pairs['方向2'] = dir2
+            candidate_frames.append(pairs)
+
+        if not candidate_frames:
+            return pd.DataFrame()
+
+        candidates = pd.concat(candidate_frames, ignore_index=True)
+
+        # 账户组内按首次出现顺序排列，与combinations的输出顺序保持一致
+        swap = candidates['首次位置_1'].to_numpy() > candidates['首次位置_2'].to_numpy()
+        for column in value_columns:
+            first = candidates[f'{column}_1'].to_numpy(copy=True)
+            second = candidates[f'{column}_2'].to_numpy(copy=True)
+            first[swap], second[swap] = second[swap], first[swap]
+            candidates[f'{column}_1'] = first
+            candidates[f'{column}_2'] = second
+
+        candidates = candidates.sort_values(
+            ['局号', '标准化游戏类型', '首次位置_1', '首次位置_2'], kind='stable'
+        ).reset_index(drop=True)
+        return candidates
+
+    def _build_pair_patterns(self, candidates):
+        """将2账户候选转换为模式字典"""
+        if candidates is None or candidates.empty:
+            return []
+
+        patterns = []
+        columns = zip(
+            candidates['局号'].tolist(),
+            candidates['标准化游戏类型'].tolist(),
+            candidates['会员账号_1'].tolist(),
+            candidates['会员账号_2'].tolist(),
+            candidates['标准化下注玩法_1'].tolist(),
+            candidates['标准化下注玩法_2'].tolist(),
+            candidates['投注金额_1'].tolist(),
+            candidates['投注金额_2'].tolist(),
+            candidates['相似度'].tolist(),
+            candidates['方向1'].tolist(),
+            candidates['方向2'].tolist()
+        )
+        for period, game_type, account1, account2, bet1, bet2, amount1, amount2, similarity, dir1, dir2 in columns:
+            patterns.append({
+                '局号': period,
+                '游戏类型': game_type,
+                '账户组': [account1, account2],
+                '账户数量': 2,
+                '下注玩法组': [bet1, bet2],
+                '金额组': [amount1, amount2],
+                '总金额': amount1 + amount2,
+                '相似度': similarity,
+                '模式': f'多账户对立下注-{dir1}vs{dir2}',
+                '对立类型': f'{dir1}-{dir2}',
+                '检测类型': '多账户对刷'
+            })
+
         return patterns
+
+    def _get_similarity_threshold(self, n_accounts):
+        """获取k账户匹配度阈值，未配置的账户数沿用最接近的较小账户数阈值"""
+        thresholds = self.config.account_count_similarity_thresholds
+        if n_accounts in thresholds:
+            return thresholds[n_accounts]
+
+        smaller = [k for k in thresholds if k <= n_accounts]
+        if smaller:
+            return thresholds[max(smaller)]
+        return max(thresholds.values())
+
+    def _select_opposing_bets(self, main_bets, dir1, dir2, min_accounts):
+        """筛选对立双方均有人下注且人数不少于min_accounts的局中的主注"""
+        keys = ['局号', '标准化游戏类型']
+        bets = main_bets[main_bets['标准化下注玩法'].isin([dir1, dir2])]
+        if len(bets) < min_accounts:
+            return bets.iloc[0:0]
+
+        is_dir1 = (bets['标准化下注玩法'] == dir1).to_numpy()
+        stats = pd.DataFrame({'是方向1': is_dir1}, index=pd.MultiIndex.from_frame(bets[keys]))
+        stats = stats.groupby(level=[0, 1], sort=False, observed=True)['是方向1'].agg(['size', 'sum'])
+
+        eligible = stats[
+            (stats['size'] >= min_accounts) &
+            (stats['sum'] > 0) &
+            (stats['sum'] < stats['size'])
+        ]
+        if eligible.empty:
+            return bets.iloc[0:0]
+
+        in_eligible = pd.MultiIndex.from_frame(bets[keys]).isin(eligible.index)
+        return bets[in_eligible]
+
+    def count_max_opposing_bettors(self, main_bets):
+        """统计单局中对立双方账户总数的最大值，用于跳过不可能出现的k账户检测"""
+        max_count = 0
+        for dir1, dir2 in self._iter_opposite_directions():
+            bets = self._select_opposing_bets(main_bets, dir1, dir2, 2)
+            if bets.empty:
+                continue
+            sizes = bets.groupby(['局号', '标准化游戏类型'], sort=False, observed=True).size()
+            max_count = max(max_count, int(sizes.max()))
+        return max_count
+
+    def _find_group_candidates(self, main_bets, n_accounts, min_similarity=None, max_ratio=None, pair_filter=None):
+        """剪枝搜索k账户(k>=3)对立下注候选：按局将主注分到对立两侧，只搜索金额平衡的组合"""
+        keys = ['局号', '标准化游戏类型']
+        if min_similarity is None:
+            min_similarity = self._get_similarity_threshold(n_accounts)
+        if max_ratio is None:
+            if self.config.amount_threshold['enable_threshold_filter']:
+                max_ratio = self.config.amount_threshold['max_amount_ratio']
+            else:
+                max_ratio = np.inf
+
+        main_bets = self._filter_active_bets(main_bets, pair_filter)
+        # 组内账户两两组合的下标，对所有组合共用
+        pair_first, pair_second = np.triu_indices(n_accounts, 1)
+        records = []
+        for dir1, dir2 in self._iter_opposite_directions():
+            bets = self._select_opposing_bets(main_bets, dir1, dir2, n_accounts)
+            if bets.empty:
+                continue
+
+            bets = bets.sort_values(keys + ['投注金额', '首次位置'], kind='stable')
+            period_codes, period_labels = self._column_codes(bets['局号'])
+            game_codes, game_labels = self._column_codes(bets['标准化游戏类型'])
+            account_codes, account_labels = self._column_codes(bets['会员账号'])
+            amounts = bets['投注金额'].to_numpy(dtype=np.float64)
+            positions = bets['首次位置'].to_numpy()
+            is_dir1 = (bets['标准化下注玩法'] == dir1).to_numpy()
+            if pair_filter is not None:
+                filter_accounts = self._shared_round_codes(pair_filter, bets['会员账号'], 'accounts')
+                filter_games = self._shared_round_codes(pair_filter, bets['标准化游戏类型'], 'games')
+
+            # 每局的起止位置
+            boundary = np.flatnonzero(
+                (period_codes[1:] != period_codes[:-1]) | (game_codes[1:] != game_codes[:-1])
+            ) + 1
+            starts = np.concatenate(([0], boundary))
+            ends = np.concatenate((boundary, [len(bets)]))
+
+            searched_rounds = 0
+            skipped_rounds = 0
+            evaluated_groups = 0
+            # 命中的组合先只记录行号，循环结束后统一解码
+            group_rows = []
+            group_starts = []
+            similarities = []
+            ratios = []
+            for start, end in zip(starts.tolist(), ends.tolist()):
+                rows = np.arange(start, end)
+                allowed = None
+                if pair_filter is not None:
+                    # 组内任意两个账户的共同局数都要满足下限
+                    allowed = self._pairs_allowed(
+                        pair_filter, filter_games[start],
+                        filter_accounts[rows][:, None], filter_accounts[rows][None, :]
+                    )
+                    keep = self._prune_by_degree(allowed, n_accounts - 1)
+                    if keep.sum() < n_accounts:
+                        skipped_rounds += 1
+                        continue
+                    rows, allowed = rows[keep], allowed[np.ix_(keep, keep)]
+                
+                searched_rounds += 1
+                for members, similarity, ratio in self._search_balanced_groups(
+                    amounts[rows], is_dir1[rows], n_accounts, min_similarity, max_ratio
+                ):
+                    evaluated_groups += 1
+                    members = np.asarray(members)
+                    if allowed is not None and not allowed[members[pair_first], members[pair_second]].all():
+                        continue
+                    # 组内按账户在该局的首次出现顺序排列
+                    group_rows.append(sorted(rows[members].tolist(), key=lambda idx: positions[idx]))
+                    group_starts.append(start)
+                    similarities.append(similarity)
+                    ratios.append(ratio)
+            self.tracker.count('搜索局数', searched_rounds)
+            self.tracker.count('预过滤跳过局数', skipped_rounds)
+            self.tracker.count('平衡组合数', evaluated_groups)
+            if not group_rows:
+                continue
+
+            member_rows = np.asarray(group_rows, dtype=np.int64)
+            group_starts = np.asarray(group_starts, dtype=np.int64)
+            member_accounts = account_labels.take(account_codes[member_rows].ravel()).tolist()
+            member_is_dir1 = is_dir1[member_rows]
+            dir1_counts = member_is_dir1.sum(axis=1).tolist()
+            member_bets = np.where(member_is_dir1, dir1, dir2).tolist()
+            member_amounts = amounts[member_rows].tolist()
+            member_positions = positions[member_rows].tolist()
+            for i, (period, game_type, similarity, ratio, dir1_count) in enumerate(zip(
+                period_labels.take(period_codes[group_starts]).tolist(),
+                game_labels.take(game_codes[group_starts]).tolist(),
+                similarities, ratios, dir1_counts
+            )):
+                records.append({
+                    '局号': period,
+                    '标准化游戏类型': game_type,
+                    '账户组': member_accounts[i * n_accounts:(i + 1) * n_accounts],
+                    '下注玩法组': member_bets[i],
+                    '金额组': member_amounts[i],
+                    '相似度': similarity,
+                    '金额比例': ratio,
+                    '方向1': dir1,
+                    '方向2': dir2,
+                    '方向1数量': dir1_count,
+                    '方向2数量': n_accounts - dir1_count,
+                    '排序键': tuple(member_positions[i])
+                })
+
+        if not records:
+            return pd.DataFrame()
+
+        candidates = pd.DataFrame(records)
+        candidates = candidates.sort_values(
+            ['局号', '标准化游戏类型', '排序键'], kind='stable'
+        ).reset_index(drop=True)
+        return candidates
+
+    def _prune_by_degree(self, allowed, min_degree):
+        """反复去掉满足条件的同组伙伴少于min_degree个的账户，返回保留的掩码"""
+        keep = np.ones(len(allowed), dtype=bool)
+        while True:
+            degrees = allowed[np.ix_(keep, keep)].sum(axis=1)
+            weak = degrees < min_degree
+            if not weak.any():
+                return keep
+            keep[np.flatnonzero(keep)[weak]] = False
+            if not keep.any():
+                return keep
     
-    def _analyze_account_group(self, period_data, account_group, period, game_type, n_accounts):
-        """分析账户组的对刷模式"""
+    def _search_balanced_groups(self, amounts, is_dir1, n_accounts, min_similarity, max_ratio):
+        """在单局内(金额升序)搜索两侧均有且金额平衡的k账户组合，返回(成员下标, 相似度, 金额比例)"""
+        total = len(amounts)
+        for low_idx in range(total - n_accounts + 1):
+            low = amounts[low_idx]
+            if low <= 0:
+                continue
+
+            # 以low_idx为组内最小金额，可选成员只能落在金额窗口内
+            tail = amounts[low_idx + 1:]
+            in_window = (low / tail >= min_similarity) & (tail / low <= max_ratio)
+            window_size = int(np.count_nonzero(in_window))
+            if window_size < n_accounts - 1:
+                continue
+
+            window = np.arange(low_idx + 1, low_idx + 1 + window_size)
+            side1 = window[is_dir1[window]].tolist()
+            side2 = window[~is_dir1[window]].tolist()
+
+            # 组合必须同时包含对立两侧
+            low_is_dir1 = bool(is_dir1[low_idx])
+            for side1_count in range(n_accounts):
+                side2_count = n_accounts - 1 - side1_count
+                if side1_count > len(side1) or side2_count > len(side2):
+                    continue
+                if low_is_dir1 and side2_count == 0:
+                    continue
+                if not low_is_dir1 and side1_count == 0:
+                    continue
+
+                for picked1 in combinations(side1, side1_count):
+                    for picked2 in combinations(side2, side2_count):
+                        members = (low_idx,) + picked1 + picked2
+                        high = amounts[max(members)]
+                        yield members, float(low / high), float(high / low)
+
+    def _build_group_patterns(self, candidates):
+        """将k账户候选转换为模式字典"""
+        if candidates is None or candidates.empty:
+            return []
+
         patterns = []
+        for record in candidates.to_dict('records'):
+            dir1, dir2 = record['方向1'], record['方向2']
+            patterns.append({
+                '局号': record['局号'],
+                '游戏类型': record['标准化游戏类型'],
+                '账户组': list(record['账户组']),
+                '账户数量': len(record['账户组']),
+                '下注玩法组': list(record['下注玩法组']),
+                '金额组': list(record['金额组']),
+                '总金额': sum(record['金额组']),
+                '相似度': record['相似度'],
+                '模式': f"多账户对立下注-{dir1}({record['方向1数量']})vs{dir2}({record['方向2数量']})",
+                '对立类型': f'{dir1}-{dir2}',
+                '检测类型': '多账户对刷'
+            })
+
+        return patterns
+
+    def detect_hedging_pairs(self, df):
+        """对冲关联检测：同一游戏中净敞口长期反向的账户对，结果结构与连续对刷模式一致"""
+        exposures = self._build_exposure_table(df)
+        if exposures is None:
+            return []
         
-        # 获取账户组的数据
-        group_data = period_data[period_data['会员账号'].isin(account_group)]
+        pairs = self._score_hedging_pairs(exposures)
+        patterns = self._build_hedging_patterns(exposures, pairs)
+        logger.info(f"对冲关联检测完成: 发现 {len(patterns)} 个账户对")
+        return patterns
+    
+    def _build_exposure_table(self, df):
+        """每个(游戏类型, 局号, 账户)的带符号净敞口，按局排序；净敞口为0的记录不参与"""
+        if df is None or len(df) == 0:
+            return None
         
-        if len(group_data) < n_accounts:
-            return patterns
+        bet_codes, bet_labels = self._column_codes(df['标准化下注玩法'])
+        label_signs = np.array(
+            [self.config.hedging_bet_signs.get(label, 0) for label in bet_labels] + [0], dtype=np.float64
+        )
+        signed = label_signs[bet_codes] * self._amount_values(df)
+        signed_rows = signed != 0
+        if not signed_rows.any():
+            return None
         
-        # 分析每个账户的下注
-        account_bets = {}
-        for account in account_group:
-            account_data = group_data[group_data['会员账号'] == account]
-            if not account_data.empty:
-                # 取该账户在该局的主要下注（金额最大的）
-                main_bet = account_data.loc[account_data['投注金额'].idxmax()]
-                account_bets[account] = {
-                    '下注玩法': main_bet['标准化下注玩法'],
-                    '金额': main_bet['投注金额']
-                }
-        
-        if len(account_bets) < n_accounts:
-            return patterns
-        
-        # 检查对立模式
-        for opposite_group in self.config.opposite_groups:
-            opposite_list = list(opposite_group)
-            
-            if n_accounts == 2:
-                # 2个账户：一个下注A，一个下注B
-                if len(opposite_list) == 2:
-                    dir1, dir2 = opposite_list
-                    
-                    # 检查账户组的下注是否符合这种对立
-                    bet_types = [account_bets[acc]['下注玩法'] for acc in account_group]
+        account_codes, account_labels = self._column_codes(df['会员账号'])
+        game_codes, game_labels = self._column_codes(df['标准化游戏类型'])
+        period_codes, period_labels = self._column_codes(df['局号'])
+        n_accounts = len(account_labels)
+        n_games = len(game_labels)
+        
+        keys = (period_codes[signed_rows].astype(np.int64) * n_games + game_codes[signed_rows]) * n_accounts \
+            + account_codes[signed_rows]
+        entries, inverse = np.unique(keys, return_inverse=True)
+        exposure = np.bincount(inverse, weights=signed[signed_rows])
+        nonzero = exposure != 0
+        entries, exposure = entries[nonzero], exposure[nonzero]
+        
+        rounds = entries // n_accounts
+        accounts = entries % n_accounts
+        games = rounds % n_games
+        
+        # 净敞口局数不足的账户不可能满足最少对冲局数
+        _, account_inverse, account_rounds = np.unique(
+            games * n_accounts + accounts, return_inverse=True, return_counts=True
+        )
+        frequent = account_rounds[account_inverse] >= self.config.hedging_min_rounds
+        
+        return {
+            'rounds': rounds[frequent],
+            'accounts': accounts[frequent],
+            'games': games[frequent],
+            'exposure': exposure[frequent],
+            'account_labels': account_labels,
+            'game_labels': game_labels,
+            'period_labels': period_labels,
+            'bet_labels': bet_labels,
+            'bet_codes': bet_codes,
+            'game_codes': game_codes
+        }
+    
+    def _score_hedging_pairs(self, exposures):
+        """分块计算账户对的对冲得分 - 返回按得分降序的{游戏, 账户1, 账户2, 得分, 共同局数, 对冲局数}
+        
+        净敞口矩阵(局×账户)按局做CSR排列，同样大小的局一起展开为账户对，
+        按较小账户编码分块做加权计数，相当于分块计算XᵀX，每块只保留满足条件的账户对
+        """
+        rounds, accounts, games, exposure = (
+            exposures['rounds'], exposures['accounts'], exposures['games'], exposures['exposure']
+        )
+        n_accounts = len(exposures['account_labels'])
+        boundary = np.flatnonzero(rounds[1:] != rounds[:-1]) + 1
+        indptr = np.concatenate(([0], boundary, [len(rounds)]))
+        round_sizes = np.diff(indptr)
+        sizes = np.unique(round_sizes[round_sizes >= 2]).tolist()
+        
+        top_n = self.config.hedging_top_pairs
+        block_accounts = max(1, self.config.hedging_block_accounts)
+        best = None
+        for block_low in range(0, n_accounts, block_accounts):
+            block_high = block_low + block_accounts
+            block_keys, block_stats = [], []
+            for size in sizes:
+                first, second = np.triu_indices(size, 1)
+                round_starts = indptr[:-1][round_sizes == size]
+                rows_per_block = max(1, self.config.shared_round_block_pairs // len(first))
+                for chunk_start in range(0, len(round_starts), rows_per_block):
+                    starts = round_starts[chunk_start:chunk_start + rows_per_block][:, None] + np.arange(size)
+                    members = accounts[starts]
+                    values = exposure[starts]
+                    low = members[:, first]
+                    in_block = (low >= block_low) & (low < block_high)
+                    if not in_block.any():
+                        continue
                     
-                    if set(bet_types) == {dir1, dir2}:
-                        # 金额相似度检查
-                        amounts = [account_bets[acc]['金额'] for acc in account_group]
-                        max_ratio = self.config.amount_threshold['max_amount_ratio']
-                        
-                        if max(amounts) / min(amounts) <= max_ratio:
-                            similarity = min(amounts) / max(amounts) if max(amounts) > 0 else 0
-                            
-                            if similarity >= self.config.account_count_similarity_thresholds[n_accounts]:
-                                pattern = {
-                                    '局号': period,
-                                    '游戏类型': game_type,
-                                    '账户组': account_group,
-                                    '账户数量': n_accounts,
-                                    '下注玩法组': bet_types,
-                                    '金额组': amounts,
-                                    '总金额': sum(amounts),
-                                    '相似度': similarity,
-                                    '模式': f'多账户对立下注-{dir1}vs{dir2}',
-                                    '对立类型': f'{dir1}-{dir2}',
-                                    '检测类型': '多账户对刷'
-                                }
-                                patterns.append(pattern)
+                    # 同一局内账户编码升序，账户对键的较小编码在前
+                    pair_games = np.broadcast_to(games[starts[:, :1]], low.shape)[in_block]
+                    keys = (pair_games * n_accounts + low[in_block]) * n_accounts + members[:, second][in_block]
+                    value1 = values[:, first][in_block]
+                    value2 = values[:, second][in_block]
+                    keys, inverse = np.unique(keys, return_inverse=True)
+                    block_keys.append(keys)
+                    block_stats.append(np.stack([
+                        np.bincount(inverse, weights=value1 * value2),
+                        np.bincount(inverse, weights=value1 * value1),
+                        np.bincount(inverse, weights=value2 * value2),
+                        np.bincount(inverse),
+                        np.bincount(inverse, weights=value1 * value2 < 0)
+                    ]))
+            if not block_keys:
+                continue
             
-            elif n_accounts == 3:
-                # 3个账户：例如2个下注庄，1个下注闲
-                for dir1_count in range(1, n_accounts):
-                    dir2_count = n_accounts - dir1_count
-                    
-                    # 检查账户组的下注分布
-                    bet_types = [account_bets[acc]['下注玩法'] for acc in account_group]
-                    
-                    # 检查是否都是对立组中的玩法
-                    if all(bt in opposite_list for bt in bet_types):
-                        # 检查分布是否符合
-                        dir1 = opposite_list[0]
-                        dir2 = opposite_list[1] if len(opposite_list) > 1 else opposite_list[0]
-                        
-                        actual_dir1_count = bet_types.count(dir1)
-                        actual_dir2_count = bet_types.count(dir2)
-                        
-                        if actual_dir1_count == dir1_count and actual_dir2_count == dir2_count:
-                            # 金额检查
-                            amounts = [account_bets[acc]['金额'] for acc in account_group]
-                            
-                            # 过滤金额差异过大的组合
-                            filtered_accounts, filtered_amounts = self._filter_by_amount_balance(
-                                account_group, amounts
-                            )
-                            
-                            if len(filtered_accounts) >= 2:
-                                similarity = self._calculate_similarity(filtered_amounts)
-                                
-                                if similarity >= self.config.account_count_similarity_thresholds[n_accounts]:
-                                    pattern = {
-                                        '局号': period,
-                                        '游戏类型': game_type,
-                                        '账户组': filtered_accounts,
-                                        '账户数量': len(filtered_accounts),
-                                        '下注玩法组': [account_bets[acc]['下注玩法'] for acc in filtered_accounts],
-                                        '金额组': filtered_amounts,
-                                        '总金额': sum(filtered_amounts),
-                                        '相似度': similarity,
-                                        '模式': f'多账户对立下注-{dir1}({dir1_count})vs{dir2}({dir2_count})',
-                                        '对立类型': f'{dir1}-{dir2}',
-                                        '检测类型': '多账户对刷'
-                                    }
-                                    patterns.append(pattern)
+            keys, inverse = np.unique(np.concatenate(block_keys), return_inverse=True)
+            stats = np.stack([np.bincount(inverse, weights=row) for row in np.concatenate(block_stats, axis=1)])
+            dot, norm1, norm2, shared_rounds, hedged_rounds = stats
+            with np.errstate(divide='ignore', invalid='ignore'):
+                scores = np.where(norm1 * norm2 > 0, -dot / np.sqrt(norm1 * norm2), 0.0)
+            keep = (hedged_rounds >= self.config.hedging_min_rounds) & (scores >= self.config.hedging_min_score)
+            block = np.column_stack([keys[keep], scores[keep], shared_rounds[keep], hedged_rounds[keep]])
+            best = block if best is None else np.concatenate((best, block))
+            if len(best) > top_n:
+                # 得分降序，同分时对冲局数多的优先
+                order = np.lexsort((best[:, 0], -best[:, 3], -best[:, 1]))
+                best = best[order[:top_n]]
+        
+        if best is None or len(best) == 0:
+            return pd.DataFrame(columns=['游戏', '账户1', '账户2', '得分', '共同局数', '对冲局数'])
+        
+        best = best[np.lexsort((best[:, 0], -best[:, 3], -best[:, 1]))]
+        keys = best[:, 0].astype(np.int64)
+        return pd.DataFrame({
+            '游戏': keys // (n_accounts * n_accounts),
+            '账户1': (keys // n_accounts) % n_accounts,
+            '账户2': keys % n_accounts,
+            '得分': best[:, 1],
+            '共同局数': best[:, 2].astype(np.int64),
+            '对冲局数': best[:, 3].astype(np.int64)
+        })
+    
+    def _hedging_side_labels(self, exposures):
+        """每种游戏中正向、反向敞口对应的下注玩法名称，如(庄, 闲)"""
+        signs = self.config.hedging_bet_signs
+        bet_labels = exposures['bet_labels']
+        sides = {}
+        for game_code, game_type in enumerate(exposures['game_labels']):
+            present = np.unique(exposures['bet_codes'][exposures['game_codes'] == game_code])
+            labels = [bet_labels[code] for code in present.tolist() if code >= 0]
+            positive = '/'.join(label for label in labels if signs.get(label, 0) > 0) or '正向'
+            negative = '/'.join(label for label in labels if signs.get(label, 0) < 0) or '反向'
+            sides[game_type] = (positive, negative)
+        return sides
+    
+    def _build_hedging_patterns(self, exposures, pairs):
+        """把得分最高的账户对转换为连续对刷模式结构，详细记录为双方净敞口方向相反的各局"""
+        if pairs.empty:
+            return []
+        
+        account_labels = exposures['account_labels']
+        game_labels = exposures['game_labels']
+        period_labels = exposures['period_labels']
+        n_games = len(game_labels)
+        sides = self._hedging_side_labels(exposures)
+        
+        # 涉及账户的净敞口：(游戏, 账户) -> {局: 净敞口}
+        account_games = exposures['games'] * len(account_labels) + exposures['accounts']
+        wanted = np.unique(np.concatenate([
+            pairs['游戏'].to_numpy() * len(account_labels) + pairs[column].to_numpy() for column in ['账户1', '账户2']
+        ]))
+        selected = np.isin(account_games, wanted)
+        round_exposure = defaultdict(dict)
+        for key, round_code, value in zip(
+            account_games[selected].tolist(), exposures['rounds'][selected].tolist(), exposures['exposure'][selected].tolist()
+        ):
+            round_exposure[key][round_code] = value
+        
+        groups = []
+        for game, account1, account2 in zip(pairs['游戏'].tolist(), pairs['账户1'].tolist(), pairs['账户2'].tolist()):
+            game_type = game_labels[game]
+            positive, negative = sides[game_type]
+            account_group = [account_labels[account1], account_labels[account2]]
+            exposure1 = round_exposure[game * len(account_labels) + account1]
+            exposure2 = round_exposure[game * len(account_labels) + account2]
+            
+            records = []
+            for round_code in sorted(exposure1.keys() & exposure2.keys()):
+                value1, value2 = exposure1[round_code], exposure2[round_code]
+                if value1 * value2 >= 0:
+                    continue
+                amounts = [abs(value1), abs(value2)]
+                records.append({
+                    '局号': period_labels[round_code // n_games],
+                    '游戏类型': game_type,
+                    '账户组': account_group,
+                    '账户数量': 2,
+                    '下注玩法组': [positive if value1 > 0 else negative, positive if value2 > 0 else negative],
+                    '金额组': amounts,
+                    '总金额': amounts[0] + amounts[1],
+                    '相似度': min(amounts) / max(amounts),
+                    '模式': f'对冲关联-净敞口{positive}vs{negative}',
+                    '对立类型': f'{positive}-{negative}',
+                    '检测类型': '对冲关联'
+                })
+            groups.append(records)
+        
+        order, longest_runs, streak_counts, run_starts, run_ends = self._compute_group_runs(groups)
+        flat_records = [record for records in groups for record in records]
+        offsets = np.concatenate(([0], np.cumsum([len(records) for records in groups])))
         
+        patterns = []
+        for i, (score, shared_rounds) in enumerate(zip(pairs['得分'].tolist(), pairs['共同局数'].tolist())):
+            sorted_records = [flat_records[position] for position in order[offsets[i]:offsets[i + 1]].tolist()]
+            first = sorted_records[0]
+            pattern = self._summarize_pattern_group(
+                (tuple(first['账户组']), first['对立类型'], '对冲关联'), sorted_records
+            )
+            pattern['最长连续局数'] = int(longest_runs[i])
+            pattern['连续段数'] = int(streak_counts[i])
+            pattern['最长连续区间'] = (
+                f"{flat_records[order[run_starts[i]]]['局号']} ~ {flat_records[order[run_ends[i]]]['局号']}"
+            )
+            pattern['对冲得分'] = score
+            pattern['共同局数'] = shared_rounds
+            patterns.append(pattern)
         return patterns
     
     def _check_account_period_difference(self, account_group, game_type):
@@ -934,37 +2707,6 @@ class BaccaratWashTradeDetector:
         
         return True
     
-    def _filter_by_amount_balance(self, account_group, amounts):
-        """根据金额平衡性过滤账户"""
-        if not self.config.amount_threshold['enable_threshold_filter']:
-            return account_group, amounts
-        
-        if not amounts or len(amounts) < 2:
-            return account_group, amounts
-        
-        max_amount = max(amounts)
-        min_amount = min(amounts)
-        
-        amount_ratio = max_amount / min_amount if min_amount > 0 else float('inf')
-        max_allowed_ratio = self.config.amount_threshold['max_amount_ratio']
-        
-        if amount_ratio <= max_allowed_ratio:
-            return account_group, amounts
-        
-        # 过滤金额差异过大的账户
-        min_required = max_amount / max_allowed_ratio
-        valid_indices = [i for i, amount in enumerate(amounts) if amount >= min_required]
-        
-        if len(valid_indices) >= 2:
-            filtered_accounts = [account_group[i] for i in valid_indices]
-            filtered_amounts = [amounts[i] for i in valid_indices]
-            
-            logger.debug(f"金额平衡过滤: {len(account_group)} -> {len(filtered_accounts)} 个账户")
-            
-            return filtered_accounts, filtered_amounts
-        else:
-            return [], []
-    
     def _calculate_similarity(self, amounts):
         """计算金额相似度"""
         if not amounts or len(amounts) < 2:
@@ -987,50 +2729,223 @@ class BaccaratWashTradeDetector:
         pattern_groups = defaultdict(list)
         
         for pattern in patterns:
-            # 创建分组键
-            if pattern['检测类型'] == '单账户对刷':
-                key = (tuple(pattern['账户组']), pattern['对立类型'], '单账户')
-            else:
-                key = (tuple(sorted(pattern['账户组'])), pattern['对立类型'], '多账户')
-            
-            pattern_groups[key].append(pattern)
+            pattern_groups[self._pattern_group_key(pattern)].append(pattern)
+        
+        summaries = self._summarize_pattern_groups(list(pattern_groups.keys()), list(pattern_groups.values()))
+        return [summary for summary in summaries if summary is not None]
+    
+    def _pattern_group_key(self, pattern):
+        """逐局模式的分组键：(账户组, 对立类型, 检测类型)"""
+        if pattern['检测类型'] == '单账户对刷':
+            return (tuple(pattern['账户组']), pattern['对立类型'], '单账户')
+        return (tuple(sorted(pattern['账户组'])), pattern['对立类型'], '多账户')
+    
+    def _round_positions(self, patterns):
+        """各模式所在的(桌编号, 局序号)，局序号索引中缺少的局按模式中出现的局补建"""
+        round_keys = [(pattern['游戏类型'], pattern['局号']) for pattern in patterns]
+        round_index = self.round_index
+        missing = set(round_keys).difference(round_index)
+        if missing:
+            known = list(round_index) + list(missing)
+            round_index = self.round_index = build_round_index([key[0] for key in known], [key[1] for key in known])
+        
+        positions = [round_index[round_key] for round_key in round_keys]
+        # 桌编号按桌排序，使结果与模式的输入顺序无关
+        table_ids = {table: i for i, table in enumerate(sorted({table for table, _ in positions}))}
+        tables = np.fromiter((table_ids[table] for table, _ in positions), dtype=np.int64, count=len(positions))
+        ordinals = np.fromiter((ordinal for _, ordinal in positions), dtype=np.int64, count=len(positions))
+        return tables, ordinals
+    
+    def _compute_group_runs(self, groups):
+        """对所有分组一次性做游程编码：同一分组同一桌局序号相邻的模式构成一段连续对刷
+        
+        返回(按分组、桌、局序号排序后的模式位置, 各组最长连续局数, 各组达到最小连续局数的段数,
+        各组最长段在排序结果中的起止位置)
+        """
+        sizes = np.fromiter(map(len, groups), dtype=np.int64, count=len(groups))
+        group_ids = np.repeat(np.arange(len(groups)), sizes)
+        tables, ordinals = self._round_positions([pattern for patterns in groups for pattern in patterns])
+        
+        order = np.lexsort((ordinals, tables, group_ids))
+        groups_sorted, tables_sorted, ordinals_sorted = group_ids[order], tables[order], ordinals[order]
+        
+        # 分组或桌变化、局序号跳跃时开始新的一段；同一局的多个模式只计一局
+        boundary = (groups_sorted[1:] != groups_sorted[:-1]) | (tables_sorted[1:] != tables_sorted[:-1])
+        step = ordinals_sorted[1:] - ordinals_sorted[:-1]
+        new_run = np.concatenate(([True], boundary | (step > 1)))
+        new_round = np.concatenate(([True], boundary | (step != 0)))
+        
+        run_starts = np.flatnonzero(new_run)
+        run_ends = np.append(run_starts[1:], len(order)) - 1
+        run_lengths = np.add.reduceat(new_round.astype(np.int64), run_starts)
+        run_groups = groups_sorted[run_starts]
+        
+        # 每组取最长的一段，长度相同时取最早的一段
+        by_length = np.lexsort((-run_lengths, run_groups))
+        first_of_group = np.concatenate(([True], run_groups[by_length][1:] != run_groups[by_length][:-1]))
+        best_runs = by_length[first_of_group]
+        
+        streak_counts = np.bincount(
+            run_groups, weights=run_lengths >= self.config.min_continuous_periods, minlength=len(groups)
+        ).astype(np.int64)
+        return order, run_lengths[best_runs], streak_counts, run_starts[best_runs], run_ends[best_runs]
+    
+    def _summarize_pattern_groups(self, keys, groups):
+        """汇总各分组的逐局模式，最长连续局数不足的分组结果为None"""
+        if not groups:
+            return []
         
-        continuous_patterns = []
+        order, longest_runs, streak_counts, run_starts, run_ends = self._compute_group_runs(groups)
+        flat_patterns = [pattern for patterns in groups for pattern in patterns]
+        qualified = longest_runs >= self.config.min_continuous_periods
+        offsets = np.concatenate(([0], np.cumsum([len(patterns) for patterns in groups])))
+        
+        summaries = [None] * len(groups)
+        for i in np.flatnonzero(qualified).tolist():
+            sorted_patterns = [flat_patterns[position] for position in order[offsets[i]:offsets[i + 1]].tolist()]
+            summary = self._summarize_pattern_group(keys[i], sorted_patterns)
+            summary['最长连续局数'] = int(longest_runs[i])
+            summary['连续段数'] = int(streak_counts[i])
+            summary['最长连续区间'] = (
+                f"{flat_patterns[order[run_starts[i]]]['局号']} ~ {flat_patterns[order[run_ends[i]]]['局号']}"
+            )
+            summaries[i] = summary
+        return summaries
+    
+    def _summarize_pattern_group(self, key, sorted_patterns):
+        """汇总同一分组按局序号排好的逐局模式"""
+        # 计算统计信息
+        total_amount = sum(p['总金额'] for p in sorted_patterns)
+        avg_similarity = np.mean([p['相似度'] for p in sorted_patterns])
         
-        for key, group_patterns in pattern_groups.items():
-            # 按期号排序
-            sorted_patterns = sorted(group_patterns, key=lambda x: x['局号'])
-            
-            # 检查是否连续
-            if len(sorted_patterns) >= self.config.min_continuous_periods:
-                # 计算统计信息
-                total_amount = sum(p['总金额'] for p in sorted_patterns)
-                avg_similarity = np.mean([p['相似度'] for p in sorted_patterns])
-                
-                # 获取游戏类型（取第一个模式的）
-                game_type = sorted_patterns[0]['游戏类型']
-                
-                # 获取账户活跃度
-                account_group = list(key[0])
-                activity_level = self.get_account_group_activity_level(account_group, game_type)
-                
-                continuous_pattern = {
-                    '账户组': account_group,
-                    '游戏类型': game_type,
-                    '账户数量': len(account_group),
-                    '对立类型': key[1],
-                    '检测类型': key[2],
-                    '对刷局数': len(sorted_patterns),
-                    '总投注金额': total_amount,
-                    '平均相似度': avg_similarity,
-                    '详细记录': sorted_patterns,
-                    '账户活跃度': activity_level,
-                    '要求最小对刷局数': self.get_required_min_periods(account_group, game_type)
-                }
-                
-                continuous_patterns.append(continuous_pattern)
+        # 获取游戏类型（取第一个模式的）
+        game_type = sorted_patterns[0]['游戏类型']
         
-        return continuous_patterns
+        # 获取账户活跃度
+        account_group = list(key[0])
+        activity_level = self.get_account_group_activity_level(account_group, game_type)
+        
+        return {
+            '账户组': account_group,
+            '游戏类型': game_type,
+            '账户数量': len(account_group),
+            '对立类型': key[1],
+            '检测类型': key[2],
+            '对刷局数': len(sorted_patterns),
+            '总投注金额': total_amount,
+            '平均相似度': avg_similarity,
+            '详细记录': sorted_patterns,
+            '账户活跃度': activity_level,
+            '要求最小对刷局数': self.get_required_min_periods(account_group, game_type)
+        }
+    
+    def find_collusion_rings(self, patterns):
+        """团伙聚合：以检测出的账户组为边构建账户关联图，按连通分量合并为团伙
+        
+        边权为包含该账户对的对刷组的对刷局数和投注金额之和；
+        单账户对刷组归入其账户所在的团伙，作为团伙的下钻明细
+        """
+        with self.tracker.stage('团伙聚合', len(patterns)) as stage:
+            rings = self._aggregate_rings(patterns)
+            stage['输出行数'] = len(rings)
+        return rings
+    
+    def _aggregate_rings(self, patterns):
+        """按账户组连通分量聚合团伙"""
+        account_ids = {}
+        edge_first, edge_second, edge_rounds, edge_amounts = [], [], [], []
+        pattern_accounts = []
+        for pattern in patterns:
+            members = [account_ids.setdefault(account, len(account_ids)) for account in pattern['账户组']]
+            pattern_accounts.append(members)
+            for first, second in combinations(sorted(set(members)), 2):
+                edge_first.append(first)
+                edge_second.append(second)
+                edge_rounds.append(pattern['对刷局数'])
+                edge_amounts.append(pattern['总投注金额'])
+        if not edge_first:
+            return []
+        
+        # 合并重复的边
+        n_accounts = len(account_ids)
+        keys, inverse = np.unique(
+            np.array(edge_first, dtype=np.int64) * n_accounts + np.array(edge_second, dtype=np.int64),
+            return_inverse=True
+        )
+        first, second = keys // n_accounts, keys % n_accounts
+        rounds = np.bincount(inverse, weights=edge_rounds)
+        amounts = np.bincount(inverse, weights=edge_amounts)
+        
+        labels = self._connected_components(n_accounts, first, second)
+        component_ids, account_components = np.unique(labels, return_inverse=True)
+        component_sizes = np.bincount(account_components)
+        edge_components = account_components[first]
+        edge_counts = np.bincount(edge_components, minlength=len(component_ids))
+        
+        # 账户的加权度（关联局数之和），用于找出团伙的核心账户
+        weighted_degree = np.bincount(first, weights=rounds, minlength=n_accounts) \
+            + np.bincount(second, weights=rounds, minlength=n_accounts)
+        
+        account_labels = np.array(list(account_ids), dtype=object)
+        ring_patterns = defaultdict(list)
+        for index, members in enumerate(pattern_accounts):
+            ring_patterns[int(account_components[members[0]])].append(index)
+        
+        rings = []
+        for component in np.flatnonzero(component_sizes >= self.config.ring_min_accounts).tolist():
+            members = np.flatnonzero(account_components == component)
+            member_patterns = [patterns[index] for index in ring_patterns[component]]
+            size = len(members)
+            rounds_played = {
+                (record['游戏类型'], record['局号']) for pattern in member_patterns for record in pattern['详细记录']
+            }
+            rings.append({
+                '成员账户': account_labels[members].tolist(),
+                '账户数量': size,
+                '核心账户': account_labels[members[np.argmax(weighted_degree[members])]],
+                '游戏类型': sorted({pattern['游戏类型'] for pattern in member_patterns}),
+                '对刷组数': len(member_patterns),
+                '总对刷局数': len(rounds_played),
+                '总投注金额': sum(pattern['总投注金额'] for pattern in member_patterns),
+                '关联边数': int(edge_counts[component]),
+                '密度': edge_counts[component] / (size * (size - 1) / 2),
+                '对刷组序号': [index + 1 for index in ring_patterns[component]],
+                '对刷组': member_patterns
+            })
+        
+        rings.sort(key=lambda ring: (-ring['账户数量'], -ring['总投注金额']))
+        return rings
+    
+    def _connected_components(self, n_nodes, first, second):
+        """向量化并查集：反复把较大的根挂到较小的根上并压缩路径，返回每个节点所在分量的根"""
+        labels = np.arange(n_nodes)
+        while True:
+            root1, root2 = labels[first], labels[second]
+            differs = root1 != root2
+            if not differs.any():
+                return labels
+            np.minimum.at(labels, np.maximum(root1, root2)[differs], np.minimum(root1, root2)[differs])
+            while True:
+                compressed = labels[labels]
+                if np.array_equal(compressed, labels):
+                    break
+                labels = compressed
+    
+    def build_ring_table(self, rings):
+        """构建团伙汇总表，对刷组ID与对刷组汇总表一致"""
+        return pd.DataFrame([{
+            '团伙ID': f"团伙{i}",
+            '成员账户': ' ↔ '.join(ring['成员账户']),
+            '账户数量': ring['账户数量'],
+            '核心账户': ring['核心账户'],
+            '游戏类型': '/'.join(ring['游戏类型']),
+            '对刷组数': ring['对刷组数'],
+            '总对刷局数': ring['总对刷局数'],
+            '总投注金额': f"¥{ring['总投注金额']:,.2f}",
+            '关联边数': ring['关联边数'],
+            '密度': f"{ring['密度']:.2%}",
+            '对刷组ID': ', '.join(f"组{index}" for index in ring['对刷组序号'])
+        } for i, ring in enumerate(rings, 1)])
     
     def get_account_activity_level(self, account, game_type):
         """获取账户活跃度水平"""
@@ -1084,30 +2999,41 @@ class BaccaratWashTradeDetector:
         else:
             return self.config.period_thresholds['min_periods_very_high']
     
+    def get_result_views(self, patterns):
+        """结果展示用的对刷组汇总表、团伙和团伙汇总表；同一组检测结果只计算一次，
+        检测器保存在会话状态中时翻页、排序和筛选引起的重新运行直接复用"""
+        if self.result_views is None or self.result_views['patterns'] is not patterns:
+            rings = self.find_collusion_rings(patterns)
+            self.result_views = {
+                'patterns': patterns,
+                'summary': self.build_pattern_summary(patterns),
+                'rings': rings,
+                'ring_table': self.build_ring_table(rings)
+            }
+        return self.result_views
+    
     def display_detailed_results(self, patterns):
         """显示详细检测结果"""
         if not patterns:
             st.warning("⚠️ 未发现符合阈值条件的对刷行为")
             return
         
+        views = self.get_result_views(patterns)
+        summary = views['summary']
+        
         # ========== 总体统计 ==========
         st.subheader("📊 总体统计")
         
         # 计算基础统计
-        total_groups = len(patterns)
-        total_accounts = sum(p['账户数量'] for p in patterns)
-        total_wash_periods = sum(p['对刷局数'] for p in patterns)
-        total_amount = sum(p['总投注金额'] for p in patterns)
+        total_groups = len(summary)
+        total_accounts = int(summary['账户数量'].sum())
+        total_wash_periods = int(summary['对刷局数'].sum())
+        total_amount = float(summary['总投注金额'].sum())
         
         # 统计检测类型
-        detection_type_stats = defaultdict(int)
-        game_type_stats = defaultdict(int)
-        opposite_type_stats = defaultdict(int)
-        
-        for pattern in patterns:
-            detection_type_stats[pattern['检测类型']] += 1
-            game_type_stats[pattern['游戏类型']] += 1
-            opposite_type_stats[pattern['对立类型']] += 1
+        detection_type_stats = Counter(summary['检测类型'].tolist())
+        game_type_stats = Counter(summary['游戏类型'].tolist())
+        opposite_type_stats = Counter(summary['对立类型'].tolist())
         
         # 第一行：基础数据统计
         col1, col2, col3, col4 = st.columns(4)
@@ -1127,18 +3053,24 @@ class BaccaratWashTradeDetector:
         # ========== 检测类型统计 ==========
         st.subheader("🎯 检测类型统计")
         
-        col1, col2 = st.columns(2)
+        hedging_count = detection_type_stats.get('对冲关联', 0)
+        cols = st.columns(3 if hedging_count else 2)
         
-        with col1:
+        with cols[0]:
             st.write("**单账户对刷:**")
             single_count = detection_type_stats.get('单账户', 0)
             st.metric("检测组数", f"{single_count}组")
         
-        with col2:
+        with cols[1]:
             st.write("**多账户对刷:**")
             multi_count = detection_type_stats.get('多账户', 0)
             st.metric("检测组数", f"{multi_count}组")
         
+        if hedging_count:
+            with cols[2]:
+                st.write("**对冲关联:**")
+                st.metric("检测组数", f"{hedging_count}组")
+        
         # ========== 游戏类型统计 ==========
         st.subheader("🎲 游戏类型统计")
         
@@ -1167,206 +3099,316 @@ class BaccaratWashTradeDetector:
             
             st.write(f"**{display_type}**: {count}组")
         
+        # ========== 团伙聚合 ==========
+        rings = views['rings']
+        if rings:
+            st.subheader("🕸️ 团伙聚合")
+            st.caption(f"相互关联的账户组合并为团伙（至少{self.config.ring_min_accounts}个账户），共{len(rings)}个团伙")
+            st.dataframe(views['ring_table'], use_container_width=True, hide_index=True)
+            
+            ring_index = st.selectbox(
+                "查看团伙",
+                range(len(rings)),
+                format_func=lambda i: f"团伙{i + 1}: {rings[i]['账户数量']}个账户, {rings[i]['对刷组数']}个对刷组",
+                key='result_ring'
+            )
+            ring = rings[ring_index]
+            st.markdown(
+                f"**成员账户:** {', '.join(ring['成员账户'])}  \n"
+                f"**核心账户:** {ring['核心账户']} | **密度:** {ring['密度']:.2%} | **总对刷局数:** {ring['总对刷局数']}局"
+            )
+            ring_groups = summary.loc[[index - 1 for index in ring['对刷组序号']]]
+            st.dataframe(self.format_summary_page(ring_groups), use_container_width=True, hide_index=True)
+        
         # ========== 详细对刷组分析 ==========
         st.subheader("🔍 详细对刷组分析")
         
-        # 按游戏类型分组显示
-        patterns_by_game = defaultdict(list)
-        for pattern in patterns:
-            patterns_by_game[pattern['游戏类型']].append(pattern)
+        page = self._display_summary_page(summary)
+        if page.empty:
+            return
         
-        for game_type, game_patterns in patterns_by_game.items():
-            game_icon = "🎰" if game_type == '百家乐' else "🐉" if game_type == '龙虎' else "🎲"
-            
-            with st.expander(f"{game_icon} {game_type}（发现{len(game_patterns)}组）", expanded=True):
-                for i, pattern in enumerate(game_patterns, 1):
-                    self._display_single_pattern(pattern, i, game_type)
+        # 只加载选中对刷组的详细记录
+        position = st.selectbox(
+            "查看对刷组详情",
+            page.index.tolist(),
+            format_func=lambda i: f"{summary.at[i, '组ID']}: {summary.at[i, '账户组']}",
+            key='result_group'
+        )
+        self._display_pattern_detail(patterns[position], summary.at[position, '组ID'])
+    
+    def build_pattern_summary(self, patterns):
+        """对刷组汇总表（取值不格式化，用于筛选和排序），索引为对刷组在patterns中的位置"""
+        columns = {
+            '组ID': [f"组{i}" for i in range(1, len(patterns) + 1)],
+            '账户组': [' ↔ '.join(pattern['账户组']) for pattern in patterns]
+        }
+        for column in [
+            '游戏类型', '检测类型', '对立类型', '账户数量', '对刷局数', '要求最小对刷局数',
+            '最长连续局数', '连续段数', '最长连续区间', '总投注金额', '平均相似度'
+        ]:
+            columns[column] = [pattern[column] for pattern in patterns]
+        columns['账户活跃度'] = [ACTIVITY_LABELS.get(pattern['账户活跃度'], ACTIVITY_LABELS['unknown']) for pattern in patterns]
+        hedging_scores = pd.Series([pattern.get('对冲得分') for pattern in patterns], dtype=np.float64)
+        if hedging_scores.notna().any():
+            columns['对冲得分'] = hedging_scores.to_numpy()
+        return pd.DataFrame(columns)
     
-    def _display_single_pattern(self, pattern, index, game_type):
-        """显示单个对刷组详情"""
-        st.markdown(f"**对刷组 {index}:**")
+    def format_summary_page(self, page):
+        """格式化当前页的金额、相似度和对冲得分，用于显示"""
+        page = page.copy()
+        page['总投注金额'] = format_currency(page['总投注金额'])
+        page['平均相似度'] = format_percent(page['平均相似度'])
+        if '对冲得分' in page:
+            page['对冲得分'] = page['对冲得分'].map(lambda x: '' if pd.isna(x) else f"{x:.2f}")
+        return page
+    
+    def _display_summary_page(self, summary):
+        """在服务端筛选、排序和分页，只显示当前页的对刷组，返回当前页（未格式化）"""
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            game_types = st.multiselect("游戏类型", sorted(summary['游戏类型'].unique()), key='result_game_types')
+        with col2:
+            detection_types = st.multiselect("检测类型", sorted(summary['检测类型'].unique()), key='result_detection_types')
+        with col3:
+            account_query = st.text_input("账户包含", key='result_account_query').strip()
+        with col4:
+            min_periods = st.number_input("最少对刷局数", min_value=0, value=0, step=1, key='result_min_periods')
+        
+        mask = summary['对刷局数'] >= min_periods
+        if game_types:
+            mask &= summary['游戏类型'].isin(game_types)
+        if detection_types:
+            mask &= summary['检测类型'].isin(detection_types)
+        if account_query:
+            mask &= summary['账户组'].str.contains(account_query, regex=False)
+        filtered = summary[mask]
+        
+        sort_columns = ['默认顺序', '对刷局数', '总投注金额', '平均相似度', '最长连续局数', '账户数量']
+        if '对冲得分' in summary:
+            sort_columns.append('对冲得分')
+        col1, col2, col3, col4 = st.columns(4)
+        with col1:
+            sort_column = st.selectbox("排序", sort_columns, key='result_sort_column')
+        with col2:
+            descending = st.selectbox("顺序", ['降序', '升序'], key='result_sort_order') == '降序'
+        with col3:
+            page_size = st.selectbox("每页组数", RESULT_PAGE_SIZES, key='result_page_size')
         
-        # 账户信息
-        if pattern['检测类型'] == '单账户对刷':
-            st.markdown(f"**账户:** {pattern['账户组'][0]} (单账户对立下注)")
+        if sort_column != '默认顺序':
+            filtered = filtered.sort_values(sort_column, ascending=not descending, kind='stable')
+        
+        page_count = max(1, -(-len(filtered) // page_size))
+        # 筛选条件变化后页数可能变少，超出时回到最后一页
+        if st.session_state.get('result_page', 1) > page_count:
+            st.session_state['result_page'] = page_count
+        with col4:
+            page_number = st.number_input("页码", min_value=1, max_value=page_count, step=1, key='result_page')
+        
+        start = (page_number - 1) * page_size
+        page = filtered.iloc[start:start + page_size]
+        st.caption(f"共{len(filtered)}组（全部{len(summary)}组），第{page_number}/{page_count}页")
+        if page.empty:
+            st.info("没有符合筛选条件的对刷组")
         else:
-            st.markdown(f"**账户组:** {' ↔ '.join(pattern['账户组'])}")
-        
-        # 活跃度显示
-        activity_icon = {
-            'low': '🟢',
-            'medium': '🟡', 
-            'high': '🟠',
-            'very_high': '🔴',
-            'unknown': '⚪'
-        }.get(pattern['账户活跃度'], '⚪')
-        
-        activity_text = {
-            'low': '低活跃度',
-            'medium': '中活跃度',
-            'high': '高活跃度',
-            'very_high': '极高活跃度',
-            'unknown': '未知活跃度'
-        }.get(pattern['账户活跃度'], '未知活跃度')
-        
-        st.markdown(f"**活跃度:** {activity_icon} {activity_text} | **游戏类型:** {game_type}")
-        
-        # 对立类型
+            st.dataframe(self.format_summary_page(page), use_container_width=True, hide_index=True)
+        return page
+    
+    def build_detail_table(self, pattern):
+        """单个对刷组的逐局详细记录表"""
+        records = pattern['详细记录']
+        bets = []
+        for record in records:
+            stakes = [f"{bet}:¥{amount:,.2f}" for bet, amount in zip(record['下注玩法组'], record['金额组'])]
+            if len(record['账户组']) == 1:
+                # 单账户对刷：同一账户下注对立两面
+                bets.append(f"{record['账户组'][0]}({' vs '.join(stakes)})")
+            else:
+                bets.append(' ↔ '.join(f"{account}({stake})" for account, stake in zip(record['账户组'], stakes)))
+        return pd.DataFrame({
+            '序号': range(1, len(records) + 1),
+            '局号': [record['局号'] for record in records],
+            '下注': bets,
+            '总金额': format_currency([record['总金额'] for record in records]),
+            '相似度': format_percent([record['相似度'] for record in records])
+        })
+    
+    def _display_pattern_detail(self, pattern, group_id):
+        """显示单个对刷组的统计信息和详细记录"""
         if '-' in pattern['对立类型']:
             parts = pattern['对立类型'].split('-')
             display_opposite = f"{parts[0]} vs {parts[1]}"
         else:
             display_opposite = pattern['对立类型']
         
-        st.markdown(f"**对立类型:** {display_opposite} | **检测类型:** {pattern['检测类型']}")
-        
-        # 对刷统计
-        st.markdown(f"**对刷局数:** {pattern['对刷局数']}局 (要求≥{pattern['要求最小对刷局数']}局)")
-        st.markdown(f"**总投注金额:** ¥{pattern['总投注金额']:,.2f}")
-        
-        if pattern['检测类型'] == '多账户对刷':
-            st.markdown(f"**平均相似度:** {pattern['平均相似度']:.2%}")
-        
-        # 详细记录
-        st.markdown("**详细记录:**")
+        lines = [
+            f"**{group_id} 账户组:** {' ↔ '.join(pattern['账户组'])}",
+            f"**活跃度:** {ACTIVITY_LABELS.get(pattern['账户活跃度'], ACTIVITY_LABELS['unknown'])} | "
+            f"**游戏类型:** {pattern['游戏类型']} | **对立类型:** {display_opposite} | **检测类型:** {pattern['检测类型']}",
+            f"**对刷局数:** {pattern['对刷局数']}局 (要求≥{pattern['要求最小对刷局数']}局) | "
+            f"**最长连续:** {pattern['最长连续局数']}局 ({pattern['最长连续区间']}) | **连续段数:** {pattern['连续段数']}",
+            f"**总投注金额:** ¥{pattern['总投注金额']:,.2f} | **平均相似度:** {pattern['平均相似度']:.2%}"
+        ]
+        if pattern['检测类型'] == '对冲关联':
+            lines.append(f"**对冲得分:** {pattern['对冲得分']:.2f} | **共同下注局数:** {pattern['共同局数']}局")
+        st.markdown('  \n'.join(lines))
         
-        for i, record in enumerate(pattern['详细记录'], 1):
-            if pattern['检测类型'] == '单账户对刷':
-                st.write(f"{i}. 局号: {record['局号']} | 下注: {record['下注玩法组'][0]}(¥{record['金额组'][0]:,.2f}) vs {record['下注玩法组'][1]}(¥{record['金额组'][1]:,.2f}) | 相似度: {record['相似度']:.2%}")
-            else:
-                accounts_info = []
-                for acc, bet, amount in zip(record['账户组'], record['下注玩法组'], record['金额组']):
-                    accounts_info.append(f"{acc}({bet}:¥{amount:,.2f})")
-                
-                st.write(f"{i}. 局号: {record['局号']} | 账户: {' ↔ '.join(accounts_info)} | 相似度: {record['相似度']:.2%}")
+        st.dataframe(self.build_detail_table(pattern), use_container_width=True, hide_index=True)
+    
+    def build_result_tables(self, patterns):
+        """构建导出用的对刷组汇总表和详细记录表：逐列收集取值，金额和百分比按列统一格式化"""
+        group_ids = np.asarray([f"组{i}" for i in range(1, len(patterns) + 1)], dtype=object)
+        account_labels = np.asarray([' ↔ '.join(pattern['账户组']) for pattern in patterns], dtype=object)
+        
+        main_columns = {'组ID': group_ids, '账户组': account_labels}
+        for column in [
+            '游戏类型', '检测类型', '对立类型', '账户数量', '对刷局数', '要求最小对刷局数',
+            '最长连续局数', '连续段数', '最长连续区间', '总投注金额', '平均相似度', '账户活跃度'
+        ]:
+            main_columns[column] = [pattern[column] for pattern in patterns]
+        hedging_scores = pd.Series([pattern.get('对冲得分') for pattern in patterns], dtype=np.float64)
+        
+        df_main = pd.DataFrame(main_columns)
+        df_main['总投注金额'] = format_currency(df_main['总投注金额'])
+        df_main['平均相似度'] = format_percent(df_main['平均相似度'])
+        # 只有对冲关联结果才有对冲得分
+        if hedging_scores.notna().any():
+            df_main['对冲得分'] = np.where(hedging_scores.isna(), '', np.char.mod('%.2f', hedging_scores.fillna(0).to_numpy()))
+        
+        records = [record for pattern in patterns for record in pattern['详细记录']]
+        record_counts = [len(pattern['详细记录']) for pattern in patterns]
+        
+        # 各记录的金额展开为一列统一格式化，再按每条记录的金额数拼接
+        amount_counts = np.fromiter((len(record['金额组']) for record in records), dtype=np.int64, count=len(records))
+        amount_labels = format_currency([amount for record in records for amount in record['金额组']]).tolist()
+        amount_offsets = np.concatenate(([0], np.cumsum(amount_counts))).tolist()
+        
+        df_detailed = pd.DataFrame({
+            '组ID': np.repeat(group_ids, record_counts),
+            '账户组': np.repeat(account_labels, record_counts),
+            '局号': [record['局号'] for record in records],
+            '游戏类型': [record['游戏类型'] for record in records],
+            '检测类型': [record['检测类型'] for record in records],
+            '下注玩法组': [' ↔ '.join(record['下注玩法组']) for record in records],
+            '金额组': [
+                ' ↔ '.join(amount_labels[start:end]) for start, end in zip(amount_offsets[:-1], amount_offsets[1:])
+            ],
+            '总金额': format_currency([record['总金额'] for record in records]),
+            '相似度': format_percent([record['相似度'] for record in records])
+        })
         
-        if index < len(pattern):
-            st.markdown("---")
+        return df_main, df_detailed
     
     def export_detection_results(self, patterns, export_format='excel'):
         """导出检测结果"""
         if not patterns:
-            st.warning("❌ 没有检测结果可供导出")
+            self.ui.warning("❌ 没有检测结果可供导出")
             return None
         
         try:
-            main_data = []
-            detailed_data = []
-            
-            for i, pattern in enumerate(patterns, 1):
-                main_record = {
-                    '组ID': f"组{i}",
-                    '账户组': ' ↔ '.join(pattern['账户组']),
-                    '游戏类型': pattern['游戏类型'],
-                    '检测类型': pattern['检测类型'],
-                    '对立类型': pattern['对立类型'],
-                    '账户数量': pattern['账户数量'],
-                    '对刷局数': pattern['对刷局数'],
-                    '要求最小对刷局数': pattern['要求最小对刷局数'],
-                    '总投注金额': pattern['总投注金额'],
-                    '平均相似度': pattern['平均相似度'],
-                    '账户活跃度': pattern['账户活跃度']
-                }
-                main_data.append(main_record)
+            with self.tracker.stage('结果导出', len(patterns)) as stage:
+                df_main, df_detailed = self.build_result_tables(patterns)
+                df_rings = self.build_ring_table(self.find_collusion_rings(patterns))
+                stage['输出行数'] = len(df_main) + len(df_detailed)
                 
-                for j, record in enumerate(pattern['详细记录'], 1):
-                    if pattern['检测类型'] == '单账户对刷':
-                        detailed_record = {
-                            '组ID': f"组{i}",
-                            '账户组': ' ↔ '.join(pattern['账户组']),
-                            '局号': record['局号'],
-                            '游戏类型': record['游戏类型'],
-                            '检测类型': record['检测类型'],
-                            '下注玩法组': f"{record['下注玩法组'][0]} vs {record['下注玩法组'][1]}",
-                            '金额组': f"¥{record['金额组'][0]:,.2f} vs ¥{record['金额组'][1]:,.2f}",
-                            '总金额': record['总金额'],
-                            '相似度': record['相似度']
-                        }
-                    else:
-                        detailed_record = {
-                            '组ID': f"组{i}",
-                            '账户组': ' ↔ '.join(pattern['账户组']),
-                            '局号': record['局号'],
-                            '游戏类型': record['游戏类型'],
-                            '检测类型': record['检测类型'],
-                            '下注玩法组': ' ↔ '.join(record['下注玩法组']),
-                            '金额组': ' ↔ '.join([f"¥{amt:,.2f}" for amt in record['金额组']]),
-                            '总金额': record['总金额'],
-                            '相似度': record['相似度']
-                        }
-                    detailed_data.append(detailed_record)
-            
-            df_main = pd.DataFrame(main_data)
-            df_detailed = pd.DataFrame(detailed_data)
-            
-            # 格式化金额和百分比
-            df_main['总投注金额'] = df_main['总投注金额'].apply(lambda x: f"¥{x:,.2f}")
-            df_main['平均相似度'] = df_main['平均相似度'].apply(lambda x: f"{x:.2%}")
-            
-            df_detailed['总金额'] = df_detailed['总金额'].apply(lambda x: f"¥{x:,.2f}")
-            df_detailed['相似度'] = df_detailed['相似度'].apply(lambda x: f"{x:.2%}")
+                if export_format == 'excel':
+                    report = self._export_to_excel(df_main, df_detailed, df_rings)
+                else:
+                    report = self._export_to_csv(df_main, df_detailed, df_rings)
             
+            # 性能统计在导出阶段结束后写入，才能包含导出阶段本身
             if export_format == 'excel':
-                return self._export_to_excel(df_main, df_detailed)
-            else:
-                return self._export_to_csv(df_main, df_detailed)
-                
+                return self._finish_excel_report(report)
+            return self._finish_csv_report(report)
+            
         except Exception as e:
             logger.error(f"导出失败: {str(e)}")
-            st.error(f"导出失败: {str(e)}")
+            self.ui.error(f"导出失败: {str(e)}")
             traceback.print_exc()
             return None
     
-    def _export_to_excel(self, df_main, df_detailed):
-        """导出到Excel格式"""
+    def _export_to_excel(self, df_main, df_detailed, df_rings=None):
+        """导出到Excel格式：只写模式逐行写出，超过单表行数上限的表拆分到多个工作表；
+        返回未保存的工作簿，由_finish_excel_report写入性能统计后保存"""
         try:
-            output = io.BytesIO()
-            
-            with pd.ExcelWriter(output, engine='openpyxl') as writer:
-                df_main.to_excel(writer, sheet_name='对刷组汇总', index=False)
-                df_detailed.to_excel(writer, sheet_name='详细记录', index=False)
-                
-                workbook = writer.book
-                main_sheet = workbook['对刷组汇总']
-                detailed_sheet = workbook['详细记录']
-                
-                # 调整列宽
-                for sheet in [main_sheet, detailed_sheet]:
-                    for column in sheet.columns:
-                        max_length = 0
-                        column_letter = column[0].column_letter
-                        for cell in column:
-                            try:
-                                if len(str(cell.value)) > max_length:
-                                    max_length = len(str(cell.value))
-                            except:
-                                pass
-                        adjusted_width = min(max_length + 2, 50)
-                        sheet.column_dimensions[column_letter].width = adjusted_width
-                
-                # 添加标题
-                main_sheet.insert_rows(0, 3)
-                main_sheet['A1'] = "百家乐对刷检测报告"
-                main_sheet['A2'] = f"生成时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}"
-                main_sheet['A3'] = f"总对刷组数: {len(df_main)}"
-                
-                main_sheet.merge_cells('A1:L1')
-                main_sheet.merge_cells('A2:L2')
-                main_sheet.merge_cells('A3:L3')
-                
-                for cell in ['A1', 'A2', 'A3']:
-                    main_sheet[cell].font = Font(bold=True, size=12)
-                    main_sheet[cell].alignment = Alignment(horizontal='center')
+            workbook = Workbook(write_only=True)
             
-            output.seek(0)
-            return output
+            titles = [
+                "百家乐对刷检测报告",
+                f"生成时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}",
+                f"总对刷组数: {len(df_main)}"
+            ]
+            self._write_excel_sheets(workbook, '对刷组汇总', df_main, titles)
+            self._write_excel_sheets(workbook, '详细记录', df_detailed)
+            if df_rings is not None and not df_rings.empty:
+                self._write_excel_sheets(workbook, '团伙汇总', df_rings)
+            return workbook
             
         except Exception as e:
             logger.error(f"Excel导出失败: {str(e)}")
             raise e
     
-    def _export_to_csv(self, df_main, df_detailed):
-        """导出到CSV格式"""
+    def _finish_excel_report(self, workbook):
+        """写入性能统计工作表并保存工作簿"""
+        self._write_excel_sheets(workbook, '性能统计', self.tracker.to_frame())
+        output = io.BytesIO()
+        workbook.save(output)
+        output.seek(0)
+        return output
+    
+    def _write_excel_sheets(self, workbook, sheet_name, df, titles=()):
+        """把一张表写入一个或多个工作表（sheet_name、sheet_name2...），每个工作表都有表头，标题行只写在第一个"""
+        widths = self._excel_column_widths(df)
+        columns = [self._excel_column_values(df[column]) for column in df.columns]
+        last_column = get_column_letter(max(len(df.columns), 1))
+        
+        start = 0
+        part = 1
+        while True:
+            sheet = workbook.create_sheet(sheet_name if part == 1 else f"{sheet_name}{part}")
+            # 只写模式下列宽须在写入行之前设置
+            for index, width in enumerate(widths, 1):
+                sheet.column_dimensions[get_column_letter(index)].width = width
+            
+            sheet_titles = titles if part == 1 else ()
+            for row, title in enumerate(sheet_titles, 1):
+                cell = WriteOnlyCell(sheet, value=title)
+                cell.font = Font(bold=True, size=12)
+                cell.alignment = Alignment(horizontal='center')
+                sheet.append([cell])
+                sheet.merged_cells.add(f"A{row}:{last_column}{row}")
+            sheet.append(list(df.columns))
+            
+            end = min(len(df), start + EXCEL_MAX_ROWS - 1 - len(sheet_titles))
+            for row in zip(*(values[start:end] for values in columns)):
+                sheet.append(row)
+            
+            start = end
+            part += 1
+            if start >= len(df):
+                return
+    
+    def _excel_column_widths(self, df):
+        """按表头和取值的最大字符长度计算列宽"""
+        widths = []
+        for column in df.columns:
+            values = df[column].dropna()
+            max_length = len(str(column))
+            if len(values):
+                max_length = max(max_length, int(values.astype(str).str.len().max()))
+            widths.append(min(max_length + 2, EXCEL_MAX_COLUMN_WIDTH))
+        return widths
+    
+    def _excel_column_values(self, series):
+        """列取值转为Python对象列表，空值写为空单元格"""
+        values = series.tolist()
+        missing = series.isna().to_numpy()
+        if missing.any():
+            for index in np.flatnonzero(missing).tolist():
+                values[index] = None
+        return values
+    
+    def _export_to_csv(self, df_main, df_detailed, df_rings=None):
+        """导出到CSV格式，返回压缩包缓冲区，由_finish_csv_report追加性能统计"""
         try:
             zip_buffer = io.BytesIO()
             
@@ -1377,6 +3419,9 @@ class BaccaratWashTradeDetector:
                 detailed_csv = df_detailed.to_csv(index=False, encoding='utf-8-sig')
                 zip_file.writestr('详细记录.csv', detailed_csv)
                 
+                if df_rings is not None and not df_rings.empty:
+                    zip_file.writestr('团伙汇总.csv', df_rings.to_csv(index=False, encoding='utf-8-sig'))
+                
                 readme_content = f"""百家乐对刷检测结果导出文件
 生成时间: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
 总对刷组数: {len(df_main)}
@@ -1384,6 +3429,8 @@ class BaccaratWashTradeDetector:
 文件说明:
 1. 对刷组汇总.csv - 包含所有对刷组的汇总信息
 2. 详细记录.csv - 包含每个对刷组的详细局号记录
+3. 团伙汇总.csv - 相互关联的账户组合并后的团伙（没有团伙时不生成）
+4. 性能统计.json - 各处理阶段的耗时、行数、内存峰值和工作量计数
 
 检测参数:
 - 最小投注金额: {self.config.min_amount}元
@@ -1392,14 +3439,19 @@ class BaccaratWashTradeDetector:
 - 最小连续局数: {self.config.min_continuous_periods}
 """
                 zip_file.writestr('说明.txt', readme_content)
-            
-            zip_buffer.seek(0)
             return zip_buffer
             
         except Exception as e:
             logger.error(f"CSV导出失败: {str(e)}")
             raise e
     
+    def _finish_csv_report(self, zip_buffer):
+        """向压缩包追加性能统计"""
+        with zipfile.ZipFile(zip_buffer, 'a', zipfile.ZIP_DEFLATED) as zip_file:
+            zip_file.writestr('性能统计.json', self.tracker.to_json())
+        zip_buffer.seek(0)
+        return zip_buffer
+    
     def display_export_buttons(self, patterns):
         """显示导出按钮"""
         if not patterns:
@@ -1439,10 +3491,622 @@ class BaccaratWashTradeDetector:
                         )
         
         st.info(f"📊 导出内容: {len(patterns)}个对刷组, 共{sum(len(p['详细记录']) for p in patterns)}条详细记录")
+    
+    def display_performance_stats(self):
+        """显示各处理阶段的性能统计"""
+        if not self.performance_stats:
+            return
+        
+        with st.expander("⏱️ 性能统计"):
+            st.dataframe(self.tracker.to_frame(), use_container_width=True, hide_index=True)
+            st.download_button(
+                label="📥 下载性能统计（JSON）",
+                data=self.tracker.to_json(),
+                file_name=f"性能统计_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json",
+                mime="application/json"
+            )
+
+# ==================== 增量检测会话 ====================
+class IncrementalSession:
+    """增量检测会话：保留累计数据、账户局数计数、每局模式和各账户组状态，新数据只重新检测涉及的局"""
+    def __init__(self, config):
+        self.detector = BaccaratWashTradeDetector(config, HeadlessUI())
+        self.settings_key = self.compute_settings_key(config)
+        self.sources = set()
+        
+        # 累计数据（含低于最小投注金额的记录，配置变化时据此重建）：分类字典只追加不重排，已有数据的编码保持不变
+        self.categories = {column: pd.Index([], dtype=object) for column in CORE_CODE_COLUMNS}
+        self.dtypes = {}
+        self.arrays = {column: np.empty(0, dtype=np.int32) for column in CORE_CODE_COLUMNS}
+        self.arrays[AMOUNT_CENTS_COLUMN] = np.empty(0, dtype=np.int64)
+        self.size = 0
+        self.valid_size = 0  # 达到最小投注金额、参与检测的记录数
+        
+        self.round_rows = defaultdict(list)  # 局键(局号编码, 游戏类型编码) -> 该局各批有效数据的行位置
+        self.round_patterns = {}  # 局键 -> [(排序键, 分组键, 模式)]
+        self.group_patterns = defaultdict(dict)  # 分组键 -> {局键: [(排序键, 模式)]}
+        self.account_groups = defaultdict(set)  # 账户 -> 包含该账户的分组键
+        self.group_summaries = {}  # 分组键 -> (首个排序键, 连续模式或None)
+    
+    @staticmethod
+    def compute_settings_key(config):
+        """影响检测结果的配置指纹，配置变化时需要重建会话"""
+        settings = {
+            'min_amount': config.min_amount,
+            'amount_similarity_threshold': config.amount_similarity_threshold,
+            'min_continuous_periods': config.min_continuous_periods,
+            'max_accounts_in_group': config.max_accounts_in_group,
+            'account_count_similarity_thresholds': config.account_count_similarity_thresholds,
+            'amount_threshold': config.amount_threshold,
+            'period_thresholds': config.period_thresholds
+        }
+        return json.dumps(settings, sort_keys=True)
+    
+    def append(self, normalized, source=None):
+        """追加一批标准化数据并增量更新检测结果，返回重新检测的局数"""
+        if source is not None:
+            if source in self.sources:
+                return 0
+            self.sources.add(source)
+        if normalized.empty:
+            return 0
+        
+        start = self.size
+        columns = {column: self._encode(column, normalized[column]) for column in CORE_CODE_COLUMNS}
+        columns[AMOUNT_CENTS_COLUMN] = normalized[AMOUNT_CENTS_COLUMN].to_numpy(dtype=np.int64)
+        self._append_arrays(columns)
+        self.dtypes = {column: pd.CategoricalDtype(self.categories[column]) for column in CORE_CODE_COLUMNS}
+        self.detector.code_maps = dict(self.categories)
+        
+        min_amount_cents = int(round(self.detector.config.min_amount * 100))
+        valid = np.flatnonzero(columns[AMOUNT_CENTS_COLUMN] >= min_amount_cents)
+        if len(valid) == 0:
+            return 0
+        columns = {column: values[valid] for column, values in columns.items()}
+        self.valid_size += len(valid)
+        
+        changed_accounts = self._update_account_counters(columns)
+        touched_rounds = self._index_round_rows(columns, start + valid)
+        reordered_tables = self._update_round_index(touched_rounds)
+        affected_groups = self._redetect_rounds(touched_rounds)
+        for account in changed_accounts:
+            affected_groups |= self.account_groups.get(account, set())
+        if reordered_tables:
+            affected_groups |= self._groups_in_tables(reordered_tables)
+        self._refresh_groups(affected_groups)
+        
+        logger.info(f"增量检测: 新增 {len(valid)} 条记录, 重新检测 {len(touched_rounds)} 局, 更新 {len(affected_groups)} 个账户组")
+        return len(touched_rounds)
+    
+    def rebuild(self, config):
+        """按新配置建立新会话，把本会话的累计数据作为一批重新追加"""
+        session = IncrementalSession(config)
+        session.sources = set(self.sources)
+        if self.size:
+            frame = pd.DataFrame({
+                column: pd.Categorical.from_codes(self.arrays[column][:self.size], dtype=self.dtypes[column])
+                for column in CORE_CODE_COLUMNS
+            })
+            frame[AMOUNT_CENTS_COLUMN] = self.arrays[AMOUNT_CENTS_COLUMN][:self.size]
+            session.append(frame)
+        return session
+    
+    def get_patterns(self):
+        """当前的连续对刷模式，顺序与全量检测一致"""
+        summaries = [item for item in self.group_summaries.values() if item[1] is not None]
+        summaries.sort(key=lambda item: item[0])
+        return [summary for _, summary in summaries]
+    
+    def _encode(self, column, values):
+        """按会话分类字典编码，新取值追加到字典末尾"""
+        if not isinstance(values.dtype, pd.CategoricalDtype):
+            values = values.astype('category')
+        values = values.cat.remove_unused_categories()
+        
+        categories = self.categories[column]
+        mapping = categories.get_indexer(values.cat.categories)
+        new_values = mapping < 0
+        if new_values.any():
+            mapping[new_values] = np.arange(len(categories), len(categories) + int(new_values.sum()))
+            self.categories[column] = categories.append(pd.Index(values.cat.categories[new_values], dtype=object))
+        return mapping[values.cat.codes.to_numpy()].astype(np.int32)
+    
+    def _append_arrays(self, columns):
+        """追加编码数组，容量不足时成倍扩容"""
+        needed = self.size + len(columns[AMOUNT_CENTS_COLUMN])
+        for column, values in columns.items():
+            array = self.arrays[column]
+            if needed > len(array):
+                grown = np.empty(max(needed, 2 * len(array)), dtype=array.dtype)
+                grown[:self.size] = array[:self.size]
+                self.arrays[column] = array = grown
+            array[self.size:needed] = values
+        self.size = needed
+    
+    def _update_account_counters(self, columns):
+        """增量更新账户在每种游戏上的局数和记录数，返回局数发生变化的账户"""
+        key_columns = ['局号', '会员账号', '标准化游戏类型']
+        rows = pd.DataFrame({column: columns[column] for column in key_columns})
+        game_labels = self.categories['标准化游戏类型']
+        account_labels = self.categories['会员账号']
+        periods_by_game = self.detector.account_total_periods_by_game
+        records_by_game = self.detector.account_record_stats_by_game
+        
+        # 只有首次出现的(局号, 账户, 游戏类型)才增加局数：与这些局已登记的有效记录比较
+        new_keys = rows.drop_duplicates()
+        round_keys = new_keys[['局号', '标准化游戏类型']].drop_duplicates()
+        earlier = [
+            chunk
+            for round_key in zip(round_keys['局号'].tolist(), round_keys['标准化游戏类型'].tolist())
+            for chunk in self.round_rows.get(round_key, [])
+        ]
+        if earlier:
+            positions = np.concatenate(earlier)
+            seen_keys = pd.DataFrame({column: self.arrays[column][positions] for column in key_columns}).drop_duplicates()
+            repeated = pd.concat([seen_keys, new_keys], ignore_index=True).duplicated().to_numpy()[len(seen_keys):]
+            new_keys = new_keys[~repeated]
+        
+        changed_accounts = set()
+        for (account_code, game_code), count in new_keys.groupby(['会员账号', '标准化游戏类型']).size().items():
+            game_type, account = game_labels[game_code], account_labels[account_code]
+            periods_by_game[game_type][account] = periods_by_game[game_type].get(account, 0) + int(count)
+            changed_accounts.add(account)
+        
+        for (account_code, game_code), count in rows.groupby(['会员账号', '标准化游戏类型']).size().items():
+            game_type, account = game_labels[game_code], account_labels[account_code]
+            records_by_game[game_type][account] = records_by_game[game_type].get(account, 0) + int(count)
+        
+        return changed_accounts
+    
+    def _index_round_rows(self, columns, positions):
+        """登记新数据的行位置到各局，返回涉及的局键"""
+        periods, games = columns['局号'], columns['标准化游戏类型']
+        order = np.lexsort((games, periods))
+        sorted_periods, sorted_games = periods[order], games[order]
+        boundary = np.flatnonzero(
+            (sorted_periods[1:] != sorted_periods[:-1]) | (sorted_games[1:] != sorted_games[:-1])
+        ) + 1
+        starts = np.concatenate(([0], boundary))
+        ends = np.concatenate((boundary, [len(order)]))
+        positions = positions[order]
+        
+        touched_rounds = list(zip(sorted_periods[starts].tolist(), sorted_games[starts].tolist()))
+        for round_key, begin, end in zip(touched_rounds, starts, ends):
+            self.round_rows[round_key].append(positions[begin:end])
+        return touched_rounds
+    
+    def _round_labels(self, round_key):
+        """局键还原为(游戏类型, 局号)"""
+        return self.categories['标准化游戏类型'][round_key[1]], self.categories['局号'][round_key[0]]
+    
+    def _update_round_index(self, round_keys):
+        """把新出现的局加入局序号索引，返回已有局序号发生变化（新局插在中间）的桌"""
+        previous = self.detector.round_index
+        new_rounds = [labels for labels in map(self._round_labels, round_keys) if labels not in previous]
+        if not new_rounds:
+            return set()
+        
+        known = list(previous) + new_rounds
+        round_index = build_round_index([key[0] for key in known], [key[1] for key in known])
+        self.detector.round_index = round_index
+        return {position[0] for round_key, position in previous.items() if round_index[round_key] != position}
+    
+    def _groups_in_tables(self, tables):
+        """在指定各桌有逐局模式的分组键"""
+        group_keys = set()
+        for round_key, entries in self.round_patterns.items():
+            game_type, period = self._round_labels(round_key)
+            if (game_type, split_period(period)[0]) in tables:
+                group_keys.update(group_key for _, group_key, _ in entries)
+        return group_keys
+    
+    def _build_round_frame(self, round_keys):
+        """取出指定各局的全部数据，保持原始行顺序"""
+        positions = np.sort(np.concatenate([chunk for key in round_keys for chunk in self.round_rows[key]]))
+        frame = pd.DataFrame({
+            column: pd.Categorical.from_codes(self.arrays[column][positions], dtype=self.dtypes[column])
+            for column in CORE_CODE_COLUMNS
+        })
+        frame[AMOUNT_CENTS_COLUMN] = self.arrays[AMOUNT_CENTS_COLUMN][positions]
+        return frame
+    
+    def _round_keys_of(self, periods, game_types):
+        """由局号和游戏类型取值得到局键"""
+        period_codes = self.categories['局号'].get_indexer(periods)
+        game_codes = self.categories['标准化游戏类型'].get_indexer(game_types)
+        return list(zip(period_codes.tolist(), game_codes.tolist()))
+    
+    def _redetect_rounds(self, round_keys):
+        """重新检测涉及的局，替换这些局原有的逐局模式，返回受影响的分组键"""
+        detector = self.detector
+        frame = self._build_round_frame(round_keys)
+        detected = []
+        
+        # 排序键与全量检测时各模式在结果列表中的先后一致：先单账户，再按账户数
+        candidates = detector._find_single_account_candidates(frame)
+        if not candidates.empty:
+            sort_keys = zip(
+                [0] * len(candidates),
+                candidates['会员账号'].tolist(),
+                candidates['局号'].tolist(),
+                candidates['标准化游戏类型'].tolist(),
+                candidates['对立组顺序'].tolist()
+            )
+            detected.append((candidates, sort_keys, detector._build_single_account_patterns(candidates)))
+        
+        main_bets = detector._build_main_bet_table(frame)
+        max_opposing_bettors = detector.count_max_opposing_bettors(main_bets)
+        for account_count in range(2, min(detector.config.max_accounts_in_group, max_opposing_bettors) + 1):
+            if account_count == 2:
+                candidates = detector._find_pair_candidates(main_bets)
+                if candidates.empty:
+                    continue
+                position_columns = [candidates['首次位置_1'].tolist(), candidates['首次位置_2'].tolist()]
+                patterns = detector._build_pair_patterns(candidates)
+            else:
+                candidates = detector._find_group_candidates(main_bets, account_count)
+                if candidates.empty:
+                    continue
+                position_columns = [candidates['排序键'].tolist()]
+                patterns = detector._build_group_patterns(candidates)
+            sort_keys = zip(
+                [account_count] * len(candidates),
+                candidates['局号'].astype(object).tolist(),
+                candidates['标准化游戏类型'].astype(object).tolist(),
+                *position_columns
+            )
+            detected.append((candidates, sort_keys, patterns))
+        
+        # 移除这些局原有的模式
+        affected_groups = set()
+        for round_key in round_keys:
+            for _, group_key, _ in self.round_patterns.pop(round_key, []):
+                self.group_patterns[group_key].pop(round_key, None)
+                affected_groups.add(group_key)
+        
+        for candidates, sort_keys, patterns in detected:
+            candidate_rounds = self._round_keys_of(
+                candidates['局号'].astype(object), candidates['标准化游戏类型'].astype(object)
+            )
+            for round_key, sort_key, pattern in zip(candidate_rounds, sort_keys, patterns):
+                group_key = detector._pattern_group_key(pattern)
+                self.round_patterns.setdefault(round_key, []).append((sort_key, group_key, pattern))
+                self.group_patterns[group_key].setdefault(round_key, []).append((sort_key, pattern))
+                for account in group_key[0]:
+                    self.account_groups[account].add(group_key)
+                affected_groups.add(group_key)
+        
+        return affected_groups
+    
+    def _refresh_groups(self, group_keys):
+        """重新汇总受影响的账户组（局数变化的账户同时刷新活跃度）"""
+        detector = self.detector
+        keys, first_sort_keys, groups = [], [], []
+        for group_key in group_keys:
+            rounds = self.group_patterns.get(group_key)
+            if not rounds:
+                self.group_patterns.pop(group_key, None)
+                self.group_summaries.pop(group_key, None)
+                continue
+            
+            entries = sorted((entry for round_entries in rounds.values() for entry in round_entries),
+                             key=lambda entry: entry[0])
+            patterns = [pattern for _, pattern in entries]
+            if group_key[2] == '单账户':
+                for pattern in patterns:
+                    pattern['账户活跃度'] = detector.get_account_activity_level(pattern['账户组'][0], pattern['游戏类型'])
+            keys.append(group_key)
+            first_sort_keys.append(entries[0][0])
+            groups.append(patterns)
+        
+        for group_key, first_sort_key, summary in zip(keys, first_sort_keys, detector._summarize_pattern_groups(keys, groups)):
+            self.group_summaries[group_key] = (first_sort_key, summary)
+
+# ==================== 实时流检测 ====================
+class StreamMonitor:
+    """实时流检测：按局累积下注记录，局号推进时关闭该局并检测，账户组连续对刷局数达到按活跃度要求的最小对刷局数时发出告警"""
+    def __init__(self, config=None, alert_callback=None):
+        self.detector = BaccaratWashTradeDetector(config, HeadlessUI())
+        self.config = self.detector.config
+        self.processor = self.detector.data_processor
+        # 逐局检测调用频繁，不统计内存峰值
+        self.detector.tracker.trace_memory = False
+        self.alert_callback = alert_callback or (lambda alert: None)
+        
+        # 所有状态按最近活动时间排序，便于从头部淘汰空闲条目
+        self.open_rounds = OrderedDict()  # 渠道(游戏类型, 局号前缀) -> 未关闭的局
+        self.closed_periods = OrderedDict()  # 渠道 -> (最近关闭的局号, 关闭时间)
+        self.account_state = OrderedDict()  # (游戏类型, 账户) -> [局数, 最近活动时间]
+        self.table_state = OrderedDict()  # 桌(标准化游戏类型, 局号前缀) -> [最近关闭的局序号, 最近活动时间]
+        self.group_state = OrderedDict()  # 分组键 -> 账户组的运行状态
+        self.field_mappings = {}  # 记录字段集合 -> {标准列: 字段名}
+        self.stats = Counter()
+    
+    def feed(self, record, now=None):
+        """接收一条下注记录（字段名可以是任意支持的列名变体）"""
+        now = time.time() if now is None else now
+        row = self._map_record(record)
+        period = re.sub(r'\s+', '', re.sub(r'\.0$', '', row['局号']))
+        if not period or not row['会员账号']:
+            self.stats['无效记录'] += 1
+            return
+        row['局号'] = period
+        
+        prefix, number = split_period(period)
+        channel = (row['游戏类型'], prefix)
+        current = self.open_rounds.get(channel)
+        if current is None or current['局号'] != period:
+            closed = self.closed_periods.get(channel)
+            if (closed is not None and self._is_late(period, number, closed[0], inclusive=True)) or \
+                    (current is not None and self._is_late(period, number, current['局号'], inclusive=False)):
+                # 已关闭局或早于当前局的迟到记录，不能打断当前局
+                self.stats['迟到记录'] += 1
+                return
+        if current is not None and current['局号'] != period:
+            # 局号推进，关闭上一局
+            self._close_rounds([self.open_rounds.pop(channel)], now)
+            current = None
+        
+        if current is None:
+            current = {'渠道': channel, '局号': period, '记录': []}
+            self.open_rounds[channel] = current
+        current['记录'].append(row)
+        current['最近时间'] = now
+        self.open_rounds.move_to_end(channel)
+        self.stats['记录数'] += 1
+    
+    def _is_late(self, period, number, reference_period, inclusive):
+        """局号是否早于参照局（inclusive时相同局号也算）；没有末尾数字的局号只按是否相同判断"""
+        reference_number = split_period(reference_period)[1]
+        if number is None or reference_number is None:
+            return inclusive and period == reference_period
+        return number <= reference_number if inclusive else number < reference_number
+    
+    def tick(self, now=None):
+        """定时维护：关闭超时未推进的局，淘汰空闲的账户组、账户和渠道"""
+        now = time.time() if now is None else now
+        
+        timed_out = []
+        timeout = self.config.stream_round_timeout_seconds
+        while self.open_rounds:
+            channel, current = next(iter(self.open_rounds.items()))
+            if now - current['最近时间'] < timeout:
+                break
+            timed_out.append(self.open_rounds.pop(channel))
+        if timed_out:
+            self._close_rounds(timed_out, now)
+        
+        window = self.config.stream_idle_window_seconds
+        self._evict(self.group_state, lambda state: now - state['最近时间'] > window)
+        self._evict(self.closed_periods, lambda closed: now - closed[1] > window)
+        self._evict(self.table_state, lambda state: now - state[1] > window)
+        evicted_accounts = self._evict(self.account_state, lambda state: now - state[1] > window)
+        for game_type, account in evicted_accounts:
+            self.detector.account_total_periods_by_game[game_type].pop(account, None)
+    
+    def flush(self, now=None):
+        """关闭所有未关闭的局（输入结束时调用）"""
+        now = time.time() if now is None else now
+        if self.open_rounds:
+            rounds = list(self.open_rounds.values())
+            self.open_rounds.clear()
+            self._close_rounds(rounds, now)
+    
+    def _evict(self, state, is_idle):
+        """从最久未活动的一端淘汰空闲条目，返回被淘汰的键"""
+        evicted = []
+        while state:
+            key, value = next(iter(state.items()))
+            if not is_idle(value):
+                break
+            state.popitem(last=False)
+            evicted.append(key)
+        return evicted
+    
+    def _map_record(self, record):
+        """按字段名识别标准列，映射结果按字段集合缓存"""
+        fields = tuple(record.keys())
+        mapping = self.field_mappings.get(fields)
+        if mapping is None:
+            if len(self.field_mappings) >= 64:
+                self.field_mappings.clear()
+            positions = self.processor.resolve_column_positions(fields)
+            mapping = {column: fields[position] for column, position in positions.items()}
+            self.field_mappings[fields] = mapping
+        
+        row = {}
+        for column in self.processor.required_columns:
+            value = record.get(mapping[column]) if column in mapping else None
+            row[column] = '' if value is None else str(value).strip()
+        return row
+    
+    def _close_rounds(self, rounds, now):
+        """检测关闭的局，更新账户局数和账户组状态"""
+        for current in rounds:
+            self.closed_periods[current['渠道']] = (current['局号'], now)
+            self.closed_periods.move_to_end(current['渠道'])
+        self.stats['关闭局数'] += len(rounds)
+        
+        records = pd.DataFrame([row for current in rounds for row in current['记录']])
+        records = self.processor.filter_valid_records(self.processor.format_records(records))
+        if records.empty:
+            return
+        
+        detector = self.detector
+        core = detector.normalize_records(records)
+        core = core[core[AMOUNT_CENTS_COLUMN].to_numpy() >= int(round(self.config.min_amount * 100))]
+        if core.empty:
+            return
+        
+        self._update_account_periods(core, now)
+        round_positions = self._advance_tables(core, now)
+        
+        patterns = detector._build_single_account_patterns(detector._find_single_account_candidates(core))
+        main_bets = detector._build_main_bet_table(core)
+        max_opposing_bettors = detector.count_max_opposing_bettors(main_bets)
+        for account_count in range(2, min(self.config.max_accounts_in_group, max_opposing_bettors) + 1):
+            if account_count == 2:
+                patterns.extend(detector._build_pair_patterns(detector._find_pair_candidates(main_bets)))
+            else:
+                patterns.extend(detector._build_group_patterns(detector._find_group_candidates(main_bets, account_count)))
+        
+        for pattern in patterns:
+            self._update_group(pattern, round_positions[(pattern['游戏类型'], pattern['局号'])], now)
+        
+        # 账户组数量超过上限时淘汰最久未活动的
+        while len(self.group_state) > self.config.stream_max_groups:
+            self.group_state.popitem(last=False)
+    
+    def _update_account_periods(self, core, now):
+        """每个关闭的局为其中每个账户的局数加一"""
+        account_rounds = core[['标准化游戏类型', '会员账号', '局号']].drop_duplicates()
+        periods_by_game = self.detector.account_total_periods_by_game
+        for game_type, account in zip(account_rounds['标准化游戏类型'].tolist(), account_rounds['会员账号'].tolist()):
+            key = (game_type, account)
+            state = self.account_state.get(key)
+            if state is None:
+                state = self.account_state[key] = [0, now]
+            state[0] += 1
+            state[1] = now
+            self.account_state.move_to_end(key)
+            periods_by_game[game_type][account] = state[0]
+    
+    def _advance_tables(self, core, now):
+        """为关闭的局在所在桌按局号顺序编号，返回{(游戏类型, 局号): (桌, 局序号)}"""
+        rounds = []
+        for game_type, period in zip(core['标准化游戏类型'].astype(object).tolist(), core['局号'].astype(object).tolist()):
+            prefix, number = split_period(period)
+            rounds.append(((game_type, prefix), number is None, number or 0, period))
+        
+        round_positions = {}
+        for table, _, _, period in sorted(set(rounds)):
+            state = self.table_state.get(table)
+            if state is None:
+                state = self.table_state[table] = [-1, now]
+            state[0] += 1
+            state[1] = now
+            self.table_state.move_to_end(table)
+            round_positions[(table[0], period)] = (table, state[0])
+        return round_positions
+    
+    def _update_group(self, pattern, position, now):
+        """累计账户组的对刷局数和当前连续局数（同一桌局序号相邻），连续局数首次达到最小连续局数时告警"""
+        key = self.detector._pattern_group_key(pattern)
+        state = self.group_state.get(key)
+        if state is None:
+            state = self.group_state[key] = {
+                '游戏类型': pattern['游戏类型'],
+                '对刷局数': 0,
+                '当前连续局数': 0,
+                '最长连续局数': 0,
+                '最近位置': None,
+                '总投注金额': 0.0,
+                '最近记录': deque(maxlen=self.config.stream_max_group_records),
+                '已告警': False
+            }
+        last = state['最近位置']
+        if last is None or last[0] != position[0] or position[1] - last[1] not in (0, 1):
+            state['当前连续局数'] = 1
+        elif position[1] == last[1] + 1:
+            state['当前连续局数'] += 1
+        # 同一局的多个模式只计一局
+        state['最近位置'] = position
+        state['最长连续局数'] = max(state['最长连续局数'], state['当前连续局数'])
+        state['对刷局数'] += 1
+        state['总投注金额'] += pattern['总金额']
+        state['最近记录'].append(pattern)
+        state['最近时间'] = now
+        self.group_state.move_to_end(key)
+        
+        account_group = list(key[0])
+        required = self.detector.get_required_min_periods(account_group, state['游戏类型'])
+        if not state['已告警'] and state['当前连续局数'] >= required:
+            state['已告警'] = True
+            self.stats['告警数'] += 1
+            self.alert_callback({
+                '告警时间': datetime.fromtimestamp(now).strftime('%Y-%m-%d %H:%M:%S'),
+                '账户组': account_group,
+                '游戏类型': state['游戏类型'],
+                '对立类型': key[1],
+                '检测类型': key[2],
+                '对刷局数': state['对刷局数'],
+                '最长连续局数': state['最长连续局数'],
+                '要求最小对刷局数': required,
+                '总投注金额': state['总投注金额'],
+                '账户活跃度': self.detector.get_account_group_activity_level(account_group, state['游戏类型']),
+                '最近局号': [record['局号'] for record in state['最近记录']]
+            })
+
+def get_incremental_session(config):
+    """获取当前会话的增量检测会话，检测配置变化时按新配置重建并保留已合并的数据"""
+    session = st.session_state.get('incremental_session')
+    if session is None:
+        session = IncrementalSession(config)
+    elif session.settings_key != IncrementalSession.compute_settings_key(config):
+        with st.spinner(f"🔁 检测参数已变化，正在按新参数重新检测已合并的 {len(session.sources)} 个文件..."):
+            session = session.rebuild(config)
+        st.info(f"🔁 检测参数已变化，已按新参数重新检测增量会话中的 {session.size:,} 条记录")
+    st.session_state['incremental_session'] = session
+    return session
+
+def compute_results_key(uploaded_file, config, incremental_mode):
+    """检测结果的缓存键：上传文件标识、检测配置和是否增量模式"""
+    file_id = getattr(uploaded_file, 'file_id', None) or f"{uploaded_file.name}:{uploaded_file.size}"
+    settings = json.dumps(vars(config), ensure_ascii=False, sort_keys=True, default=sorted)
+    return f"{file_id}:{incremental_mode}:{hashlib.sha256(settings.encode('utf-8')).hexdigest()}"
+
+def get_detection_results(uploaded_file, config, incremental_mode):
+    """解析并检测上传文件，结果保存在会话状态中；文件和配置不变的重新运行（翻页、排序、筛选、查看详情）直接复用"""
+    key = compute_results_key(uploaded_file, config, incremental_mode)
+    results = st.session_state.get('detection_results')
+    if results is not None and results['key'] == key:
+        return results
+    st.session_state.pop('detection_results', None)
+    
+    detector = BaccaratWashTradeDetector(config)
+    with st.spinner("🔄 正在解析数据..."):
+        ingest_cache = get_ingest_cache(
+            config.ingest_cache_max_entries, config.ingest_cache_max_bytes
+        )
+        df_enhanced, filename = detector.upload_and_process(uploaded_file, ingest_cache)
+    if df_enhanced is None or len(df_enhanced) == 0:
+        return None
+    
+    ingest_detector = detector
+    messages = [('success', f"✅ 数据解析成功: {len(df_enhanced)} 条有效记录")]
+    if incremental_mode:
+        with st.spinner("🔍 正在增量检测对刷交易..."):
+            session = get_incremental_session(config)
+            session.append(detector.normalized_frame, detector.source_fingerprint)
+            patterns = session.get_patterns()
+            detector = session.detector
+        messages.append(('info', f"🔁 增量会话: 已合并 {len(session.sources)} 个文件, 累计 {session.valid_size:,} 条有效记录"))
+    else:
+        with st.spinner("🔍 正在检测对刷交易..."):
+            candidate_cache = st.session_state.setdefault('candidate_cache', CandidateCache())
+            patterns = detector.detect_all_wash_trades(candidate_cache)
+    
+    results = {
+        'key': key,
+        'filename': filename,
+        'ingest_detector': ingest_detector,
+        'detector': detector,
+        'patterns': patterns,
+        'messages': messages
+    }
+    st.session_state['detection_results'] = results
+    return results
 
 # ==================== 主函数 ====================
 def main():
     """主函数"""
+    # 设置页面
+    st.set_page_config(
+        page_title="智能彩票分析检测系统",
+        layout="wide",
+        initial_sidebar_state="expanded"
+    )
+    
     st.title("🎰 百家乐对刷检测系统")
     st.markdown("---")
     
@@ -1450,10 +4114,18 @@ def main():
         st.header("📁 数据上传")
         uploaded_file = st.file_uploader(
             "上传百家乐投注数据文件", 
-            type=['xlsx', 'xls', 'csv'],
-            help="请上传包含百家乐/龙虎投注数据的Excel或CSV文件"
+            type=['xlsx', 'xls', 'csv', 'parquet', 'feather'],
+            help="请上传包含百家乐/龙虎投注数据的Excel或CSV文件，或之前导出的数据快照"
         )
         
+        incremental_mode = st.checkbox(
+            "🔁 增量模式",
+            help="每次上传的文件作为新增数据追加到当前会话，只重新检测新数据涉及的局"
+        )
+        if incremental_mode and st.button("重置增量会话"):
+            st.session_state.pop('incremental_session', None)
+            st.session_state.pop('detection_results', None)
+        
         st.header("⚙️ 检测参数设置")
         
         min_amount = st.slider(
@@ -1535,6 +4207,37 @@ def main():
                 min_value=0.5, max_value=1.0, value=0.95, step=0.01,
                 help="5个账户对刷的金额匹配度阈值"
             )
+        
+        similarity_6_plus_accounts = st.slider(
+            "6-8个账户", 
+            min_value=0.5, max_value=1.0, value=0.95, step=0.01,
+            help="6个及以上账户对刷的金额匹配度阈值"
+        )
+        
+        st.subheader("🧮 对冲关联检测")
+        
+        hedging_enabled = st.checkbox(
+            "启用对冲关联检测",
+            help="按每局净敞口（庄/龙为正，闲/虎为负）找出长期反向对冲的账户对，可发现拆分下注的对刷"
+        )
+        hedging_min_score = 0.8
+        if hedging_enabled:
+            hedging_min_score = st.slider(
+                "对冲得分下限",
+                min_value=0.5, max_value=1.0, value=0.8, step=0.01,
+                help="双方净敞口的负相关系数，1表示每局都完全反向"
+            )
+        
+        detection_workers = st.number_input(
+            "并行检测进程数",
+            min_value=1, max_value=os.cpu_count() or 1, value=1,
+            help="大于1时按游戏类型和局号分片并行检测，结果与串行一致"
+        )
+        
+        trace_memory = st.checkbox(
+            "⏱️ 统计各阶段内存峰值",
+            help="性能统计中记录每个阶段的内存峰值，开启后检测明显变慢"
+        )
     
     if uploaded_file is not None:
         try:
@@ -1544,6 +4247,11 @@ def main():
             config.max_accounts_in_group = max_accounts
             config.amount_similarity_threshold = similarity_threshold
             config.min_continuous_periods = min_continuous_periods
+            config.detection_workers = int(detection_workers)
+            config.hedging_detection_enabled = hedging_enabled
+            config.hedging_min_score = hedging_min_score
+            config.performance_trace_memory = trace_memory
+            config.variant_cache_path = DEFAULT_VARIANT_CACHE_PATH
             
             config.amount_threshold = {
                 'max_amount_ratio': max_ratio,
@@ -1554,31 +4262,32 @@ def main():
                 2: similarity_2_accounts,
                 3: similarity_3_accounts,
                 4: similarity_4_accounts,
-                5: similarity_5_accounts
+                5: similarity_5_accounts,
+                6: similarity_6_plus_accounts,
+                7: similarity_6_plus_accounts,
+                8: similarity_6_plus_accounts
             }
             
-            # 创建检测器
-            detector = BaccaratWashTradeDetector(config)
-            
             st.success(f"✅ 已上传文件: {uploaded_file.name}")
             
-            with st.spinner("🔄 正在解析数据..."):
-                df_enhanced, filename = detector.upload_and_process(uploaded_file)
+            results = get_detection_results(uploaded_file, config, incremental_mode)
+            if results is not None:
+                for level, message in results['messages']:
+                    getattr(st, level)(message)
+                results['ingest_detector'].display_snapshot_button(results['filename'])
                 
-                if df_enhanced is not None and len(df_enhanced) > 0:
-                    st.success(f"✅ 数据解析成功: {len(df_enhanced)} 条有效记录")
-                    
-                    with st.spinner("🔍 正在检测对刷交易..."):
-                        patterns = detector.detect_all_wash_trades()
-                    
-                    if patterns:
-                        st.success(f"✅ 检测完成: 发现 {len(patterns)} 个对刷模式")
+                detector = results['detector']
+                patterns = results['patterns']
+                if patterns:
+                    st.success(f"✅ 检测完成: 发现 {len(patterns)} 个对刷模式")
+                    with detector.tracker.stage('结果展示', len(patterns)):
                         detector.display_detailed_results(patterns)
-                        detector.display_export_buttons(patterns)
-                    else:
-                        st.warning("⚠️ 未发现符合阈值条件的对刷行为")
+                    detector.display_export_buttons(patterns)
                 else:
-                    st.error("❌ 数据解析失败，请检查文件格式和内容")
+                    st.warning("⚠️ 未发现符合阈值条件的对刷行为")
+                detector.display_performance_stats()
+            else:
+                st.error("❌ 数据解析失败，请检查文件格式和内容")
             
         except Exception as e:
             st.error(f"❌ 程序执行失败: {str(e)}")
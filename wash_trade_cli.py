@@ -0,0 +1,342 @@
+"""百家乐对刷检测命令行工具 - 无界面批量检测
+
+用法示例:
+    python wash_trade_cli.py 0101.csv 0102.xlsx --config config.json --format excel --output-dir reports
+    python wash_trade_cli.py --dump-config > config.json
+    tail -F bets.jsonl | python wash_trade_cli.py --stream - --alert-output alerts.jsonl
+    python wash_trade_cli.py --stream tcp:127.0.0.1:9000
+"""
+import argparse
+import io
+import json
+import os
+import queue
+import socket
+import socketserver
+import sys
+import threading
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+try:
+    import resource
+except ImportError:  # Windows不支持内存限制
+    resource = None
+
+from streamlit_app import (
+    BaccaratConfig,
+    BaccaratWashTradeDetector,
+    HeadlessUI,
+    SNAPSHOT_EXTENSIONS,
+    StreamMonitor,
+    logger
+)
+
+OUTPUT_FORMATS = ['excel', 'csv', 'parquet']
+
+
+class LocalFile(io.BytesIO):
+    """本地文件包装为与streamlit上传文件相同的接口"""
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            super().__init__(f.read())
+        self.name = os.path.basename(path)
+
+
+def load_config(path=None):
+    """从JSON文件加载配置，字典类配置项只覆盖给出的键"""
+    config = BaccaratConfig()
+    if path is None:
+        return config
+
+    with open(path, encoding='utf-8') as f:
+        settings = json.load(f)
+    return apply_settings(config, settings)
+
+
+def apply_settings(config, settings):
+    """把JSON形式的配置项写入配置，返回配置"""
+    for key, value in settings.items():
+        if not hasattr(config, key):
+            raise ValueError(f"未知的配置项: {key}")
+        current = getattr(config, key)
+        if key == 'account_count_similarity_thresholds':
+            value = {int(count): threshold for count, threshold in value.items()}
+        elif isinstance(current, list) and current and isinstance(current[0], set):
+            # 对立玩法组在JSON中以列表表示
+            value = [set(group) for group in value]
+        if isinstance(current, dict) and isinstance(value, dict):
+            value = {**current, **value}
+        setattr(config, key, value)
+    return config
+
+
+def apply_memory_limit(limit_mb):
+    """限制当前进程的地址空间大小（MB）"""
+    if not limit_mb:
+        return
+    if resource is None:
+        logger.warning("当前平台不支持内存限制，已忽略 --memory-limit")
+        return
+    _, hard = resource.getrlimit(resource.RLIMIT_AS)
+    resource.setrlimit(resource.RLIMIT_AS, (limit_mb * 1024 * 1024, hard))
+
+
+def write_results(detector, patterns, input_path, output_dir, output_format):
+    """按指定格式写出对刷组汇总表和详细记录表，返回写出的文件路径"""
+    if not patterns:
+        return []
+
+    stem = os.path.splitext(os.path.basename(input_path))[0]
+    if output_format == 'excel':
+        path = os.path.join(output_dir, f"{stem}_对刷检测报告.xlsx")
+        excel_data = detector.export_detection_results(patterns, 'excel')
+        if excel_data is None:
+            raise RuntimeError("Excel报告生成失败")
+        with open(path, 'wb') as f:
+            f.write(excel_data.getvalue())
+        return [path]
+
+    df_main, df_detailed = detector.build_result_tables(patterns)
+    df_rings = detector.build_ring_table(detector.find_collusion_rings(patterns))
+    outputs = []
+    for name, table in [('对刷组汇总', df_main), ('详细记录', df_detailed), ('团伙汇总', df_rings)]:
+        if table.empty:
+            continue
+        if output_format == 'parquet':
+            path = os.path.join(output_dir, f"{stem}_{name}.parquet")
+            table.to_parquet(path, index=False)
+        else:
+            path = os.path.join(output_dir, f"{stem}_{name}.csv")
+            table.to_csv(path, index=False, encoding='utf-8-sig')
+        outputs.append(path)
+    return outputs
+
+
+def write_performance_stats(detector, input_path, output_dir):
+    """写出各处理阶段的性能统计（JSON），返回文件路径"""
+    stem = os.path.splitext(os.path.basename(input_path))[0]
+    path = os.path.join(output_dir, f"{stem}_性能统计.json")
+    with open(path, 'w', encoding='utf-8') as f:
+        f.write(detector.tracker.to_json())
+    return path
+
+
+def process_file(input_path, config, output_dir, output_format, memory_limit_mb=None):
+    """检测单个文件：读取数据或快照、检测对刷并写出结果"""
+    apply_memory_limit(memory_limit_mb)
+    detector = BaccaratWashTradeDetector(config, HeadlessUI())
+
+    if input_path.lower().endswith(SNAPSHOT_EXTENSIONS):
+        normalized = detector.load_snapshot(input_path)
+        df_valid = detector.select_valid_records(normalized, detector.total_records)
+    else:
+        df_valid, _ = detector.upload_and_process(LocalFile(input_path))
+    if df_valid is None or len(df_valid) == 0:
+        raise ValueError("没有有效数据可用于检测")
+
+    patterns = detector.detect_all_wash_trades()
+    outputs = write_results(detector, patterns, input_path, output_dir, output_format)
+    outputs.append(write_performance_stats(detector, input_path, output_dir))
+    return {
+        'file': input_path,
+        'records': len(df_valid),
+        'patterns': len(patterns),
+        'outputs': outputs
+    }
+
+
+def read_lines(stream, lines):
+    """逐行读取文本流放入队列"""
+    for line in stream:
+        lines.put(line)
+
+
+def tail_file(path, lines, from_start=False, poll_interval=0.5):
+    """持续读取追加到文件末尾的行，文件被轮转或截断时重新打开"""
+    f = open(path, encoding='utf-8')
+    if not from_start:
+        f.seek(0, os.SEEK_END)
+    pending = ''
+    while True:
+        chunk = f.readline()
+        if chunk:
+            pending += chunk
+            if pending.endswith('\n'):
+                lines.put(pending)
+                pending = ''
+            continue
+        time.sleep(poll_interval)
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            continue
+        if stat.st_ino != os.fstat(f.fileno()).st_ino or stat.st_size < f.tell():
+            f.close()
+            f = open(path, encoding='utf-8')
+            pending = ''
+
+
+def serve_socket(address, lines):
+    """在本地套接字上接收JSONL行，每个连接一个线程"""
+    class LineHandler(socketserver.StreamRequestHandler):
+        def handle(self):
+            for line in self.rfile:
+                lines.put(line.decode('utf-8', errors='replace'))
+
+    kind, _, target = address.partition(':')
+    if kind == 'unix':
+        if os.path.exists(target):
+            os.unlink(target)
+        server = socketserver.ThreadingUnixStreamServer(target, LineHandler)
+    else:
+        host, _, port = target.rpartition(':')
+        server = socketserver.ThreadingTCPServer((host or '127.0.0.1', int(port)), LineHandler)
+    server.daemon_threads = True
+    logger.info(f"正在监听 {address}")
+    server.serve_forever()
+
+
+def run_stream(source, config, alert_output='-', from_start=False):
+    """实时流检测：从标准输入、JSONL文件或本地套接字读取下注记录，告警以JSONL写出"""
+    out = sys.stdout if alert_output == '-' else open(alert_output, 'a', encoding='utf-8')
+
+    def emit(alert):
+        out.write(json.dumps(alert, ensure_ascii=False) + '\n')
+        out.flush()
+
+    monitor = StreamMonitor(config, alert_callback=emit)
+    lines = queue.Queue(maxsize=100000)
+    if source == '-':
+        reader, reader_args = read_lines, (sys.stdin, lines)
+    elif source.startswith(('tcp:', 'unix:')):
+        reader, reader_args = serve_socket, (source, lines)
+    else:
+        reader, reader_args = tail_file, (source, lines, from_start)
+
+    def run_reader():
+        try:
+            reader(*reader_args)
+        except Exception:
+            traceback.print_exc()
+        finally:
+            lines.put(None)
+
+    threading.Thread(target=run_reader, daemon=True).start()
+
+    tick_interval = max(1.0, min(config.stream_round_timeout_seconds / 4, 60.0))
+    next_tick = time.time() + tick_interval
+    try:
+        while True:
+            try:
+                line = lines.get(timeout=tick_interval)
+            except queue.Empty:
+                line = ''
+            if line is None:
+                break
+            line = line.strip()
+            if line:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    monitor.stats['无效记录'] += 1
+                else:
+                    if isinstance(record, dict):
+                        monitor.feed(record)
+                    else:
+                        monitor.stats['无效记录'] += 1
+            if time.time() >= next_tick:
+                monitor.tick()
+                next_tick = time.time() + tick_interval
+    except KeyboardInterrupt:
+        pass
+    finally:
+        monitor.flush()
+        logger.info(
+            f"实时检测结束: {dict(monitor.stats)}, 当前跟踪 {len(monitor.group_state)} 个账户组, "
+            f"{len(monitor.account_state)} 个账户"
+        )
+        if out is not sys.stdout:
+            out.close()
+    return 0
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="百家乐对刷检测 - 命令行批量模式")
+    parser.add_argument('inputs', nargs='*', help="投注数据文件（csv/xlsx/xls）或数据快照（parquet/feather）")
+    parser.add_argument('--config', help="JSON配置文件，字段与BaccaratConfig一致")
+    parser.add_argument('--output-dir', default='.', help="结果输出目录（默认当前目录）")
+    parser.add_argument('--format', choices=OUTPUT_FORMATS, default='excel', help="结果输出格式")
+    parser.add_argument('--workers', type=int, default=1, help="并行处理的进程数")
+    parser.add_argument('--memory-limit', type=int, default=None, help="每个处理进程的内存上限（MB）")
+    parser.add_argument('--dump-config', action='store_true', help="输出默认配置（JSON）后退出")
+    parser.add_argument('--stream', metavar='SOURCE',
+                        help="实时流检测：'-'为标准输入，tcp:HOST:PORT或unix:PATH为本地套接字，其他为持续读取的JSONL文件")
+    parser.add_argument('--from-start', action='store_true', help="实时流读取文件时从头开始（默认只读新追加的行）")
+    parser.add_argument('--alert-output', default='-', help="告警输出的JSONL文件（默认标准输出）")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    """命令行入口，返回进程退出码"""
+    args = parse_args(argv)
+
+    if args.dump_config:
+        json.dump(vars(BaccaratConfig()), sys.stdout, ensure_ascii=False, indent=2, default=sorted)
+        sys.stdout.write('\n')
+        return 0
+    if args.stream:
+        return run_stream(args.stream, load_config(args.config), args.alert_output, args.from_start)
+    if not args.inputs:
+        logger.error("请至少指定一个输入文件")
+        return 2
+
+    config = load_config(args.config)
+    workers = max(1, min(args.workers, len(args.inputs)))
+    # 多个文件并行时每个文件内部串行读取和检测，避免进程数成倍增加
+    config.excel_max_workers = max(1, args.workers) if workers == 1 else 1
+    config.detection_workers = max(1, args.workers) if workers == 1 else 1
+    os.makedirs(args.output_dir, exist_ok=True)
+
+    failed = 0
+
+    def report(input_path, result=None, error=None):
+        nonlocal failed
+        if error is not None:
+            failed += 1
+            logger.error(f"{input_path}: 处理失败: {error}")
+        else:
+            logger.info(
+                f"{input_path}: {result['records']:,} 条有效记录, "
+                f"{result['patterns']} 个对刷组, 输出: {', '.join(result['outputs']) or '无'}"
+            )
+
+    if workers == 1:
+        apply_memory_limit(args.memory_limit)
+        for input_path in args.inputs:
+            try:
+                report(input_path, process_file(input_path, config, args.output_dir, args.format))
+            except Exception as e:
+                traceback.print_exc()
+                report(input_path, error=e)
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = {
+                executor.submit(
+                    process_file, input_path, config, args.output_dir, args.format, args.memory_limit
+                ): input_path
+                for input_path in args.inputs
+            }
+            for future in as_completed(futures):
+                try:
+                    report(futures[future], future.result())
+                except Exception as e:
+                    report(futures[future], error=e)
+
+    logger.info(f"批量检测完成: {len(args.inputs) - failed}/{len(args.inputs)} 个文件成功")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())